@@ -0,0 +1,154 @@
+import io
+import os
+import sys
+import time
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from embed import Interpreter, CompiledProgram, compile_source
+from cache import ScriptCache
+import vm.machine
+import memo
+import parallel
+
+# Batch mode (--batch DIR): runs every .rs file under a directory, spread over a pool of
+# worker processes so a job uses every core
+# Each worker is set up once by init_worker(): it builds the global env (an Interpreter) and
+# opens the script cache, then runs one script after another. Every script gets its own env
+# on top of the shared global env (see embed.py) and its own stdout, captured into a string.
+# Entries the cache gets from one worker are used by the others too (see cache.py)
+
+# Exit status of a script
+OK = 0
+FAILED = 1
+TIMED_OUT = 2
+
+STATUS_NAMES = {OK: "ok", FAILED: "failed", TIMED_OUT: "timeout"}
+
+class ScriptTimeout(BaseException):
+    # Not an Exception, so nothing on the way out of the script can catch it
+    pass
+
+# Set up by init_worker() in every worker process
+worker = None
+
+class Worker:
+    def __init__(self, engine, optimized, cache_dir, use_cache, timeout):
+        self.interpreter = Interpreter(engine, optimized)
+        self.cache = ScriptCache(cache_dir) if use_cache else None
+        self.options = (engine, optimized)
+        self.timeout = timeout
+
+    def compile(self, source):
+        interpreter = self.interpreter
+        if (self.cache is None):
+            return interpreter.compile(source)
+        compiled = self.cache.load_or_compile(
+            source, self.options, lambda source: compile_source(source, interpreter.engine, interpreter.optimized)
+        )
+        return CompiledProgram(interpreter.engine, interpreter.optimized, compiled)
+
+    # Returns (path, status, stdout, error message, seconds)
+    def run(self, path):
+        start = time.perf_counter()
+        output = io.StringIO()
+        status = OK
+        error = None
+
+        # The alarm interrupts whatever the script is doing, compiling included
+        # It's stopped inside the outer try, so one going off right as the script ends is still
+        # caught as a timeout
+        saved_stdout = sys.stdout
+        sys.stdout = output
+        try:
+            if (self.timeout is not None):
+                signal.setitimer(signal.ITIMER_REAL, self.timeout)
+            try:
+                with (open(path, "r") as f):
+                    source = f.read()
+                self.interpreter.execute(self.compile(source))
+            finally:
+                if (self.timeout is not None):
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+        except ScriptTimeout:
+            status = TIMED_OUT
+            error = f"took longer than {self.timeout}s"
+        except RecursionError:
+            status = FAILED
+            error = "maximum recursion depth exceeded"
+        except Exception as e:
+            status = FAILED
+            error = str(e)
+        finally:
+            sys.stdout = saved_stdout
+
+        return (path, status, output.getvalue(), error, time.perf_counter() - start)
+
+def raise_timeout(signum, frame):
+    raise ScriptTimeout()
+
+# limits is (vm.machine.MAX_CALL_DEPTH, memo.DEFAULT_CACHE_SIZE) in the main process, workers
+# that aren't forked from it wouldn't get the values set from the command line
+def init_worker(engine, optimized, cache_dir, use_cache, timeout, limits):
+    global worker
+    vm.machine.MAX_CALL_DEPTH, memo.DEFAULT_CACHE_SIZE = limits
+    worker = Worker(engine, optimized, cache_dir, use_cache, timeout)
+    signal.signal(signal.SIGALRM, raise_timeout)
+    # Every core already runs a script, pmap and the others run serially instead of each
+    # worker starting a pool of its own
+    parallel.init_worker()
+
+def run_script(path):
+    return worker.run(path)
+
+# Every .rs file under directory, in a stable order
+def find_scripts(directory):
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if (name.endswith(".rs")):
+                paths.append(os.path.join(root, name))
+    return paths
+
+# Runs every script and reports on each one as it finishes (in order), then prints a summary
+# With output_dir, the stdout of every script is written to a .out file at the same relative path
+# Returns the number of scripts that didn't finish with OK
+def run_batch(directory, workers=None, engine="tree", optimized=False, cache_dir=None, use_cache=True,
+        timeout=None, output_dir=None, out=sys.stdout):
+    paths = find_scripts(directory)
+    workers = workers or os.cpu_count() or 1
+    counts = {OK: 0, FAILED: 0, TIMED_OUT: 0}
+    script_time = 0
+
+    start = time.perf_counter()
+    with (ProcessPoolExecutor(
+        max_workers=workers, initializer=init_worker,
+        initargs=(engine, optimized, cache_dir, use_cache, timeout, (vm.machine.MAX_CALL_DEPTH, memo.DEFAULT_CACHE_SIZE))
+    ) as executor):
+        # Scripts are handed out a few at a time, one at a time would spend more on messages
+        # than on short scripts
+        chunksize = max(1, len(paths) // (workers * 8))
+        for path, status, stdout, error, seconds in executor.map(run_script, paths, chunksize=chunksize):
+            counts[status] += 1
+            script_time += seconds
+            relative = os.path.relpath(path, directory)
+            line = f"{STATUS_NAMES[status]:<8}{seconds:>9.3f}s  {relative}"
+            if (error is not None):
+                line += f": {error}"
+            print(line, file=out)
+
+            if (output_dir is not None):
+                output_path = os.path.join(output_dir, os.path.splitext(relative)[0] + ".out")
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                with (open(output_path, "w") as f):
+                    f.write(stdout)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(paths)} scripts in {elapsed:.2f}s with {workers} workers: "
+        f"{counts[OK]} ok, {counts[FAILED]} failed, {counts[TIMED_OUT]} timed out, "
+        f"{len(paths) / elapsed if elapsed > 0 else 0:.1f} scripts/s, "
+        f"{script_time:.2f}s of script time",
+        file=out
+    )
+    return counts[FAILED] + counts[TIMED_OUT]
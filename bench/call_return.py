@@ -0,0 +1,88 @@
+# Times call-heavy scripts, comparing functions that end in return with ones that fall through
+# Every checkout given is timed, so a copy of an older revision can be compared with this one:
+#   git worktree add /tmp/before <commit>
+#   python bench/call_return.py /tmp/before .
+# Usage: python bench/call_return.py [checkout ...] [--engines tree,closure] [--repeats n]
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# name -> script, each one makes the same number of calls
+SCRIPTS = {
+    "fall-through": """
+fdeclare add(a, b) { a + b; }
+declare i = 0;
+declare total = 0;
+while (i < 30000) { total = add(total, i); i = i + 1; }
+print(total);
+""",
+    "return": """
+fdeclare add(a, b) { return a + b; }
+declare i = 0;
+declare total = 0;
+while (i < 30000) { total = add(total, i); i = i + 1; }
+print(total);
+""",
+    "return-in-loop": """
+fdeclare first(limit) {
+    declare j = 0;
+    while (true) {
+        if (j == limit) { return j; }
+        j = j + 1;
+    }
+}
+declare i = 0;
+declare total = 0;
+while (i < 30000) { total = total + first(2); i = i + 1; }
+print(total);
+""",
+    "recursion": """
+fdeclare fib(n) {
+    if (n < 2) { return n; }
+    return fib(n - 1) + fib(n - 2);
+}
+print(fib(18));
+""",
+}
+
+# Best wall time of running the script with the checkout's main.py
+def measure(checkout, engine, path, repeats):
+    main = os.path.join(checkout, "main.py")
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, main, "--engine", engine, "--no-cache", path], check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        if (best is None or elapsed < best):
+            best = elapsed
+    return best
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time call-heavy RowScript scripts")
+    arg_parser.add_argument("checkouts", nargs="*", default=[ROOT], help="directories containing main.py")
+    arg_parser.add_argument("--engines", default="tree,closure")
+    arg_parser.add_argument("--repeats", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    engines = args.engines.split(",")
+
+    with (tempfile.TemporaryDirectory() as directory):
+        print(f"best of {args.repeats}, seconds")
+        print(f"{'script':<16}{'engine':<10}" + "".join(f"{os.path.basename(os.path.abspath(c)):>12}" for c in args.checkouts))
+
+        for name, source in SCRIPTS.items():
+            path = os.path.join(directory, name + ".rs")
+            with (open(path, "w") as f):
+                f.write(source)
+
+            for engine in engines:
+                times = [measure(checkout, engine, path, args.repeats) for checkout in args.checkouts]
+                print(f"{name:<16}{engine:<10}" + "".join(f"{t:>12.3f}" for t in times))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Times processing a directory of files one after the other against doing it in tasks
+# Every file is read, copied to a .out file and counted, with a sleep before each read standing in
+# for a slow disk or network. The sequential script waits for each file in turn, the concurrent
+# one spawns workers that take paths from a channel, so their waits overlap
+# Usage: python bench/concurrent_io.py [--engines tree,closure] [--files n] [--latency ms]
+#                                      [--workers n] [--repeats n]
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Declarations both scripts share, paths and latency are filled in by make_script()
+PROCESS = """
+fdeclare process(path) {
+    sleep(LATENCY);
+    declare text = readFile(path);
+    writeFile(path + ".out", text);
+    return length(text);
+}
+"""
+
+SEQUENTIAL = """
+declare total = 0;
+declare i = 0;
+while (i < length(paths)) { total = total + process(paths[i]); i = i + 1; }
+print(total);
+"""
+
+CONCURRENT = """
+fdeclare worker(jobs, results) {
+    declare path = receive(jobs);
+    while (path != null) { send(results, process(path)); path = receive(jobs); }
+}
+declare jobs = channel();
+declare results = channel();
+declare i = 0;
+while (i < WORKERS) { spawn(worker, jobs, results); i = i + 1; }
+i = 0;
+while (i < length(paths)) { send(jobs, paths[i]); i = i + 1; }
+close(jobs);
+declare total = 0;
+i = 0;
+while (i < length(paths)) { total = total + receive(results); i = i + 1; }
+print(total);
+"""
+
+def make_script(body, paths, latency, workers):
+    listed = ", ".join('"' + path + '"' for path in paths)
+    source = f"declare paths = [{listed}];\n" + PROCESS + body
+    return source.replace("LATENCY", str(latency)).replace("WORKERS", str(workers))
+
+# Best wall time of running the script, and what it printed
+def measure(engine, path, repeats):
+    main = os.path.join(ROOT, "main.py")
+    best = None
+    output = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, main, "--engine", engine, "--no-cache", path], check=True, stdout=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        output = result.stdout.strip()
+        if (best is None or elapsed < best):
+            best = elapsed
+    return best, output
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time sequential against concurrent file processing")
+    arg_parser.add_argument("--engines", default="tree,closure")
+    arg_parser.add_argument("--files", type=int, default=100)
+    arg_parser.add_argument("--latency", type=int, default=10, help="milliseconds slept before each read")
+    arg_parser.add_argument("--workers", type=int, default=20)
+    arg_parser.add_argument("--repeats", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with (tempfile.TemporaryDirectory() as directory):
+        paths = []
+        for n in range(args.files):
+            path = os.path.join(directory, f"input{n}.txt")
+            with (open(path, "w") as f):
+                f.write("line\n" * (n + 1))
+            paths.append(path)
+
+        scripts = {
+            "sequential": make_script(SEQUENTIAL, paths, args.latency, args.workers),
+            "concurrent": make_script(CONCURRENT, paths, args.latency, args.workers),
+        }
+        for name, source in scripts.items():
+            with (open(os.path.join(directory, name + ".rs"), "w") as f):
+                f.write(source)
+
+        print(f"{args.files} files, {args.latency} ms latency, {args.workers} workers, best of {args.repeats}")
+        print(f"{'engine':<10}{'script':<14}{'seconds':>10}{'files/s':>10}")
+        for engine in args.engines.split(","):
+            outputs = set()
+            for name in scripts:
+                elapsed, output = measure(engine, os.path.join(directory, name + ".rs"), args.repeats)
+                outputs.add(output)
+                print(f"{engine:<10}{name:<14}{elapsed:>10.3f}{args.files / elapsed:>10.1f}")
+            if (len(outputs) != 1):
+                print(f"{engine}: the scripts printed different totals: {', '.join(sorted(outputs))}")
+
+if __name__ == "__main__":
+    main()
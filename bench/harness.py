@@ -0,0 +1,202 @@
+# Times the three phases of running a RowScript program with the tree-walker separately:
+# lexer.tokenize, Parser.produce_ast and evaluate, over every program in bench/programs plus a
+# large generated source file ("generated", mostly declarations, so it's parse-heavy)
+# Every phase runs --repeats times (after one untimed warm-up run), the report has the median and
+# the 95th percentile. One more run of each phase measures its allocations (tracemalloc slows
+# the run down, so it isn't one of the timed runs):
+#   - gc: how many times the garbage collector ran, gen 0 runs after every ~700 more objects
+#     that can hold references (lists, envs, nodes, ...) were made than freed
+#   - kept: memory blocks allocated by the phase and still alive at its end (tokens, nodes, ...)
+#   - peak KB: the most memory the phase had allocated at once
+# --output writes the results as JSON, --compare reads a file written by an earlier run (e.g. on
+# another commit) and shows how much each median changed:
+#   python bench/harness.py --output before.json
+#   git checkout <other commit>
+#   python bench/harness.py --compare before.json
+# Usage: python bench/harness.py [program ...] [--repeats n] [--output file] [--compare file]
+import gc
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import subprocess
+import contextlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PROGRAMS = os.path.join(ROOT, "bench", "programs")
+
+sys.path.insert(0, ROOT)
+sys.setrecursionlimit(10000)
+
+from lexer import tokenize
+from parser import Parser
+from eval.interpreter import evaluate
+from library import create_global_env
+
+PHASES = ("tokenize", "parse", "evaluate")
+
+# Repeated until the generated source has GENERATED_COPIES of it, the names are numbered (with
+# letters, identifiers can't have digits) so nothing is declared twice
+GENERATED_CHUNK = """
+fdeclare scale{name}(values, factor) {{
+    declare i = 0;
+    declare result = [0, 0, 0, 0];
+    while (i < length(values)) {{
+        result[i] = values[i] * factor + 0.5;
+        i = i + 1;
+    }}
+    return result;
+}}
+const limit{name} = 1000;
+declare label{name} = "row script";
+declare table{name} = {{"a": 1, "b": [1, 2, 3], "c": -limit{name} % 7}};
+if ((limit{name} >= 10) == (limit{name} != 3)) {{ scale{name}([1, 2, 3, 4], 2); }} elif (!false) {{ table{name}["a"] = 2; }}
+"""
+GENERATED_COPIES = 500
+
+def letters(n):
+    name = ""
+    while True:
+        name = chr(ord("a") + n % 26) + name
+        n = n // 26
+        if (n == 0):
+            return name
+
+def generate_source():
+    return "".join(GENERATED_CHUNK.format(name=letters(n)) for n in range(GENERATED_COPIES))
+
+def load_programs(names):
+    programs = {}
+    for filename in sorted(os.listdir(PROGRAMS)):
+        name, extension = os.path.splitext(filename)
+        if (extension == ".rs" and (not names or name in names)):
+            with (open(os.path.join(PROGRAMS, filename), "r") as f):
+                programs[name] = f.read()
+    if (not names or "generated" in names):
+        programs["generated"] = generate_source()
+    return programs
+
+# The inputs each phase needs are made before it's timed, so a run of a phase only times itself:
+# parse gets the tokens and evaluate gets the AST and a new global env
+def phase_runs(source):
+    tokens = tokenize(source)
+    ast = Parser(tokens).produce_ast()
+    return {
+        "tokenize": lambda: (tokenize, (source,)),
+        "parse": lambda: (Parser(tokens).produce_ast, ()),
+        "evaluate": lambda: (evaluate, (ast, create_global_env())),
+    }
+
+def percentile(ordered, fraction):
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def time_phase(setup, repeats):
+    fn, args = setup()
+    fn(*args)
+
+    times = []
+    for _ in range(repeats):
+        fn, args = setup()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "median": percentile(times, 0.5),
+        "p95": percentile(times, 0.95),
+        "min": times[0],
+    }
+
+def count_allocations(setup):
+    fn, args = setup()
+    collections = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        kept = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return {
+        "gc": gc.get_stats()[0]["collections"] - collections,
+        "kept": kept,
+        "peak_kb": peak // 1024,
+    }
+
+def run_benchmarks(programs, repeats):
+    results = {}
+    for name, source in programs.items():
+        runs = phase_runs(source)
+        results[name] = {}
+        # Scripts print their results, that isn't what's being measured
+        with (contextlib.redirect_stdout(io.StringIO())):
+            for phase in PHASES:
+                stats = time_phase(runs[phase], repeats)
+                stats.update(count_allocations(runs[phase]))
+                results[name][phase] = stats
+        print_program(name, results[name], None)
+    return results
+
+def print_program(name, phases, baseline):
+    for phase in PHASES:
+        stats = phases[phase]
+        line = (
+            f"{name:<14}{phase:<10}{stats['median'] * 1000:>11.3f}{stats['p95'] * 1000:>11.3f}"
+            f"{stats['gc']:>8}{stats['kept']:>10}{stats['peak_kb']:>10}"
+        )
+        if (baseline is not None and phase in baseline.get(name, {})):
+            before = baseline[name][phase]["median"]
+            line += f"{100 * (stats['median'] - before) / before:>+10.1f}%"
+        print(line)
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Time tokenizing, parsing and evaluating RowScript programs")
+    arg_parser.add_argument("programs", nargs="*", help="names of the programs to run (default: all)")
+    arg_parser.add_argument("--repeats", type=int, default=10)
+    arg_parser.add_argument("--output", metavar="FILE", help="write the results as JSON to FILE")
+    arg_parser.add_argument("--compare", metavar="FILE", help="compare the medians with the results in FILE")
+    args = arg_parser.parse_args()
+
+    programs = load_programs(set(args.programs))
+    if (len(programs) == 0):
+        arg_parser.error(f"no programs named {', '.join(args.programs)} in {PROGRAMS}")
+
+    baseline = None
+    if (args.compare is not None):
+        with (open(args.compare, "r") as f):
+            baseline = json.load(f)
+
+    print(f"{'program':<14}{'phase':<10}{'median ms':>11}{'p95 ms':>11}{'gc':>8}{'kept':>10}{'peak KB':>10}")
+    results = run_benchmarks(programs, args.repeats)
+
+    if (baseline is not None):
+        print()
+        print(f"compared with {baseline.get('revision') or args.compare}")
+        for name, phases in results.items():
+            print_program(name, phases, baseline["results"])
+
+    if (args.output is not None):
+        with (open(args.output, "w") as f):
+            json.dump({
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "repeats": args.repeats,
+                "results": results,
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Measures how many MB/s lexer.tokenize (and tokenize_compact, when it exists) get through
+# Usage: python bench/lexer_throughput.py [size_in_mb] [repeats]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import lexer
+
+# A chunk of typical RowScript that gets repeated until the source is big enough
+CHUNK = """
+// Generated test code
+fdeclare scale(values, factor) {
+    declare i = 0;
+    declare result = [0, 0, 0, 0];
+    while (i < length(values)) {
+        result[i] = values[i] * factor + 0.5;
+        i = i + 1;
+    }
+    return result;
+}
+/* multi-line
+   comment */
+const limit = 1000;
+declare name = "row script";
+if ((limit >= 10) == (limit != 3)) { print(name, scale([1, 2, 3, 4], 2)); } elif (!false) { print(-limit % 7); }
+"""
+
+def generate_source(size_mb):
+    target = int(size_mb * 1024 * 1024)
+    return CHUNK * (target // len(CHUNK) + 1)
+
+def measure(fn, source, repeats):
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(source)
+        elapsed = time.perf_counter() - start
+        if (best is None or elapsed < best):
+            best = elapsed
+    return best
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    source = generate_source(size_mb)
+    megabytes = len(source) / (1024 * 1024)
+
+    lexers = [("tokenize", lexer.tokenize)]
+    if (hasattr(lexer, "tokenize_compact")):
+        lexers.append(("tokenize_compact", lexer.tokenize_compact))
+
+    print(f"source: {megabytes:.2f} MB, best of {repeats}")
+    for name, fn in lexers:
+        elapsed = measure(fn, source, repeats)
+        print(f"{name:>18}: {elapsed:.3f}s  {megabytes / elapsed:.2f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+// Numeric code reading and writing arrays: a prefix sum, a bubble sort and a dot product
+declare size = 120;
+declare values = range(size);
+declare i = 0;
+while (i < size) {
+    values[i] = (i * 7919) % 1009 + 0.5;
+    i = i + 1;
+}
+
+declare prefix = range(size);
+prefix[0] = values[0];
+i = 1;
+while (i < size) {
+    prefix[i] = prefix[i - 1] + values[i];
+    i = i + 1;
+}
+
+i = 0;
+while (i < size) {
+    declare j = 0;
+    while (j < size - i - 1) {
+        if (values[j] > values[j + 1]) {
+            declare swap = values[j];
+            values[j] = values[j + 1];
+            values[j + 1] = swap;
+        }
+        j = j + 1;
+    }
+    i = i + 1;
+}
+
+declare dot = 0;
+i = 0;
+while (i < size) {
+    dot = dot + values[i] * prefix[i];
+    i = i + 1;
+}
+print(values[0], values[size - 1], prefix[size - 1], dot);
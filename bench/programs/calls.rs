@@ -0,0 +1,21 @@
+// Many short calls: small helpers, a native call in each iteration and callbacks from natives
+fdeclare square(x) { return x * x; }
+fdeclare add(a, b) { return a + b; }
+fdeclare clamp(x, low, high) {
+    if (x < low) { return low; }
+    if (x > high) { return high; }
+    return x;
+}
+fdeclare even(x) { return x % 2 == 0; }
+
+declare total = 0;
+declare i = 0;
+while (i < 3000) {
+    total = add(total, clamp(square(i % 50), 10, 2000));
+    total = total + length([i]);
+    i = i + 1;
+}
+declare numbers = range(1000);
+declare squares = map(numbers, square);
+declare evens = filter(squares, even);
+print(total, reduce(evens, add, 0));
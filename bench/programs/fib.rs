@@ -0,0 +1,6 @@
+// Recursive calls with little work in each one
+fdeclare fib(n) {
+    if (n < 2) { return n; }
+    return fib(n - 1) + fib(n - 2);
+}
+print(fib(18));
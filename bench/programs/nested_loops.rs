@@ -0,0 +1,16 @@
+// Nested while loops doing integer arithmetic, no calls
+declare total = 0;
+declare i = 0;
+while (i < 50) {
+    declare j = 0;
+    while (j < 50) {
+        declare k = 0;
+        while (k < 6) {
+            total = (total + i * j - k) % 1000003;
+            k = k + 1;
+        }
+        j = j + 1;
+    }
+    i = i + 1;
+}
+print(total);
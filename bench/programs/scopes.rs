@@ -0,0 +1,33 @@
+// Reads and writes of variables declared many blocks and closures further out
+declare total = 0;
+const step = 3;
+fdeclare outer(a) {
+    fdeclare middle(b) {
+        fdeclare inner(c) {
+            {
+                {
+                    {
+                        {
+                            total = total + a + b + c + step;
+                        }
+                    }
+                }
+            }
+            return total;
+        }
+        return inner(b + 1);
+    }
+    return middle(a + 1);
+}
+declare i = 0;
+while (i < 1500) {
+    {
+        {
+            {
+                outer(i % 10);
+            }
+        }
+    }
+    i = i + 1;
+}
+print(total);
@@ -0,0 +1,113 @@
+import gc
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+import lexer, parser, nodes, resolver, optimizer, values, operations, vectorized
+import vm.code, vm.compiler, vm.opcodes
+
+# Stores compiled scripts on disk so running the same file again skips tokenize and produce_ast
+# Entries are keyed by the source's hash, the engine and the interpreter version, so a changed
+# script or interpreter never loads a stale entry
+
+# Bump when the way entries are stored changes
+CACHE_FORMAT = 1
+
+# The modules that define what gets pickled (tokens, AST nodes, resolver slots, values and bytecode)
+# Any change to them gives new keys
+CACHED_MODULES = (lexer, parser, nodes, resolver, optimizer, values, operations, vectorized, vm.code, vm.compiler, vm.opcodes)
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "rowscript")
+
+_interpreter_version = None
+
+# A hash of the Python version and the source of every cached module
+def interpreter_version():
+    global _interpreter_version
+
+    if (_interpreter_version is None):
+        digest = hashlib.sha256()
+        digest.update(f"{CACHE_FORMAT}:{sys.implementation.cache_tag}".encode())
+        for module in CACHED_MODULES:
+            with (open(module.__file__, "rb") as f):
+                digest.update(f.read())
+        _interpreter_version = digest.hexdigest()
+
+    return _interpreter_version
+
+class ScriptCache:
+    def __init__(self, directory=None):
+        self.directory = directory or default_cache_dir()
+
+    # options is anything else that changes what gets compiled (e.g. the engine)
+    def key(self, source, options):
+        digest = hashlib.sha256()
+        digest.update(interpreter_version().encode())
+        digest.update(repr(options).encode())
+        digest.update(source.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    # Returns the cached entry, or None if it's missing or can't be read
+    def load(self, key):
+        # Unpickling a big AST creates a lot of objects, which would trigger many collections
+        # that can't free anything, so the garbage collector is paused until it's done
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with (open(self.path(key), "rb") as f):
+                stored_key, compiled = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # A corrupt or incompatible entry is just treated as a miss, it gets overwritten
+            return None
+        finally:
+            if (gc_enabled):
+                gc.enable()
+
+        if (stored_key != key):
+            return None
+        return compiled
+
+    # Writes to a temporary file first so other processes never see a half-written entry
+    # A failure to write only means the next run compiles again
+    def store(self, key, compiled):
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            data = pickle.dumps((key, compiled), protocol=pickle.HIGHEST_PROTOCOL)
+        except (OSError, RecursionError, pickle.PicklingError):
+            return False
+
+        temp_path = None
+        stored = False
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with (os.fdopen(fd, "wb") as f):
+                f.write(data)
+            os.replace(temp_path, self.path(key))
+            stored = True
+        except OSError:
+            pass
+        finally:
+            # Also when something that isn't an OSError goes through (e.g. a batch timeout), so
+            # no .tmp files are left in the cache dir
+            if (not stored and temp_path is not None):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+        return stored
+
+    def load_or_compile(self, source, options, compile_source):
+        key = self.key(source, options)
+        compiled = self.load(key)
+        if (compiled is None):
+            compiled = compile_source(source)
+            self.store(key, compiled)
+        return compiled
@@ -0,0 +1,44 @@
+from values import FunctionVal, NativeFunctionVal
+from environment import Frame, UNSET
+from vm.code import Code
+from vm.machine import run as run_bytecode
+from eval.expressions import call_function as call_tree_function
+
+# Lets native functions call a function value passed to them (map, filter, sort, ...)
+# Each engine makes its own kind of FunctionVal body:
+#   - "tree": the Block node of the declaration
+#   - "vm": the compiled Code, run in a new frame
+#   - "closure": the invoke closure from the closure compiler
+# function_caller() looks at the body once and returns a Python function taking a list of
+# arguments, so a native calling it for every element doesn't redo the checks
+# env is the env the native was called with, native callbacks get it too
+
+def function_caller(name, fn, env, arg_count):
+    if (type(fn) is NativeFunctionVal):
+        native = fn.fn
+        return lambda args: native(args, env)
+
+    if (type(fn) is not FunctionVal):
+        raise Exception(f"{name}() expects a function")
+    if (fn.arity != arg_count):
+        raise Exception("Incorrect number of arguments")
+
+    body = fn.body
+    parent = fn.env
+
+    if (type(body) is Code):
+        size = body.frame_size
+
+        def call_code(args):
+            if (size > arg_count):
+                args.extend([UNSET] * (size - arg_count))
+            return run_bytecode(body, Frame(parent, args))
+        return call_code
+
+    if (callable(body)):
+        # fn is read here (not just its env) so the sampler can tell which function runs
+        def call_closure(args):
+            return body(fn.env, args)
+        return call_closure
+
+    return lambda args: call_tree_function(fn, args)
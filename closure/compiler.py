@@ -0,0 +1,415 @@
+from nodes import NodeType
+from values import StringVal, FunctionVal, NativeFunctionVal, ArrayVal, MapVal, NULL, NUMBER_TYPES
+from environment import Frame, UNSET, find_declared
+from signals import ReturnSignal
+from memo import memoize
+from operations import (
+    BINARY_OPERATORS, UNARY_OPERATORS, COMPARISON_OPERATORS,
+    index_get, index_set
+    )
+
+# Turns the AST into nested Python closures, one per node
+# Each closure takes the frame it runs in and returns the same value evaluate() would
+# Children, operator functions, literal values and variable slots are all looked up here, once
+# The AST has to go through the resolver first
+class ClosureCompiler:
+    def __init__(self, in_function=False):
+        self.in_function = in_function
+
+    def compile_program(self, program):
+        return self.compile_body(program.body)
+
+    def compile_node(self, node):
+        match node.type:
+            case NodeType.NUMERIC_LITERAL | NodeType.LITERAL:
+                return self.compile_constant(node.value)
+            case NodeType.STRING_LITERAL:
+                return self.compile_constant(StringVal(node.value))
+            case NodeType.IDENTIFIER:
+                return self.compile_identifier(node)
+            case NodeType.BINARY_EXPR:
+                return self.compile_operator(node, BINARY_OPERATORS)
+            case NodeType.COMPARISON_EXPR:
+                return self.compile_operator(node, COMPARISON_OPERATORS)
+            case NodeType.UNARY_EXPR:
+                return self.compile_unary_expr(node)
+            case NodeType.ASSIGNMENT_EXPR:
+                return self.compile_assignment_expr(node)
+            case NodeType.VAR_DECLARATION:
+                return self.compile_var_declaration(node)
+            case NodeType.BLOCK:
+                return self.compile_block(node)
+            case NodeType.IF_STMT:
+                return self.compile_if_stmt(node)
+            case NodeType.WHILE_LOOP:
+                return self.compile_while_loop(node)
+            case NodeType.FUNCTION_DECLARATION:
+                return self.compile_function_decl(node)
+            case NodeType.CALL_EXPR:
+                return self.compile_call_expr(node)
+            case NodeType.RETURN_STMT:
+                return self.compile_return_stmt(node)
+            case NodeType.ARRAY_LITERAL:
+                return self.compile_array_literal(node)
+            case NodeType.INDEX_EXPR:
+                return self.compile_index_expr(node)
+            case NodeType.MAP_LITERAL:
+                return self.compile_map_literal(node)
+            case _:
+                raise Exception(f"No evaluation rule for {node.type}")
+
+    # Runs a list of statements in the frame it's given and returns the last value
+    # A ReturnSignal stops it early, only bodies that have a return somewhere check for one
+    def compile_body(self, statements):
+        stmts = tuple(self.compile_node(stmt) for stmt in statements)
+
+        if (len(stmts) == 1):
+            return stmts[0]
+
+        if (not any(can_return(stmt) for stmt in statements)):
+            def body(frame):
+                last = NULL
+                for stmt in stmts:
+                    last = stmt(frame)
+                return last
+            return body
+
+        def returning_body(frame):
+            last = NULL
+            for stmt in stmts:
+                last = stmt(frame)
+                if (type(last) is ReturnSignal):
+                    break
+            return last
+        return returning_body
+
+    def compile_constant(self, value):
+        def constant(frame):
+            return value
+        return constant
+
+    def compile_identifier(self, node):
+        name = node.symbol
+        slot = node.slot
+        depth = node.depth
+
+        if (slot is None):
+            def global_var(frame):
+                return frame.globals.lookup_var(name)
+            return global_var
+
+        if (not node.checked):
+            if (depth == 0):
+                def local_var(frame):
+                    return frame.slots[slot]
+                return local_var
+            if (depth == 1):
+                def parent_var(frame):
+                    return frame.parent.slots[slot]
+                return parent_var
+
+        # Until the slot is declared the name is found further out (see Resolver.resolve_identifier)
+        addresses = ((depth, slot, node.constant),) + node.fallbacks
+        def outer_var(frame):
+            outer_slots, found, is_const = find_declared(frame, addresses)
+            if (outer_slots is None):
+                return frame.globals.lookup_var(name)
+            return outer_slots[found]
+        return outer_var
+
+    def compile_operator(self, node, operators):
+        left = self.compile_node(node.left)
+        right = self.compile_node(node.right)
+        operator_fn = operators.get(node.operator)
+        if (operator_fn is None):
+            raise Exception(f"Unknown operator {node.operator}")
+
+        def operator(frame):
+            return operator_fn(left(frame), right(frame))
+        return operator
+
+    def compile_unary_expr(self, node):
+        operand = self.compile_node(node.operand)
+        operator_fn = UNARY_OPERATORS.get(node.operator)
+        if (operator_fn is None):
+            raise Exception(f"Unknown unary operator {node.operator}")
+
+        def unary(frame):
+            return operator_fn(operand(frame))
+        return unary
+
+    def compile_assignment_expr(self, node):
+        value = self.compile_node(node.value)
+        if (node.error is not None):
+            return compile_error(value, node.error)
+
+        if (node.assignee.type == NodeType.IDENTIFIER):
+            name = node.assignee.symbol
+            slot = node.assignee.slot
+            depth = node.assignee.depth
+
+            if (slot is None):
+                def assign_global(frame):
+                    return frame.globals.assign_var(name, value(frame))
+                return assign_global
+
+            if (depth == 0 and not node.assignee.checked):
+                def assign_local(frame):
+                    new_value = value(frame)
+                    frame.slots[slot] = new_value
+                    return new_value
+                return assign_local
+
+            addresses = ((depth, slot, node.assignee.constant),) + node.assignee.fallbacks
+            def assign_outer(frame):
+                new_value = value(frame)
+                outer_slots, found, is_const = find_declared(frame, addresses)
+                if (outer_slots is None):
+                    return frame.globals.assign_var(name, new_value)
+                if (is_const):
+                    raise Exception(f"Cannot reassign constant '{name}'.")
+                outer_slots[found] = new_value
+                return new_value
+            return assign_outer
+
+        if (node.assignee.type == NodeType.INDEX_EXPR):
+            array = self.compile_node(node.assignee.array)
+            index = self.compile_node(node.assignee.index)
+
+            # Same order as eval_assignment_expr: value, array, then index
+            def assign_index(frame):
+                new_value = value(frame)
+                array_val = array(frame)
+                return index_set(array_val, index(frame), new_value)
+            return assign_index
+
+        def invalid_assignment(frame):
+            raise Exception("Invalid assignment target")
+        return invalid_assignment
+
+    def compile_var_declaration(self, node):
+        value = self.compile_node(node.value)
+        if (node.error is not None):
+            return compile_error(value, node.error)
+        return self.compile_declaration(node.identifier.value, node.slot, node.isConst, value)
+
+    def compile_declaration(self, name, slot, is_const, value):
+        if (slot is None):
+            def declare_global(frame):
+                frame.globals.declare_var(name, value(frame), is_const)
+                return NULL
+            return declare_global
+
+        def declare_local(frame):
+            frame.slots[slot] = value(frame)
+            return NULL
+        return declare_local
+
+    def compile_block(self, node):
+        body = self.compile_body(node.body)
+        size = node.frame_size
+
+        # Blocks without declarations run in the frame they're in
+        if (size == 0):
+            return body
+
+        def block(frame):
+            # Creates a new frame under the frame the block was declared in
+            return body(Frame(frame, [UNSET] * size))
+        return block
+
+    def compile_if_stmt(self, node):
+        branches = [(self.compile_node(node.condition), self.compile_node(node.body), "If")]
+        for elif_condition, elif_block in node.elif_branches:
+            branches.append((self.compile_node(elif_condition), self.compile_node(elif_block), "Elif"))
+        branches = tuple(branches)
+
+        else_block = None
+        if (node.else_block is not None):
+            else_block = self.compile_node(node.else_block)
+
+        def if_stmt(frame):
+            for condition, block, keyword in branches:
+                condition_val = condition(frame)
+                if (condition_val is True):
+                    return block(frame)
+                if (condition_val is not False):
+                    raise Exception(f"{keyword} condition must be a boolean")
+
+            if (else_block is not None):
+                return else_block(frame)
+            return NULL
+        return if_stmt
+
+    def compile_while_loop(self, node):
+        condition = self.compile_node(node.condition)
+        body = self.compile_node(node.body)
+        returns = can_return(node.body)
+
+        def while_loop(frame):
+            result = NULL
+            condition_val = condition(frame)
+
+            if (type(condition_val) is bool):
+                while True:
+                    condition_val = condition(frame)
+
+                    if (condition_val is False):
+                        break
+                    if (condition_val is not True):
+                        raise Exception("While condition must be a boolean")
+                    result = body(frame)
+                    if (returns and type(result) is ReturnSignal):
+                        break
+
+                return result
+
+            # while(n){} will run the loop n times (even if n is modified during the loop)
+            if (type(condition_val) in NUMBER_TYPES):
+                iterations = condition_val
+
+                if (iterations < 0):
+                    raise Exception("While loop input must be positive")
+
+                i = 0
+                while (i < iterations):
+                    result = body(frame)
+                    if (returns and type(result) is ReturnSignal):
+                        break
+                    i += 1
+
+                return result
+
+            raise Exception("While condition must be a boolean or a number")
+        return while_loop
+
+    def compile_function_decl(self, node):
+        # The body is compiled once, here, and shared by every FunctionVal made from it
+        # Two params with the same name raise once the call starts
+        if (node.params_error is not None):
+            body = compile_error(lambda frame: NULL, node.params_error)
+        else:
+            body = ClosureCompiler(in_function=True).compile_body(node.body.body)
+        params = node.params
+        name = node.name
+        size = node.frame_size
+
+        # Runs the body in a new frame under the frame the function was defined in
+        # The params take the first slots
+        if (not any(can_return(stmt) for stmt in node.body.body)):
+            def invoke(parent, args):
+                if (size > len(args)):
+                    args.extend([UNSET] * (size - len(args)))
+                return body(Frame(parent, args))
+        else:
+            def invoke(parent, args):
+                if (size > len(args)):
+                    args.extend([UNSET] * (size - len(args)))
+                result = body(Frame(parent, args))
+                if (type(result) is ReturnSignal):
+                    return result.value
+                return result
+
+        if (node.pure):
+            def make_function(frame):
+                return memoize(FunctionVal(params, invoke, frame, name=name, declaration=node), frame.globals)
+        else:
+            def make_function(frame):
+                return FunctionVal(params, invoke, frame, name=name, declaration=node)
+        if (node.error is not None):
+            return compile_error(make_function, node.error)
+        return self.compile_declaration(node.name, node.slot, True, make_function)
+
+    def compile_call_expr(self, node):
+        callee = self.compile_node(node.callee)
+        args = tuple(self.compile_node(arg) for arg in node.args)
+        arg_count = len(args)
+
+        def call(frame):
+            fn = callee(frame)
+
+            # Native functions
+            if (type(fn) is NativeFunctionVal):
+                return fn.fn([arg(frame) for arg in args], frame.globals)
+
+            if (type(fn) is not FunctionVal):
+                raise Exception("Can only call functions")
+
+            if (arg_count != len(fn.params)):
+                raise Exception("Incorrect number of arguments")
+
+            return fn.body(fn.env, [arg(frame) for arg in args])
+        return call
+
+    def compile_return_stmt(self, node):
+        if (not self.in_function):
+            def return_outside_function(frame):
+                raise Exception("Return statement can only be used inside a function")
+            return return_outside_function
+
+        if (node.value is None):
+            def return_null(frame):
+                return ReturnSignal(NULL)
+            return return_null
+
+        value = self.compile_node(node.value)
+
+        def return_stmt(frame):
+            return ReturnSignal(value(frame))
+        return return_stmt
+
+    def compile_array_literal(self, node):
+        elements = tuple(self.compile_node(element) for element in node.elements)
+
+        def array_literal(frame):
+            return ArrayVal([element(frame) for element in elements])
+        return array_literal
+
+    def compile_map_literal(self, node):
+        entries = tuple((self.compile_node(key), self.compile_node(value)) for key, value in node.entries)
+
+        def map_literal(frame):
+            map_val = MapVal()
+            for key, value in entries:
+                map_val.set(key(frame), value(frame))
+            return map_val
+        return map_literal
+
+    def compile_index_expr(self, node):
+        array = self.compile_node(node.array)
+        index = self.compile_node(node.index)
+
+        def index_expr(frame):
+            array_val = array(frame)
+            return index_get(array_val, index(frame))
+        return index_expr
+
+# Whether running the statement can give back a ReturnSignal
+# Expressions can't contain statements, and a return in a nested function ends that function
+def can_return(node):
+    match node.type:
+        case NodeType.RETURN_STMT:
+            return True
+        case NodeType.BLOCK:
+            return any(can_return(stmt) for stmt in node.body)
+        case NodeType.IF_STMT:
+            if (can_return(node.body)):
+                return True
+            if (any(can_return(block) for condition, block in node.elif_branches)):
+                return True
+            return node.else_block is not None and can_return(node.else_block)
+        case NodeType.WHILE_LOOP:
+            return can_return(node.body)
+        case _:
+            return False
+
+# A statement the resolver found an error in: value runs first, as with the tree-walker, and
+# then the error is raised
+def compile_error(value, message):
+    def fail(frame):
+        value(frame)
+        raise Exception(message)
+    return fail
+
+def compile_program(program):
+    return ClosureCompiler().compile_program(program)
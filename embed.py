@@ -0,0 +1,168 @@
+from lexer import tokenize, iter_tokens
+from parser import Parser
+from nodes import Program
+from eval.interpreter import evaluate
+from vm.compiler import compile_program as compile_bytecode
+from vm.machine import execute as run_bytecode
+from closure.compiler import compile_program as compile_closures
+from resolver import resolve
+from optimizer import optimize
+from environment import Environment, Frame
+from values import NULL, RuntimeVal, StringVal, ArrayVal, MapVal, key_value
+from library import create_global_env
+import tasks
+
+# Running RowScript from Python: the helpers main.py is built on, and Interpreter for embedding
+#   interpreter = Interpreter(engine="closure")
+#   program = interpreter.compile(source)
+#   interpreter.execute(program, globals={"limit": 10, "names": ["a", "b"]})
+# compile() does everything that doesn't depend on the inputs once (tokenizing, parsing,
+# resolving, compiling), so executing the same program again only pays for running it.
+# Every run gets a new env for its inputs and top-level declarations, on top of one global env
+# of natives and constants that every run shares and none can change
+
+# "tree" walks the AST with evaluate(), "vm" compiles it to bytecode first
+# and "closure" compiles it to nested Python closures first
+ENGINES = ("tree", "vm", "closure")
+
+def run(source, env, engine="tree", optimized=False):
+    return execute(compile_source(source, engine, optimized), env, engine)
+
+def parse(source):
+    tokens = tokenize(source)
+    parser = Parser(tokens)
+    ast = parser.produce_ast()
+    # print(ast)
+    return ast
+
+# Everything that can be done before running: the AST for "tree", the resolved AST
+# for "closure" (closures can't be cached) and the bytecode for "vm"
+def compile_ast(ast, engine, optimized=False):
+    if (optimized):
+        ast = optimize(ast)
+    if (engine == "vm"):
+        return compile_bytecode(resolve(ast))
+    if (engine == "closure"):
+        return resolve(ast)
+    return ast
+
+def compile_source(source, engine, optimized=False):
+    return compile_ast(parse(source), engine, optimized)
+
+# Parses and runs one top-level statement at a time, each one is dropped once it has run
+# Output starts before the whole file is parsed and memory is bounded by the largest statement
+def run_stream(source, env, engine="tree", optimized=False):
+    parser = Parser(iter_tokens(source))
+    result = NULL
+    for stmt in parser.iter_statements():
+        program = Program()
+        program.body.append(stmt)
+        result = execute(compile_ast(program, engine, optimized), env, engine)
+    return result
+
+# Runs the output of compile_ast()
+def execute(compiled, env, engine):
+    if (engine == "vm"):
+        return run_bytecode(compiled, env)
+    if (engine == "closure"):
+        return compile_closures(compiled)(Frame.root(env))
+
+    result = evaluate(compiled, env)
+    return result
+
+# A compiled script, made by Interpreter.compile()
+# It never changes once made, so it can be kept and executed any number of times (the
+# tree-walker stores a few facts about the program in its nodes the first time
+# they run, those are the same on every run). The closures are made here too, unlike execute()
+class CompiledProgram:
+    __slots__ = ("engine", "optimized", "code", "runner")
+
+    def __init__(self, engine, optimized, code):
+        object.__setattr__(self, "engine", engine)
+        object.__setattr__(self, "optimized", optimized)
+        object.__setattr__(self, "code", code)
+        if (engine == "closure"):
+            closures = compile_closures(code)
+            runner = lambda env: closures(Frame.root(env))
+        elif (engine == "vm"):
+            runner = lambda env: run_bytecode(code, env)
+        else:
+            runner = lambda env: evaluate(code, env)
+        object.__setattr__(self, "runner", runner)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("A compiled program can't be changed")
+
+class Interpreter:
+    def __init__(self, engine="tree", optimized=False):
+        if (engine not in ENGINES):
+            raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(ENGINES)}")
+        self.engine = engine
+        self.optimized = optimized
+        # Shared by every run: nothing is ever declared in it and every name in it is a
+        # constant, so a run can't change it. A run's own declarations go in its own env
+        # under it, so a script may declare its own print, sum, ...
+        self.base_env = create_global_env()
+        env = self.base_env
+        while (env is not None):
+            env.constants.update(env.variables)
+            env = env.parent
+
+    def compile(self, source):
+        return CompiledProgram(self.engine, self.optimized, compile_source(source, self.engine, self.optimized))
+
+    # Runs program in a new env, where every name in globals is declared (as a variable) with the
+    # RowScript version of its value, see to_value(). Returns the value of the last statement
+    # as a Python value
+    def execute(self, program, globals=None):
+        if (type(program) is not CompiledProgram):
+            raise TypeError("execute() expects a program made by Interpreter.compile()")
+        if (program.engine != self.engine):
+            raise ValueError(f"The program was compiled for the {program.engine} engine, not {self.engine}")
+
+        env = Environment(parent=self.base_env, in_function=False)
+        if (globals is not None):
+            for name, value in globals.items():
+                env.declare_var(name, to_value(value))
+        try:
+            result = program.runner(env)
+            tasks.finish()
+        finally:
+            tasks.abort()
+        return to_python(result)
+
+    # Compiles and runs source once
+    def run(self, source, globals=None):
+        return self.execute(self.compile(source), globals)
+
+# The RowScript value for a Python value: str becomes a string, list and tuple an array and
+# dict a map. Numbers, booleans and None are already RowScript values, and so are RowScript
+# values themselves (e.g. a NativeFunctionVal the script can call)
+def to_value(value):
+    value_type = type(value)
+    if (value_type is int or value_type is float or value_type is bool or value is None):
+        return value
+    if (value_type is str):
+        return StringVal(value)
+    if (value_type is list or value_type is tuple):
+        return ArrayVal([to_value(element) for element in value])
+    if (value_type is dict):
+        result = MapVal()
+        for key, element in value.items():
+            result.set(to_value(key), to_value(element))
+        return result
+    if (isinstance(value, RuntimeVal)):
+        return value
+    raise TypeError(f"Cannot pass a {value_type.__name__} to RowScript")
+
+# The Python value for a RowScript value, the other way around from to_value()
+# Functions are returned as they are
+def to_python(value):
+    value_type = type(value)
+    if (value_type is StringVal):
+        return value.value
+    if (value_type is ArrayVal):
+        return [to_python(element) for element in value.elements]
+    if (value_type is MapVal):
+        return {to_python(key_value(key)): to_python(element) for key, element in value.entries.items()}
+    return value
@@ -1,10 +1,17 @@
-
 class Environment:
-    def __init__(self, parent=None, in_function=False):
+    # Bumped by every declaration that could change which env a name resolves to
+    # The tree-walker's inline caches (see eval_identifier) are only used while it stays the same
+    version = 0
+
+    # local is for the envs of blocks and calls
+    def __init__(self, parent=None, in_function=False, local=False):
         self.parent = parent
         self.variables = {}
         self.constants = set()
         self.in_function = in_function
+        # The innermost env that isn't local: looking up a name that no block or function
+        # around the read declares can start here instead of walking up every block and call env
+        self.globals = parent.globals if local else self
 
     def declare_var(self, name, value, isConst = False):
         if (name in self.variables):
@@ -13,6 +20,14 @@ class Environment:
         self.variables[name] = value
         if(isConst):
             self.constants.add(name)
+        if (self.globals is self):
+            # A new global only changes where a name is found when it hides one declared above it
+            env = self.parent
+            while (env is not None):
+                if (name in env.variables):
+                    Environment.version += 1
+                    break
+                env = env.parent
         return value
     
     def assign_var(self, name, value):
@@ -37,4 +52,35 @@ class Environment:
         if (self.parent is None):
             raise Exception(f"Cannot resolve '{name}' as it does not exist.")
 
-        return self.parent.resolve(name)
\ No newline at end of file
+        return self.parent.resolve(name)
+
+# Marks a slot whose declaration hasn't run yet
+UNSET = object()
+
+# Slot-indexed frame used by the engines that run the resolver first (see resolver.py)
+# Local variables live in a fixed-size list, the address from the resolver says how many
+# parents to walk up (depth) and which slot to use. Global names still live in an Environment.
+class Frame:
+    __slots__ = ("parent", "slots", "globals")
+
+    def __init__(self, parent, slots, globals=None):
+        self.parent = parent
+        self.slots = slots
+        self.globals = parent.globals if parent is not None else globals
+
+    # The outermost frame, top-level code runs in it with nothing but the global env
+    @staticmethod
+    def root(env):
+        return Frame(None, [], env)
+
+# The slots, slot and constness of the first (depth, slot, is_const) address whose declaration
+# has run, (None, None, False) if none has and the name has to be looked up in the globals
+def find_declared(frame, addresses):
+    for depth, slot, is_const in addresses:
+        target = frame
+        while (depth > 0):
+            target = target.parent
+            depth -= 1
+        if (target.slots[slot] is not UNSET):
+            return target.slots, slot, is_const
+    return None, None, False
@@ -0,0 +1,2 @@
+# interpreter.py has to be loaded before expressions.py and statements.py, see the end of it
+from . import interpreter
@@ -1,50 +1,32 @@
 from nodes import NodeType
-from values import NumberVal, NullVal, BoolVal, ArrayVal
+from values import NULL, ArrayVal, MapVal, FunctionVal, NativeFunctionVal
 from environment import Environment
 from signals import ReturnSignal
-# evaluate is imported locally to avoid circular import
+from operations import (
+    BINARY_OPERATORS, UNARY_OPERATORS, COMPARISON_OPERATORS,
+    index_get, index_set
+    )
+# interpreter.py defines evaluate before it imports this module, so it can be imported here
+from .interpreter import evaluate
 
 def eval_binary_expr(node, env):
-    from .interpreter import evaluate
-
     left = evaluate(node.left, env)
     right = evaluate(node.right, env)
 
-    if (left.type != "number" or right.type != "number"):
-        raise Exception("Only numbers supported when evaluating binary expressions")
-
-    if (node.operator == "+"):
-        return NumberVal(left.value + right.value)
-    if (node.operator == "-"):
-        return NumberVal(left.value - right.value)
-    if (node.operator == "*"):
-        return NumberVal(left.value * right.value)
-    if (node.operator == "/"):
-        return NumberVal(left.value / right.value)
-    if (node.operator == "%"):
-        return NumberVal(left.value % right.value)
-    
-    raise Exception(f"Unknown operator {node.operator}")
+    operator_fn = BINARY_OPERATORS.get(node.operator)
+    if (operator_fn is None):
+        raise Exception(f"Unknown operator {node.operator}")
+    return operator_fn(left, right)
 
 def eval_unary_expr(node, env):
-    from .interpreter import evaluate
-
     operand = evaluate(node.operand, env)
 
-    if (node.operator == "-"):
-        if (operand.type != "number"):
-            raise Exception("Unary '-' expects a number")
-        return NumberVal(-operand.value)
-    if (node.operator == "!"):
-        if (operand.type != "boolean"):
-            raise Exception("Unary '!' expects a boolean")
-        return BoolVal(not operand.value)
-
-    raise Exception(f"Unknown unary operator {node.operator}")
+    operator_fn = UNARY_OPERATORS.get(node.operator)
+    if (operator_fn is None):
+        raise Exception(f"Unknown unary operator {node.operator}")
+    return operator_fn(operand)
 
 def eval_assignment_expr(node, env):
-    from .interpreter import evaluate
-
     if (node.assignee.type == NodeType.IDENTIFIER):
         value = evaluate(node.value, env)
         env.assign_var(node.assignee.symbol, value)
@@ -54,127 +36,194 @@ def eval_assignment_expr(node, env):
         value = evaluate(node.value, env)
         array_val = evaluate(node.assignee.array, env)
         index_val = evaluate(node.assignee.index, env)
-
-        if (array_val.type != "array"):
-            raise Exception("Can only index arrays")
-        if (index_val.type != "number"):
-            raise Exception("Array index must be a number")
-        if (index_val.value < 0 or index_val.value >= len(array_val.elements)):
-            raise Exception("Array index out of bounds")
-
-        array_val.elements[index_val.value] = value
-        return value
+        return index_set(array_val, index_val, value)
     
     # To make sure something like (1+2) = 5 isn't allowed
     raise Exception("Invalid assignment target")
 
-def eval_call_expr(node, env):
-    from .interpreter import evaluate
+# Call envs of finished calls that nothing can reach anymore, the next call reuses one
+# instead of building a new Environment (see FunctionVal.reuse_env)
+free_call_envs = []
+MAX_FREE_CALL_ENVS = 64
+
+# Every call of a tree-walker function starts with acquire_call_env() and ends with
+# release_call_env(), even when an error goes through it, so the profiler times calls by
+# wrapping the two (see profiler.py)
+
+# A new env for a call of fn, or a free one set up as if it were new
+def acquire_call_env(fn):
+    if (fn.reuse_env and len(free_call_envs) > 0):
+        call_env = free_call_envs.pop()
+        call_env.parent = fn.env
+        call_env.globals = fn.env.globals
+        return call_env
+    return Environment(parent=fn.env, in_function=True, local=True)
+
+# Called once the call is over, keeps call_env for the next call if nothing can reach it
+def release_call_env(fn, call_env):
+    if (fn.reuse_env and len(free_call_envs) < MAX_FREE_CALL_ENVS):
+        call_env.parent = None
+        call_env.globals = None
+        call_env.variables.clear()
+        call_env.constants.clear()
+        free_call_envs.append(call_env)
 
+def eval_call_expr(node, env):
     # env is where the function is called
     # fn.env is where the function was defined
     # call_env will be a new env created for each call
 
-    # Get the FunctionVal
-    fn = evaluate(node.callee, env)
+    # Get the FunctionVal, from the callee's inline cache if it's a global (see eval_identifier)
+    # The callee is an identifier unless the optimizer replaced a constant with its literal
+    callee = node.callee
+    if (callee.type != NodeType.IDENTIFIER):
+        fn = evaluate(callee, env)
+    else:
+        cache = callee.cache
+        if (cache[0] is env.globals and cache[2] == Environment.version):
+            fn = cache[1].variables[callee.symbol]
+        else:
+            fn = lookup_identifier(callee, env)
 
     # Native functions
-    if (fn.type == "native_function"):
+    if (type(fn) is NativeFunctionVal):
         args = []
         for arg in node.args:
             value = evaluate(arg, env)
             args.append(value)
         return fn.fn(args, env)
 
-    if (fn.type != "function"):
+    if (type(fn) is not FunctionVal):
         raise Exception("Can only call functions")
 
-    if (len(node.args) != len(fn.params)):
+    if (len(node.args) != fn.arity):
         raise Exception("Incorrect number of arguments")
 
-    # An env to hold local variables and params
-    call_env = Environment(parent=fn.env, in_function=True)
-
-    # Setting up the params
-    i = 0
-    while (i < len(fn.params)):
-        param = fn.params[i]
-        arg = node.args[i]
+    if (not fn.unique_params):
+        return call_declaring_params(fn, node, env)
 
-        # We use the env with the variables available when the function was called (env)
-        # The params will be kept in the local env (call_env)
-        value = evaluate(arg, env)
-        call_env.declare_var(param, value)
+    # We use the env with the variables available when the function was called (env)
+    # The arguments are evaluated before the call starts (see acquire_call_env)
+    args = [evaluate(arg, env) for arg in node.args]
 
-        i += 1
+    # An env to hold local variables and params
+    # The params are all different names in an empty env so they're stored directly
+    call_env = acquire_call_env(fn)
+    call_env.variables.update(zip(fn.params, args))
 
-    result = NullVal()
+    result = NULL
 
-    # If "return" is parsed, a ReturnSignal is called, otherwise functions return the last statement evaluated
+    # If "return" is parsed, a ReturnSignal comes back, otherwise functions return the last statement evaluated
+    # eval_block() creates a new env so I'll avoid using it
     try:
-        # eval_block() creates a new env so I'll avoid using it
         for stmt in fn.body.body:
             # The function body runs in the local env (call_env), not the caller's env (env)
             result = evaluate(stmt, call_env)
-            
-    except ReturnSignal as return_signal:
-        return return_signal.value
+            if (type(result) is ReturnSignal):
+                result = result.value
+                break
+    finally:
+        release_call_env(fn, call_env)
+    return result
+
+# The original call path, used when two params share a name: each param is declared
+# right after its argument is evaluated, so the repeated one raises at the same point
+def call_declaring_params(fn, node, env):
+    call_env = acquire_call_env(fn)
+
+    try:
+        # Setting up the params
+        i = 0
+        while (i < len(fn.params)):
+            param = fn.params[i]
+            arg = node.args[i]
+
+            value = evaluate(arg, env)
+            call_env.declare_var(param, value)
 
+            i += 1
+
+        result = NULL
+        for stmt in fn.body.body:
+            result = evaluate(stmt, call_env)
+            if (type(result) is ReturnSignal):
+                result = result.value
+                break
+    finally:
+        release_call_env(fn, call_env)
     return result
 
-def eval_comp_expr(node, env):
-    from .interpreter import evaluate
+# Calls fn with arguments that are already evaluated, for natives that take a function
+# (map, filter, sort, ...), see callbacks.py. The caller has checked the number of arguments
+def call_function(fn, args):
+    call_env = acquire_call_env(fn)
+
+    try:
+        if (fn.unique_params):
+            call_env.variables.update(zip(fn.params, args))
+        else:
+            for param, value in zip(fn.params, args):
+                call_env.declare_var(param, value)
+
+        result = NULL
+        for stmt in fn.body.body:
+            result = evaluate(stmt, call_env)
+            if (type(result) is ReturnSignal):
+                result = result.value
+                break
+    finally:
+        release_call_env(fn, call_env)
+    return result
 
+def eval_comp_expr(node, env):
     left = evaluate(node.left, env)
     right = evaluate(node.right, env)
 
-    # Comparisons with null (which doesn't have a .value)
-    if (left.type == "null" or right.type == "null"):
-        if (node.operator == "=="):
-            return BoolVal(left.type == "null" and right.type == "null")
-        if (node.operator == "!="):
-            return BoolVal(not (left.type == "null" and right.type == "null"))
-        raise Exception(f"Cannot compare null {right.type} with {left.type}")
-
-    if (left.type != right.type):
-        raise Exception("Cannot compare values of different types")
-    
-    if node.operator == "==":
-        return BoolVal(left.value == right.value)
-    if node.operator == "!=":
-        return BoolVal(left.value != right.value)
-    if node.operator == ">":
-        return BoolVal(left.value > right.value)
-    if node.operator == ">=":
-        return BoolVal(left.value >= right.value)
-    if node.operator == "<":
-        return BoolVal(left.value < right.value)
-    if node.operator == "<=":
-        return BoolVal(left.value <= right.value)
+    operator_fn = COMPARISON_OPERATORS.get(node.operator)
+    if (operator_fn is None):
+        raise Exception(f"Unknown operator {node.operator}")
+    return operator_fn(left, right)
     
+# A name that no block or function around the read declares (see mark_local_names) can only
+# be found from env.globals. So the node remembers the env holding the name, and the next read
+# is a single check plus a load. The check fails when the read runs under another global env
+# (another run of the same program) or after any declaration that could make the name resolve
+# to a different env
+# Assignments don't need to change the version: they replace the value in the env the
+# cache points to, the one the next read loads from
 def eval_identifier(node, env):
-    return env.lookup_var(node.symbol)
+    cache = node.cache
+    if (cache[0] is env.globals and cache[2] == Environment.version):
+        return cache[1].variables[node.symbol]
+    return lookup_identifier(node, env)
+
+# The slow path of eval_identifier(), filling in the node's cache when the name isn't local
+def lookup_identifier(node, env):
+    symbol = node.symbol
+    if (node.maybe_local):
+        return env.lookup_var(symbol)
+
+    # Read first, a declaration made while the name is looked up leaves the cache stale
+    version = Environment.version
+    global_env = env.globals
+    holder = global_env.resolve(symbol)
+    node.cache = (global_env, holder, version)
+    return holder.variables[symbol]
 
 def eval_array_literal(node, env):
-    from .interpreter import evaluate
-
     elements = []
     for element in node.elements:
         value = evaluate(element, env)
         elements.append(value)
     return ArrayVal(elements)
 
-def eval_index_expr(node, env):
-    from .interpreter import evaluate
+def eval_map_literal(node, env):
+    map_val = MapVal()
+    for key, value in node.entries:
+        map_val.set(evaluate(key, env), evaluate(value, env))
+    return map_val
 
+def eval_index_expr(node, env):
     array_val = evaluate(node.array, env)
     index_val = evaluate(node.index, env)
-
-    if (array_val.type != "array"):
-        raise Exception("Can only index arrays")
-    if (index_val.type != "number"):
-        raise Exception("Array index must be a number")
-    if (index_val.value < 0 or index_val.value >= len(array_val.elements)):
-        raise Exception("Array index out of bounds")
-
-    return array_val.elements[index_val.value]
\ No newline at end of file
+    return index_get(array_val, index_val)
\ No newline at end of file
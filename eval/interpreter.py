@@ -1,21 +1,12 @@
 from nodes import NodeType
-from values import NumberVal, StringVal
-from .expressions import (
-    eval_comp_expr, eval_assignment_expr, eval_binary_expr, 
-    eval_call_expr, eval_identifier, eval_unary_expr, eval_array_literal,
-    eval_index_expr
-    )
-from .statements import (
-    eval_program, eval_if_stmt, eval_block, eval_function_decl, 
-    eval_var_declaration, eval_while_loop, eval_return_stmt
-    )
+from values import StringVal
 
 def evaluate(node, env):
     match node.type:
         case NodeType.PROGRAM:
             return eval_program(node, env)
-        case NodeType.NUMERIC_LITERAL:
-            return NumberVal(node.value)
+        case NodeType.NUMERIC_LITERAL | NodeType.LITERAL:
+            return node.value
         case NodeType.STRING_LITERAL:
             return StringVal(node.value)
         case NodeType.BINARY_EXPR:
@@ -46,11 +37,18 @@ def evaluate(node, env):
             return eval_array_literal(node, env)
         case NodeType.INDEX_EXPR:
             return eval_index_expr(node, env)
+        case NodeType.MAP_LITERAL:
+            return eval_map_literal(node, env)
         case _:
             raise Exception(f"No evaluation rule for {node.type}")
 
-
-    
-
-
-
+# Imported after evaluate() is defined, they import it back from here
+from .expressions import (
+    eval_comp_expr, eval_assignment_expr, eval_binary_expr, 
+    eval_call_expr, eval_identifier, eval_unary_expr, eval_array_literal,
+    eval_index_expr, eval_map_literal
+    )
+from .statements import (
+    eval_program, eval_if_stmt, eval_block, eval_function_decl, 
+    eval_var_declaration, eval_while_loop, eval_return_stmt
+    )
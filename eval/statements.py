@@ -1,84 +1,186 @@
-from values import NullVal, FunctionVal
+from nodes import NodeType
+from values import NULL, NUMBER_TYPES, FunctionVal
 from environment import Environment
 from signals import ReturnSignal
-# evaluate is imported locally to avoid circular import
+from memo import memoize
+# interpreter.py defines evaluate before it imports this module, so it can be imported here
+from .interpreter import evaluate
 
 def eval_program(node, env):
-    from .interpreter import evaluate
+    if (not node.locals_marked):
+        mark_local_names(node, frozenset())
+        node.locals_marked = True
 
-    last = NullVal()
+    last = NULL
     for stmt in node.body:
         last = evaluate(stmt, env)
     return last
 
 def eval_block(node, env):
-    from .interpreter import evaluate
-
     # Creates a new env under the env the block was declared in
-    block_env = Environment(parent = env)
+    block_env = Environment(parent = env, in_function = env.in_function, local = True)
 
-    last = NullVal()
+    last = NULL
     for stmt in node.body:
         last = evaluate(stmt, block_env)
+        if (type(last) is ReturnSignal):
+            break
     return last
 
 def eval_function_decl(node, env):
+    if (node.reuse_env is None):
+        node.unique_params = len(set(node.params)) == len(node.params)
+        # A call env only outlives its call when a function declared inside the body keeps it
+        node.reuse_env = not declares_function(node.body)
+
     # Create a new FunctionVal in env
-    fn = FunctionVal(node.params, node.body, env)
+    fn = FunctionVal(node.params, node.body, env, node.unique_params, node.reuse_env, node.name, node)
+    if (node.pure):
+        fn = memoize(fn, env)
     env.declare_var(node.name, fn, True)
-    return NullVal()
+    return NULL
+
+# Whether a function is declared anywhere in the statement
+# Expressions can't contain statements, so only statements with a body are searched
+def declares_function(node):
+    match node.type:
+        case NodeType.FUNCTION_DECLARATION:
+            return True
+        case NodeType.BLOCK:
+            return any(declares_function(stmt) for stmt in node.body)
+        case NodeType.IF_STMT:
+            if (declares_function(node.body)):
+                return True
+            if (any(declares_function(block) for condition, block in node.elif_branches)):
+                return True
+            return node.else_block is not None and declares_function(node.else_block)
+        case NodeType.WHILE_LOOP:
+            return declares_function(node.body)
+        case _:
+            return False
+
+# Marks every Identifier with whether a block or function around it declares its name
+# (local_names), anywhere in it since a function declared in it can run after a later
+# declaration. The others can only be found from the global env, the envs of blocks and calls
+# are made in the same nesting as the code, so their reads can use the inline cache
+# (see eval_identifier). Done once per program, before it first runs
+def mark_local_names(node, local_names):
+    match node.type:
+        case NodeType.PROGRAM:
+            for stmt in node.body:
+                mark_local_names(stmt, local_names)
+        case NodeType.IDENTIFIER:
+            node.maybe_local = node.symbol in local_names
+        case NodeType.BINARY_EXPR | NodeType.COMPARISON_EXPR:
+            mark_local_names(node.left, local_names)
+            mark_local_names(node.right, local_names)
+        case NodeType.UNARY_EXPR:
+            mark_local_names(node.operand, local_names)
+        case NodeType.ASSIGNMENT_EXPR:
+            mark_local_names(node.value, local_names)
+            mark_local_names(node.assignee, local_names)
+        case NodeType.VAR_DECLARATION:
+            mark_local_names(node.value, local_names)
+        case NodeType.BLOCK:
+            block_names = local_names | declared_names(node.body)
+            for stmt in node.body:
+                mark_local_names(stmt, block_names)
+        case NodeType.IF_STMT:
+            mark_local_names(node.condition, local_names)
+            mark_local_names(node.body, local_names)
+            for elif_condition, elif_block in node.elif_branches:
+                mark_local_names(elif_condition, local_names)
+                mark_local_names(elif_block, local_names)
+            if (node.else_block is not None):
+                mark_local_names(node.else_block, local_names)
+        case NodeType.WHILE_LOOP:
+            mark_local_names(node.condition, local_names)
+            mark_local_names(node.body, local_names)
+        case NodeType.FUNCTION_DECLARATION:
+            # The body runs straight in the call env, with the params
+            function_names = local_names | frozenset(node.params) | declared_names(node.body.body)
+            for stmt in node.body.body:
+                mark_local_names(stmt, function_names)
+        case NodeType.CALL_EXPR:
+            mark_local_names(node.callee, local_names)
+            for arg in node.args:
+                mark_local_names(arg, local_names)
+        case NodeType.RETURN_STMT:
+            if (node.value is not None):
+                mark_local_names(node.value, local_names)
+        case NodeType.ARRAY_LITERAL:
+            for element in node.elements:
+                mark_local_names(element, local_names)
+        case NodeType.MAP_LITERAL:
+            for key, value in node.entries:
+                mark_local_names(key, local_names)
+                mark_local_names(value, local_names)
+        case NodeType.INDEX_EXPR:
+            mark_local_names(node.array, local_names)
+            mark_local_names(node.index, local_names)
+
+# The names declared by the statements themselves, not by blocks inside them
+def declared_names(statements):
+    names = set()
+    for stmt in statements:
+        if (stmt.type == NodeType.VAR_DECLARATION):
+            names.add(stmt.identifier.value)
+        elif (stmt.type == NodeType.FUNCTION_DECLARATION):
+            names.add(stmt.name)
+    return frozenset(names)
 
 def eval_if_stmt(node, env):
-    from .interpreter import evaluate
-
     condition = evaluate(node.condition, env)
 
-    if(condition.type != "boolean"):
+    if(type(condition) is not bool):
         raise Exception("If condition must be a boolean")
-    if(condition.value):
+    if(condition):
         return evaluate(node.body, env) # A new env is created because eval_block() will be called
     
     for elif_condition, elif_block in node.elif_branches:
         condition_val = evaluate(elif_condition, env)
 
-        if(condition_val.type != "boolean"):
+        if(type(condition_val) is not bool):
             raise Exception("Elif condition must be a boolean")
-        if(condition_val.value):
+        if(condition_val):
             return evaluate(elif_block, env)
         
     if (node.else_block is not None):
         return evaluate(node.else_block, env)
     
-    return NullVal()
-
-def eval_while_loop(node, env):
-    from .interpreter import evaluate
+    return NULL
 
-    result = NullVal()
+# evaluate_body runs the body once per iteration, the profiler passes one that counts them
+def eval_while_loop(node, env, evaluate_body=evaluate):
+    result = NULL
     condition = evaluate(node.condition, env)
 
-    if (condition.type == "boolean"):
+    if (type(condition) is bool):
         while True:
             condition = evaluate(node.condition, env)
 
-            if (condition.type != "boolean"):
+            if (type(condition) is not bool):
                 raise Exception("While condition must be a boolean")
-            if (not condition.value):
+            if (not condition):
+                break
+            result = evaluate_body(node.body, env)
+            if (type(result) is ReturnSignal):
                 break
-            result = evaluate(node.body, env)
     
         return result
     
     # while(n){} will run the loop n times (even if n is modified during the loop)
-    if (condition.type == "number"):
-        iterations = condition.value
+    if (type(condition) in NUMBER_TYPES):
+        iterations = condition
 
         if (iterations < 0):
             raise Exception("While loop input must be positive")
 
         i = 0
         while (i < iterations):
-            result = evaluate(node.body, env)
+            result = evaluate_body(node.body, env)
+            if (type(result) is ReturnSignal):
+                break
             i += 1
 
         return result
@@ -86,20 +188,16 @@ def eval_while_loop(node, env):
     raise Exception("While condition must be a boolean or a number")
 
 def eval_var_declaration(node, env):
-    from .interpreter import evaluate
-
     value = evaluate(node.value, env)
     env.declare_var(node.identifier.value, value, node.isConst)
-    return NullVal()
+    return NULL
 
 def eval_return_stmt(node, env):
-    from .interpreter import evaluate
-
     if (not env.in_function):
         raise Exception("Return statement can only be used inside a function")
 
     if (node.value is None):
-        raise ReturnSignal(NullVal())
+        return ReturnSignal(NULL)
 
     value = evaluate(node.value, env)
-    raise ReturnSignal(value)
\ No newline at end of file
+    return ReturnSignal(value)
\ No newline at end of file
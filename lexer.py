@@ -1,51 +1,67 @@
+import re
+from array import array
+
 # Types of Tokens to look for
+# Kinds are small integers so they can be stored compactly and compared quickly
 class TokenType:
-    NUMBER = "NUMBER"
-    STRING = "STRING"
-    IDENTIFIER = "IDENTIFIER"
-    OPERATOR = "OPERATOR"
+    NUMBER = 0
+    STRING = 1
+    IDENTIFIER = 2
+    OPERATOR = 3
+
+    SEMICOLON = 4
+    COMMA = 5
 
-    SEMICOLON = "SEMICOLON"
-    COMMA = "COMMA"
+    EQUALS = 6
 
-    EQUALS = "EQUALS"
+    EQUALS_EQUALS = 7
+    NOT_EQUALS = 8
+    GREATER_THAN = 9
+    LESS_THAN = 10
+    GREATER_THAN_OR_EQ = 11
+    LESS_THAN_OR_EQ = 12
 
-    EQUALS_EQUALS = "EQUALS_EQUALS"
-    NOT_EQUALS = "NOT_EQUALS"
-    GREATER_THAN = "GREATER_THAN"
-    LESS_THAN = "LESS_THAN"
-    GREATER_THAN_OR_EQ = "GREATER_THAN_OR_EQ"
-    LESS_THAN_OR_EQ = "LESS_THAN_OR_EQ"
+    EXCLAMATION = 13
 
-    EXCLAMATION = "EXCLAMATION"
+    OPEN_PAREN = 14
+    CLOSE_PAREN = 15
+    OPEN_SQR_PAREN = 16
+    CLOSE_SQR_PAREN = 17
+    OPEN_CURLY_PAREN = 18
+    CLOSE_CURLY_PAREN = 19
 
-    OPEN_PAREN = "OPEN_PAREN"
-    CLOSE_PAREN = "CLOSE_PAREN"
-    OPEN_SQR_PAREN = "OPEN_SQR_PAREN"
-    CLOSE_SQR_PAREN = "CLOSE_SQR_PAREN"
-    OPEN_CURLY_PAREN = "OPEN_CURLY_PAREN"
-    CLOSE_CURLY_PAREN = "CLOSE_CURLY_PAREN"
+    DECLARE = 20
+    CONST = 21
 
-    DECLARE = "DECLARE"
-    CONST = "CONST"
+    IF = 22
+    ELIF = 23
+    ELSE = 24
 
-    IF = "IF"
-    ELIF = "ELIF"
-    ELSE = "ELSE"
+    WHILE = 25
 
-    WHILE = "WHILE"
+    FDECLARE = 26
+    RETURN = 27
 
-    FDECLARE = "FDECLARE"
-    RETURN = "RETURN"
+    EOF = 28
 
-    EOF = "EOF"
+    COLON = 29
+
+    PURE = 30
+
+# Kind -> name, for error messages
+TOKEN_NAMES = {
+    value: name for name, value in vars(TokenType).items()
+    if not name.startswith("_")
+}
 
 class Token:
-    def __init__(self, value: str, type: TokenType):
+    __slots__ = ("value", "type")
+
+    def __init__(self, value: str, type: int):
         self.value = value
         self.type = type
     def __repr__(self):
-        return f"Token({self.type}, {self.value!r})"
+        return f"Token({TOKEN_NAMES[self.type]}, {self.value!r})"
 
 KEYWORDS = {
     "declare": TokenType.DECLARE,
@@ -54,176 +70,156 @@ KEYWORDS = {
     "elif": TokenType.ELIF,
     "else": TokenType.ELSE,
     "fdeclare": TokenType.FDECLARE,
+    "pure": TokenType.PURE,
     "return": TokenType.RETURN,
     "while": TokenType.WHILE,
 }
 
+SYMBOLS = {
+    "+": TokenType.OPERATOR,
+    "-": TokenType.OPERATOR,
+    "*": TokenType.OPERATOR,
+    "%": TokenType.OPERATOR,
+    "=": TokenType.EQUALS,
+    "==": TokenType.EQUALS_EQUALS,
+    "!": TokenType.EXCLAMATION,
+    "!=": TokenType.NOT_EQUALS,
+    ";": TokenType.SEMICOLON,
+    ",": TokenType.COMMA,
+    ":": TokenType.COLON,
+    "(": TokenType.OPEN_PAREN,
+    ")": TokenType.CLOSE_PAREN,
+    "[": TokenType.OPEN_SQR_PAREN,
+    "]": TokenType.CLOSE_SQR_PAREN,
+    "{": TokenType.OPEN_CURLY_PAREN,
+    "}": TokenType.CLOSE_CURLY_PAREN,
+    ">": TokenType.GREATER_THAN,
+    ">=": TokenType.GREATER_THAN_OR_EQ,
+    "<": TokenType.LESS_THAN,
+    "<=": TokenType.LESS_THAN_OR_EQ,
+}
+
+# One master pattern, every match is the whitespace before a token plus the token itself
+# The group that matched says what was found, the most common tokens are tried first
+# Groups are numbered so the scanner can use match.lastindex instead of group names
+WORD = 1
+SYMBOL = 2
+NUMBER = 3
+STRING = 4      # only the contents, an unclosed string runs to the end
+COMMENT = 5
+UNCLOSED_COMMENT = 6
+SLASH = 7
+UNEXPECTED = 8
+# lastindex is None for the whitespace at the end of the source
+
+TOKEN_PATTERN = re.compile(r"""
+    [ \t\n]*
+    (?:
+        ([^\W\d_]+)                             # words (keywords and identifiers)
+      | ([-+*%;,:()\[\]{}] | [=!<>]=?)           # operators and punctuation, except /
+      | (\d+(?:\.\d*)?)                         # numbers, for now only one period
+      | "([^"]*)"?                              # strings
+      | (//[^\n]* | /\*(?:/|.*?\*/))            # single-line and multi-line comments
+      | (/\*)                                   # a multi-line comment that never ends
+      | (/)
+      | (.)                                     # all characters I haven't written patterns for
+      | \Z
+    )
+""", re.VERBOSE | re.DOTALL)
+
 # Takes in the sourcecode (a string) as input
 # Returns an array of Tokens
 def tokenize(source_code: str):
+    return list(iter_tokens(source_code))
 
-    tokens = []
-    source = source_code
-
-    i = 0
-    while (i < len(source)):
-
-        # Current character
-        c = source[i]
-
-        # Skip single-line comments
-        if (c == "/" and i + 1 < len(source) and source[i + 1] == "/"):
-            while (i < len(source) and source[i] != '\n'):
-                i += 1
-            continue
-
-        # Skip multi-line comments
-        if (c == '/' and i + 1 < len(source) and source[i + 1] == '*'):
-            while (i + 1 < len(source)):
-                if (source[i] == '*' and source[i + 1] == '/'):
-                    i += 2
-                    break
-                i += 1
-            else:
-                raise Exception("Must end multi-line comment")
-            continue
-
-        # Skip whitespace
-        if (c == " " or c == "\n" or c == "\t"):
-            i += 1
-            continue
-
-        if (c == '+' or c == '-' or c == '*' or c == '/' or c == '%'):
-            tokens.append(Token(c, TokenType.OPERATOR))
-            i += 1
-            continue
-
-        if (c == '='):
-            if (i + 1 < len(source) and source[i + 1] == '='):
-                tokens.append(Token("==", TokenType.EQUALS_EQUALS))
-                i += 2
-                continue
-            tokens.append(Token(c, TokenType.EQUALS))
-            i += 1
-            continue
-
-        if (c == '!'):
-            if(i + 1 < len(source) and source[i + 1] == '='):
-                tokens.append(Token("!=", TokenType.NOT_EQUALS))
-                i += 2
-                continue
-            tokens.append(Token(c, TokenType.EXCLAMATION))
-            i += 1
-            continue
-
-        if (c == ';'):
-            tokens.append(Token(c, TokenType.SEMICOLON))
-            i += 1
-            continue
-        
-        if (c == '('):
-            tokens.append(Token(c, TokenType.OPEN_PAREN))
-            i += 1
-            continue
-
-        if (c == ')'):
-            tokens.append(Token(c, TokenType.CLOSE_PAREN))
-            i += 1
-            continue
-
-        if (c == '['):
-            tokens.append(Token(c, TokenType.OPEN_SQR_PAREN))
-            i += 1
-            continue
-
-        if (c == ']'):
-            tokens.append(Token(c, TokenType.CLOSE_SQR_PAREN))
-            i += 1
-            continue
-
-        if (c == '{'):
-            tokens.append(Token(c, TokenType.OPEN_CURLY_PAREN))
-            i += 1
-            continue
-
-        if (c == '}'):
-            tokens.append(Token(c, TokenType.CLOSE_CURLY_PAREN))
-            i += 1
-            continue
-
-        if (c == '>'):
-            if (i + 1 < len(source) and source[i + 1] == '='):
-                tokens.append(Token(">=", TokenType.GREATER_THAN_OR_EQ))
-                i += 2
-                continue
-            tokens.append(Token(c, TokenType.GREATER_THAN))
-            i += 1
-            continue
-        
-        if (c == '<'):
-            if (i + 1 < len(source) and source[i + 1] == '='):
-                tokens.append(Token("<=", TokenType.LESS_THAN_OR_EQ))
-                i += 2
-                continue
-            tokens.append(Token(c, TokenType.LESS_THAN))
-            i += 1
-            continue
-
-        if (c == ','):
-            tokens.append(Token(c, TokenType.COMMA))
-            i += 1
-            continue        
-
-        if (c == '"'):
-            i += 1
-            start = i
+# Yields the same Tokens as tokenize() one at a time, so they can be parsed as they're scanned
+def iter_tokens(source_code: str):
+    # Identifiers are shared instead of keeping a copy per occurrence
+    names = {}
 
-            while (i < len(source) and source[i] != '"'):
-                i += 1
+    for match in TOKEN_PATTERN.finditer(source_code):
+        group = match.lastindex
 
-            tokens.append(Token(source[start:i], TokenType.STRING))
-            i += 1
-            continue
-
-        # If it's an integer, add NUMBER Token
-        if (c.isdigit()):
-            start = i
-
-            while (i < len(source) and source[i].isdigit()):
-                i += 1
-            # For now only allow one period
-            if (i < len(source) and source[i] == '.'):
-                i += 1
-                while (i < len(source) and source[i].isdigit()):
-                    i += 1
-
-            tokens.append(Token(source[start:i], TokenType.NUMBER))
-            continue
-
-        # If it's a word
-        if (c.isalpha()):
-            
-            start = i
-            while (i < len(source) and source[i].isalpha()):
-                i += 1
-
-            word = source[start:i]
-            # Checks if the word found is a keyword, otherwise it's an identifier
-            if (word in KEYWORDS):
-                tokens.append(Token(word, KEYWORDS[word]))
+        if (group == WORD):
+            word = match.group(WORD)
+            kind = KEYWORDS.get(word)
+            if (kind is None):
+                yield Token(names.setdefault(word, word), TokenType.IDENTIFIER)
             else:
-                tokens.append(Token(source[start:i], TokenType.IDENTIFIER))
-
-            continue
-
-        # All characters I haven't written conditions for
-        raise Exception(f"Unexpected character: {c}")
-
-    
-    tokens.append(Token("EndOfFile", TokenType.EOF))
-
-    return tokens
-    
-
-
-
+                yield Token(word, kind)
+        elif (group == SYMBOL):
+            symbol = match.group(SYMBOL)
+            yield Token(symbol, SYMBOLS[symbol])
+        elif (group == NUMBER):
+            yield Token(match.group(NUMBER), TokenType.NUMBER)
+        elif (group == STRING):
+            yield Token(match.group(STRING), TokenType.STRING)
+        elif (group == SLASH):
+            yield Token("/", TokenType.OPERATOR)
+        elif (group == COMMENT or group is None):
+            continue
+        else:
+            raise_lexer_error(match)
+
+    yield Token("EndOfFile", TokenType.EOF)
+
+# Same scan as tokenize(), but the result is three parallel arrays instead of Token objects:
+# kinds, and the start and end offsets of each token's text in the source (for strings that's
+# the contents without the quotes). Nothing is sliced out of the source until it's needed.
+def tokenize_compact(source_code: str):
+    kinds = array("B")
+    starts = array("q")
+    ends = array("q")
+    add_kind = kinds.append
+    add_start = starts.append
+    add_end = ends.append
+
+    for match in TOKEN_PATTERN.finditer(source_code):
+        group = match.lastindex
+
+        if (group == WORD):
+            add_kind(KEYWORDS.get(match.group(WORD), TokenType.IDENTIFIER))
+        elif (group == SYMBOL):
+            add_kind(SYMBOLS[match.group(SYMBOL)])
+        elif (group == NUMBER):
+            add_kind(TokenType.NUMBER)
+        elif (group == STRING):
+            add_kind(TokenType.STRING)
+        elif (group == SLASH):
+            add_kind(TokenType.OPERATOR)
+        elif (group == COMMENT or group is None):
+            continue
+        else:
+            raise_lexer_error(match)
+
+        start, end = match.span(group)
+        add_start(start)
+        add_end(end)
+
+    add_kind(TokenType.EOF)
+    add_start(len(source_code))
+    add_end(len(source_code))
+
+    return CompactTokens(source_code, kinds, starts, ends)
+
+def raise_lexer_error(match):
+    if (match.lastindex == UNCLOSED_COMMENT):
+        raise Exception("Must end multi-line comment")
+    raise Exception(f"Unexpected character: {match.group(UNEXPECTED)}")
+
+# The compact token stream, indexing it builds the Token on demand so it can be given to the Parser
+class CompactTokens:
+    def __init__(self, source, kinds, starts, ends):
+        self.source = source
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, i):
+        kind = self.kinds[i]
+        if (kind == TokenType.EOF):
+            return Token("EndOfFile", kind)
+        return Token(self.source[self.starts[i]:self.ends[i]], kind)
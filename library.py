@@ -0,0 +1,24 @@
+from environment import Environment
+from values import TRUE, FALSE, NULL, NativeFunctionVal
+from native_functions import native_print, native_length, native_random
+from native_collections import COLLECTION_FUNCTIONS
+from parallel import PARALLEL_FUNCTIONS
+from tasks import TASK_FUNCTIONS
+import memo
+
+def create_global_env():
+    # The collection functions live in a parent env, so a script can still declare
+    # its own sum, max, ... at the top level
+    library = Environment(in_function=False)
+    for functions in (COLLECTION_FUNCTIONS, memo.MEMO_FUNCTIONS, PARALLEL_FUNCTIONS, TASK_FUNCTIONS):
+        for name, fn in functions.items():
+            library.declare_var(name, NativeFunctionVal(fn), True)
+
+    env = Environment(parent=library, in_function=False)
+    env.declare_var("true", TRUE, True)
+    env.declare_var("false", FALSE, True)
+    env.declare_var("null", NULL, True)
+    env.declare_var("print", NativeFunctionVal(native_print), True)
+    env.declare_var("length", NativeFunctionVal(native_length), True)
+    env.declare_var("random", NativeFunctionVal(native_random), True)
+    return env
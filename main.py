@@ -1,51 +1,122 @@
+import gc
 import sys
-from lexer import tokenize
-from parser import Parser
-from eval.interpreter import evaluate
-from environment import Environment
-from values import TRUE, FALSE, NULL, NativeFunctionVal
-from native_functions import native_print, native_length, native_random
-
-def create_global_env():
-    env = Environment(in_function=False)
-    env.declare_var("true", TRUE, True)
-    env.declare_var("false", FALSE, True)
-    env.declare_var("null", NULL, True)
-    env.declare_var("print", NativeFunctionVal(native_print), True)
-    env.declare_var("length", NativeFunctionVal(native_length), True)
-    env.declare_var("random", NativeFunctionVal(native_random), True)
-    return env
-
-env = create_global_env()
-
-def run(source, env):
-    tokens = tokenize(source)
-    parser = Parser(tokens)
-    ast = parser.produce_ast()
-    # print(ast)
-    result = evaluate(ast, env)
-    return result
-
-# File Mode
-if (len(sys.argv) > 1):
-    filename = sys.argv[1]
-
-    with (open(filename, "r") as f):
-        source = f.read()
-
-    result = run(source, env)
-    # print(result)
-    sys.exit(0)
-
-# REPL Mode
-while True:
-    try:
-        source = input("    > ")
-        if (source == "" or source == "exit"):
-            break
-        
-        result = run(source, env)
+import argparse
+import vm.machine
+from optimizer import optimize
+from embed import ENGINES, run, parse, compile_source, run_stream, execute
+from cache import ScriptCache
+from batch import run_batch
+from profiler import Profiler
+from sampler import Sampler, DEFAULT_INTERVAL
+from library import create_global_env
+import memo
+import tasks
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run RowScript code")
+    arg_parser.add_argument("filename", nargs="?", help="source file to run, starts the REPL if omitted")
+    arg_parser.add_argument("--engine", choices=ENGINES, default="tree", help="how the code is executed")
+    arg_parser.add_argument("--stream", action="store_true", help="run each top-level statement as soon as it's parsed")
+    arg_parser.add_argument("--optimize", action="store_true", help="fold constants and drop dead branches before running")
+    arg_parser.add_argument("--dump-ast", action="store_true", help="print the tree that would be run (after --optimize) instead of running it")
+    arg_parser.add_argument("--max-depth", type=int, default=vm.machine.MAX_CALL_DEPTH, help="how deep calls can go with --engine vm")
+    arg_parser.add_argument("--memo-size", type=int, default=memo.DEFAULT_CACHE_SIZE, help="how many results a pure function keeps")
+    arg_parser.add_argument("--profile", action="store_true", help="print how long each function and loop took to stderr (tree engine)")
+    arg_parser.add_argument("--profile-stacks", metavar="FILE", help="also write collapsed call stacks for flamegraph tools to FILE")
+    arg_parser.add_argument("--sample", metavar="FILE", help="sample the call stack while the script runs and write collapsed stacks to FILE")
+    arg_parser.add_argument("--sample-interval", type=float, default=DEFAULT_INTERVAL * 1000, metavar="MS", help="milliseconds between samples (default: %(default)s)")
+    arg_parser.add_argument("--no-cache", action="store_true", help="don't load or store compiled scripts in the cache")
+    arg_parser.add_argument("--cache-dir", help="where compiled scripts are cached (default: ~/.cache/rowscript)")
+    arg_parser.add_argument("--batch", metavar="DIR", help="run every .rs file under DIR in a pool of worker processes")
+    arg_parser.add_argument("--workers", type=int, help="worker processes for --batch (default: one per core)")
+    arg_parser.add_argument("--timeout", type=float, metavar="SECONDS", help="stop a --batch script that runs longer than this")
+    arg_parser.add_argument("--batch-output", metavar="DIR", help="write the output of every --batch script to a .out file in DIR")
+    args = arg_parser.parse_args()
+    profiling = args.profile or args.profile_stacks is not None
+    if (profiling and (args.engine != "tree" or args.stream)):
+        arg_parser.error("--profile only works with --engine tree, without --stream")
+    if (args.batch is not None and (args.filename is not None or args.stream or args.dump_ast or profiling or args.sample is not None)):
+        arg_parser.error("--batch can't be combined with a filename, --stream, --dump-ast, --profile or --sample")
+    vm.machine.MAX_CALL_DEPTH = args.max_depth
+    memo.DEFAULT_CACHE_SIZE = args.memo_size
+
+    # Batch Mode
+    if (args.batch is not None):
+        failures = run_batch(
+            args.batch, args.workers, args.engine, args.optimize, args.cache_dir, not args.no_cache,
+            args.timeout, args.batch_output
+        )
+        sys.exit(1 if failures > 0 else 0)
+
+    env = create_global_env()
+
+    # File Mode
+    if (args.filename is not None):
+        filename = args.filename
+
+        with (open(filename, "r") as f):
+            source = f.read()
+
+        sampler = None
+        if (args.sample is not None):
+            sampler = Sampler(args.sample_interval / 1000)
+            sampler.start()
+
+        try:
+            if (args.dump_ast):
+                ast = parse(source)
+                if (args.optimize):
+                    ast = optimize(ast)
+                for stmt in ast.body:
+                    print(stmt)
+            elif (args.stream):
+                result = run_stream(source, env, args.engine, args.optimize)
+            elif (profiling):
+                program = compile_source(source, "tree", args.optimize)
+                profiler = Profiler(program)
+                profiler.install()
+                try:
+                    result = execute(program, env, "tree")
+                finally:
+                    profiler.uninstall()
+                    profiler.print_report(sys.stderr)
+                    if (args.profile_stacks is not None):
+                        with (open(args.profile_stacks, "w") as f):
+                            profiler.write_stacks(f)
+            elif (args.no_cache):
+                result = run(source, env, args.engine, args.optimize)
+            else:
+                cache = ScriptCache(args.cache_dir)
+                options = (args.engine, args.optimize)
+                compiled = cache.load_or_compile(source, options, lambda source: compile_source(source, args.engine, args.optimize))
+                # The compiled script lives until the end, so later collections don't need to scan it
+                gc.freeze()
+                result = execute(compiled, env, args.engine)
+            # Waits for tasks the script spawned and didn't join
+            tasks.finish()
+        finally:
+            tasks.abort()
+            if (sampler is not None):
+                sampler.stop()
+                with (open(args.sample, "w") as f):
+                    sampler.write_stacks(f)
         # print(result)
-        
-    except Exception as e:
-        print("Error:", e)
\ No newline at end of file
+        sys.exit(0)
+
+    # REPL Mode
+    while True:
+        try:
+            source = input("    > ")
+            if (source == "" or source == "exit"):
+                break
+
+            result = run(source, env, args.engine, args.optimize)
+            tasks.finish()
+            # print(result)
+
+        except Exception as e:
+            tasks.abort()
+            print("Error:", e)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from values import NativeFunctionVal, FunctionVal, StringVal, ArrayVal, MapVal, map_key, type_of
+
+# Memoized functions, made by "pure fdeclare" or the memo() native
+# The function is wrapped in a native function that keeps the results of earlier calls in an
+# LRU cache keyed on the arguments, so every engine runs them the same way and recursive calls
+# by name go through the cache too
+#   - calls with an argument that isn't a number, string, boolean or null (e.g. an array) aren't
+#     looked up, the function just runs ("bypassed" in memoStats)
+#   - a result isn't kept when the call used a native function with side effects (print,
+#     push, ...) or when it's an array or a map, which could be changed after it's returned
+
+# Entries kept per function unless memo() is given a size, main.py sets it from --memo-size
+DEFAULT_CACHE_SIZE = 1024
+
+# Bumped by every native function with side effects, a call is only cached if it didn't change
+side_effects = 0
+
+def note_side_effect():
+    global side_effects
+    side_effects += 1
+
+# Argument types that can be part of a key, see map_key()
+KEY_TYPES = {int, float, bool, type(None), StringVal}
+
+class Memo:
+    def __init__(self, fn, env, size):
+        # Imported here: callbacks imports the engines, which create memoized functions
+        from callbacks import function_caller
+        self.run = function_caller("memo", fn, env, fn.arity)
+        self.fn = fn
+        self.arity = fn.arity
+        self.size = size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def call(self, args, env):
+        if (len(args) != self.arity):
+            raise Exception("Incorrect number of arguments")
+
+        for arg in args:
+            if (type(arg) not in KEY_TYPES):
+                self.bypassed += 1
+                return self.run(args)
+        # map_key() treats 1 and 1.0 as the same key, like a map does, but id(1.0) has to return 1.0
+        key = tuple([(type(arg), map_key(arg)) for arg in args])
+
+        cache = self.cache
+        try:
+            result = cache[key]
+        except KeyError:
+            pass
+        else:
+            cache.move_to_end(key)
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        effects = side_effects
+        result = self.run(args)
+
+        if (side_effects == effects and type(result) is not ArrayVal and type(result) is not MapVal):
+            cache[key] = result
+            if (len(cache) > self.size):
+                cache.popitem(last=False)
+        return result
+
+# The native function standing in for fn, env is passed to fn if it's a native callback
+def memoize(fn, env, size=None):
+    memo = Memo(fn, env, DEFAULT_CACHE_SIZE if size is None else size)
+    return NativeFunctionVal(memo.call)
+
+# memo(fn) or memo(fn, size)
+def native_memo(args, env):
+    if (len(args) < 1 or len(args) > 2):
+        raise Exception("memo() expects a function and an optional cache size")
+    fn = args[0]
+    if (type(fn) is not FunctionVal):
+        raise Exception("memo() expects a user-defined function")
+
+    size = None
+    if (len(args) == 2):
+        size = args[1]
+        if (type(size) is not int or size < 1):
+            raise Exception("memo() size must be a positive integer")
+    return memoize(fn, env, size)
+
+# A map of how the cache of a memoized function has been used
+def native_memo_stats(args, env):
+    if (len(args) != 1):
+        raise Exception("memoStats() expects exactly one argument")
+    fn = args[0]
+    memo = getattr(fn.fn, "__self__", None) if type(fn) is NativeFunctionVal else None
+    if (type(memo) is not Memo):
+        raise Exception(f"memoStats() expects a memoized function, got {type_of(fn)}")
+
+    stats = MapVal()
+    stats.set(StringVal("hits"), memo.hits)
+    stats.set(StringVal("misses"), memo.misses)
+    stats.set(StringVal("bypassed"), memo.bypassed)
+    stats.set(StringVal("entries"), len(memo.cache))
+    return stats
+
+MEMO_FUNCTIONS = {
+    "memo": native_memo,
+    "memoStats": native_memo_stats,
+}
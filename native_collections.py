@@ -0,0 +1,303 @@
+from array import array
+from bisect import bisect_left
+from functools import cmp_to_key
+from values import StringVal, ArrayVal, NUMBER_TYPES, type_of
+from callbacks import function_caller
+from memo import note_side_effect
+
+# Native functions that work on whole arrays, and on maps (keys, has, remove)
+# The loops run inside Python's builtins (sorted, sum, min, list.index, ...), typed arrays
+# (see ArrayVal) go straight to them without looking at the elements first
+# Functions passed in (map, filter, reduce and a sort comparator) are called through callbacks.py
+
+def check_array(name, value):
+    if (type_of(value) != "array"):
+        raise Exception(f"{name}() expects an array")
+
+# A Python key for ordering the elements: None for numbers, the text for strings
+# Anything else (or a mix) can't be ordered without a comparator
+def order_key(name, elements):
+    if (type(elements) is not list):
+        return None
+    element_types = set(map(type, elements))
+    if (element_types <= {int, float}):
+        return None
+    if (element_types == {StringVal}):
+        return string_value
+    raise Exception(f"{name}() expects an array of numbers or an array of strings")
+
+def string_value(string):
+    return string.value
+
+# range(end), range(start, end) or range(start, end, step)
+def native_range(args, env):
+    if (len(args) < 1 or len(args) > 3):
+        raise Exception("range() expects one to three arguments")
+    for arg in args:
+        if (type(arg) is not int):
+            raise Exception("range() expects integers")
+    if (len(args) == 3 and args[2] == 0):
+        raise Exception("range() step cannot be 0")
+
+    values = range(*args)
+    try:
+        return ArrayVal(array("q", values))
+    except OverflowError:
+        return ArrayVal(list(values))
+
+# Adds values to the end of the array, returns its new length
+def native_push(args, env):
+    if (len(args) < 2):
+        raise Exception("push() expects an array and at least one value")
+    arr = args[0]
+    check_array("push", arr)
+
+    note_side_effect()
+    for value in args[1:]:
+        arr.append(value)
+    return len(arr.elements)
+
+# Removes the last element and returns it
+def native_pop(args, env):
+    if (len(args) != 1):
+        raise Exception("pop() expects exactly one argument")
+    arr = args[0]
+    check_array("pop", arr)
+    if (len(arr.elements) == 0):
+        raise Exception("pop() called on an empty array")
+
+    note_side_effect()
+    return arr.elements.pop()
+
+# slice(arr, start) or slice(arr, start, end), a new array
+# Negative indices count from the end, indices past either end are clamped
+def native_slice(args, env):
+    if (len(args) < 2 or len(args) > 3):
+        raise Exception("slice() expects an array, a start and an optional end")
+    arr = args[0]
+    check_array("slice", arr)
+    for index in args[1:]:
+        if (type(index) is not int):
+            raise Exception("slice() expects integer indices")
+
+    end = args[2] if len(args) == 3 else len(arr.elements)
+    return ArrayVal(arr.elements[args[1]:end])
+
+def native_sum(args, env):
+    if (len(args) != 1):
+        raise Exception("sum() expects exactly one argument")
+    arr = args[0]
+    check_array("sum", arr)
+
+    elements = arr.elements
+    if (type(elements) is list and not set(map(type, elements)) <= {int, float}):
+        raise Exception("sum() expects an array of numbers")
+    return sum(elements)
+
+def native_min(args, env):
+    return extreme("min", min, args)
+
+def native_max(args, env):
+    return extreme("max", max, args)
+
+# min() and max() of an array of numbers or of strings
+def extreme(name, python_fn, args):
+    if (len(args) != 1):
+        raise Exception(f"{name}() expects exactly one argument")
+    arr = args[0]
+    check_array(name, arr)
+    if (len(arr.elements) == 0):
+        raise Exception(f"{name}() called on an empty array")
+
+    key = order_key(name, arr.elements)
+    return python_fn(arr.elements, key=key)
+
+# sort(arr) or sort(arr, comparator), sorts the array in place and returns it
+# The comparator gets two elements and returns a negative number, 0 or a positive number
+# Without one the array has to hold only numbers or only strings
+def native_sort(args, env):
+    if (len(args) < 1 or len(args) > 2):
+        raise Exception("sort() expects an array and an optional comparator")
+    arr = args[0]
+    check_array("sort", arr)
+    elements = arr.elements
+
+    if (len(args) == 2):
+        compare = function_caller("sort", args[1], env, 2)
+
+        def compare_elements(a, b):
+            result = compare([a, b])
+            if (type(result) not in NUMBER_TYPES):
+                raise Exception("sort() comparator must return a number")
+            return result
+        key = cmp_to_key(compare_elements)
+    else:
+        key = order_key("sort", elements)
+
+    note_side_effect()
+    # Sorted into a new list, so a comparator that changes the array can't break the sort
+    result = sorted(elements, key=key)
+    if (type(elements) is list):
+        arr.elements = result
+    else:
+        arr.elements = array(elements.typecode, result)
+    return arr
+
+# The index of the first element equal to value, or -1
+def native_index_of(args, env):
+    if (len(args) != 2):
+        raise Exception("indexOf() expects an array and a value")
+    arr, value = args
+    check_array("indexOf", arr)
+    elements = arr.elements
+
+    if (type(elements) is not list):
+        if (type(value) not in NUMBER_TYPES):
+            return -1
+        try:
+            return elements.index(value)
+        except ValueError:
+            return -1
+
+    # Only values of the same RowScript type can be equal (true isn't 1)
+    value_type = type_of(value)
+    if (value_type == "string"):
+        text = value.value
+        for i, element in enumerate(elements):
+            if (type(element) is StringVal and element.value == text):
+                return i
+    elif (value_type == "number"):
+        for i, element in enumerate(elements):
+            if (type(element) in NUMBER_TYPES and element == value):
+                return i
+    else:
+        # Booleans, null, arrays and functions are the same only if they're the same value
+        for i, element in enumerate(elements):
+            if (element is value):
+                return i
+    return -1
+
+# Like indexOf() on an array sorted in ascending order, in O(log n)
+def native_binary_search(args, env):
+    if (len(args) != 2):
+        raise Exception("binarySearch() expects an array and a value")
+    arr, value = args
+    check_array("binarySearch", arr)
+    elements = arr.elements
+    if (len(elements) == 0):
+        return -1
+
+    key = order_key("binarySearch", elements)
+    if (key is None):
+        if (type(value) not in NUMBER_TYPES):
+            raise Exception("binarySearch() value must be a number")
+        index = bisect_left(elements, value)
+        found = index < len(elements) and elements[index] == value
+    else:
+        if (type(value) is not StringVal):
+            raise Exception("binarySearch() value must be a string")
+        index = bisect_left(elements, value.value, key=key)
+        found = index < len(elements) and elements[index].value == value.value
+    return index if found else -1
+
+# map(arr, fn), a new array of fn(element) for every element
+def native_map(args, env):
+    if (len(args) != 2):
+        raise Exception("map() expects an array and a function")
+    arr = args[0]
+    check_array("map", arr)
+    call = function_caller("map", args[1], env, 1)
+
+    return ArrayVal([call([element]) for element in arr.elements])
+
+# filter(arr, fn), a new array of the elements fn returns true for
+def native_filter(args, env):
+    if (len(args) != 2):
+        raise Exception("filter() expects an array and a function")
+    arr = args[0]
+    check_array("filter", arr)
+    call = function_caller("filter", args[1], env, 1)
+
+    kept = []
+    for element in arr.elements:
+        keep = call([element])
+        if (type(keep) is not bool):
+            raise Exception("filter() function must return a boolean")
+        if (keep):
+            kept.append(element)
+
+    if (type(arr.elements) is list):
+        return ArrayVal(kept)
+    return ArrayVal(array(arr.elements.typecode, kept))
+
+# reduce(arr, fn) or reduce(arr, fn, initial), folds the elements with fn(accumulator, element)
+# Without an initial value the first element is used
+def native_reduce(args, env):
+    if (len(args) < 2 or len(args) > 3):
+        raise Exception("reduce() expects an array, a function and an optional initial value")
+    arr = args[0]
+    check_array("reduce", arr)
+    call = function_caller("reduce", args[1], env, 2)
+
+    elements = iter(arr.elements)
+    if (len(args) == 3):
+        result = args[2]
+    elif (len(arr.elements) == 0):
+        raise Exception("reduce() of an empty array needs an initial value")
+    else:
+        result = next(elements)
+
+    for element in elements:
+        result = call([result, element])
+    return result
+
+def check_map(name, value):
+    if (type_of(value) != "map"):
+        raise Exception(f"{name}() expects a map")
+
+# A new array of the map's keys, in the order they were added
+def native_keys(args, env):
+    if (len(args) != 1):
+        raise Exception("keys() expects exactly one argument")
+    map_val = args[0]
+    check_map("keys", map_val)
+
+    return ArrayVal(map_val.keys())
+
+def native_has(args, env):
+    if (len(args) != 2):
+        raise Exception("has() expects a map and a key")
+    map_val, key = args
+    check_map("has", map_val)
+
+    return map_val.has(key)
+
+# Removes the key if it's there, returns whether it was
+def native_remove(args, env):
+    if (len(args) != 2):
+        raise Exception("remove() expects a map and a key")
+    map_val, key = args
+    check_map("remove", map_val)
+
+    note_side_effect()
+    return map_val.remove(key)
+
+# name -> function, declared in the env above the globals (see create_global_env in library.py)
+COLLECTION_FUNCTIONS = {
+    "range": native_range,
+    "push": native_push,
+    "pop": native_pop,
+    "slice": native_slice,
+    "sum": native_sum,
+    "min": native_min,
+    "max": native_max,
+    "sort": native_sort,
+    "indexOf": native_index_of,
+    "binarySearch": native_binary_search,
+    "map": native_map,
+    "filter": native_filter,
+    "reduce": native_reduce,
+    "keys": native_keys,
+    "has": native_has,
+    "remove": native_remove,
+}
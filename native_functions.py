@@ -1,25 +1,36 @@
-from values import NullVal, NumberVal
+from values import NULL, NUMBER_TYPES, StringVal, type_of, stringify
+from memo import note_side_effect
+import sys
 import random
 
 # Very simple print function
-# Only supports a comma-seperated list of runtimeVals (NumVals, BoolVals, etc.)
+# Only supports a comma-seperated list of runtime values (numbers, booleans, strings, etc.)
+# Strings are written piece by piece, so a string built with + is never joined just to print it
 def native_print(args, env):
-    output = []
+    note_side_effect()
+    write = sys.stdout.write
     for arg in args:
-        output.append(str(arg))
+        if (type(arg) is StringVal):
+            arg.write_to(write)
+        else:
+            write(stringify(arg))
 
-    print("".join(output))
-    return NullVal()
+    write("\n")
+    return NULL
 
-# Returns the length of an array
+# Returns the length of an array or a string, or the number of keys in a map
 def native_length(args, env):
     if (len(args) != 1):
         raise Exception("length() expects exactly one argument")
     arr = args[0]
-    if (arr.type != "array"):
-        raise Exception("length() expects an array")
+    if (type_of(arr) == "map"):
+        return len(arr.entries)
+    if (type_of(arr) == "string"):
+        return arr.size
+    if (type_of(arr) != "array"):
+        raise Exception("length() expects an array, a string or a map")
     
-    return NumberVal(len(arr.elements))
+    return len(arr.elements)
 
 # Returns a random integer between two values inclusive
 def native_random(args, env):
@@ -28,9 +39,10 @@ def native_random(args, env):
     min_val = args[0]
     max_val = args[1]
 
-    if (min_val.type != "number" or max_val.type != "number"):
+    if (type(min_val) not in NUMBER_TYPES or type(max_val) not in NUMBER_TYPES):
         raise Exception("random() expects two numbers")
-    if (min_val.value > max_val.value):
+    if (min_val > max_val):
         raise Exception("random() expects min <= max")
 
-    return NumberVal(random.randint(min_val.value, max_val.value))
+    note_side_effect()
+    return random.randint(min_val, max_val)
@@ -13,7 +13,9 @@ class NodeType:
     # Expressions
     NUMERIC_LITERAL = "NUMERIC_LITERAL"
     STRING_LITERAL = "STRING_LITERAL"
+    LITERAL = "LITERAL"
     ARRAY_LITERAL = "ARRAY_LITERAL"
+    MAP_LITERAL = "MAP_LITERAL"
     INDEX_EXPR = "INDEX_EXPR"
     IDENTIFIER = "IDENTIFIER"
     BINARY_EXPR = "BINARY_EXPR"
@@ -35,6 +37,8 @@ class Program(Node):
     def __init__(self):
         super().__init__(NodeType.PROGRAM)
         self.body = []
+        # Set by the tree-walker once it has marked which names could be local, see mark_local_names
+        self.locals_marked = False
     def __repr__(self):
         return f"Program(body={self.body})"
 
@@ -59,8 +63,22 @@ class FunctionDeclaration(Node):
         self.name = name
         self.params = params
         self.body = body
-    def __repr__(self):
-        return f"FunctionDeclaration(name={self.name}, params={self.params}, body={self.body})"
+        # Filled in by the resolver: slot of the function's name (None when global)
+        # and the number of slots needed by a call (params first, then locals)
+        self.slot = None
+        self.frame_size = None
+        # Also from the resolver: the errors raised when the declaration runs (its name is already
+        # declared in the scope) and when a call starts (two params share a name), or None
+        self.error = None
+        self.params_error = None
+        # Filled in by the tree-walker the first time the function is declared, see eval_function_decl
+        self.unique_params = None
+        self.reuse_env = None
+        # Set for "pure fdeclare", calls go through a cache (see memo.py)
+        self.pure = False
+    def __repr__(self):
+        pure = ", pure=True" if self.pure else ""
+        return f"FunctionDeclaration(name={self.name}, params={self.params}{pure}, body={self.body})"
     
 class VarDeclaration(Node):
     def __init__(self, identifier, value, isConst):
@@ -68,6 +86,11 @@ class VarDeclaration(Node):
         self.identifier = identifier
         self.value = value
         self.isConst = isConst
+        # Filled in by the resolver, None when the variable is global
+        self.slot = None
+        # Also from the resolver: the error raised once the value is evaluated, when the name is
+        # already declared in the scope, or None
+        self.error = None
     def __repr__(self):
         return f"VarDeclaration({self.identifier} = {self.value}, isConst={self.isConst})"
 
@@ -75,6 +98,8 @@ class Block(Node):
     def __init__(self, body):
         super().__init__(NodeType.BLOCK)
         self.body = body
+        # Filled in by the resolver, blocks without declarations don't need a frame
+        self.frame_size = None
     def __repr__(self):
         return f"Block(body={self.body})"
 
@@ -121,6 +146,14 @@ class StringLiteral(Expression):
     def __repr__(self):
         return f'StringLiteral("{self.value}")'
 
+# A boolean or null, only made by the optimizer when it folds an expression
+class Literal(Expression):
+    def __init__(self, value):
+        super().__init__(NodeType.LITERAL)
+        self.value = value
+    def __repr__(self):
+        return f"Literal({self.value})"
+
 class ArrayLiteral(Expression):
     def __init__(self, elements):
         super().__init__(NodeType.ARRAY_LITERAL)
@@ -128,6 +161,14 @@ class ArrayLiteral(Expression):
     def __repr__(self):
         return f'ArrayLiteral([{self.elements}])'
 
+# entries is a list of (key, value) expression pairs
+class MapLiteral(Expression):
+    def __init__(self, entries):
+        super().__init__(NodeType.MAP_LITERAL)
+        self.entries = entries
+    def __repr__(self):
+        return f'MapLiteral({self.entries})'
+
 class IndexExpr(Expression):
     def __init__(self, array, index):
         super().__init__(NodeType.INDEX_EXPR)
@@ -140,8 +181,34 @@ class Identifier(Expression):
     def __init__(self, symbol):
         super().__init__(NodeType.IDENTIFIER)
         self.symbol = symbol
+        # Filled in by the resolver: how many frames up the variable lives and its slot there
+        # slot is None for globals, checked is set when the slot might not be declared yet
+        # fallbacks are the (depth, slot, is_const) of the same name further out, tried in order
+        # while the slot isn't declared, and then the globals. constant is set when the name is
+        # a constant where it's found
+        self.depth = None
+        self.slot = None
+        self.checked = False
+        self.constant = False
+        self.fallbacks = ()
+        # Filled in by the tree-walker: False when no block or function around the node declares
+        # the name, so it can only be found from the global env (see mark_local_names)
+        self.maybe_local = True
+        # Inline cache of the tree-walker for a name that isn't local (see eval_identifier):
+        # (global env the lookup started from, env the name was found in, Environment.version)
+        # It's one tuple so a run reading it never pairs one run's global env with another's holder
+        self.cache = NO_CACHE
     def __repr__(self):
         return f"Identifier({self.symbol!r})"
+    # The cache points into the envs of a run, it's dropped when the node is pickled (pmap sends
+    # function declarations to the workers)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["cache"] = NO_CACHE
+        return state
+
+# An inline cache that never matches, no env is None
+NO_CACHE = (None, None, None)
 
 class BinaryExpr(Expression):
     def __init__(self, left, right, operator):
@@ -157,6 +224,9 @@ class AssignmentExpr(Expression):
         super().__init__(NodeType.ASSIGNMENT_EXPR)
         self.assignee = assignee
         self.value = value
+        # Filled in by the resolver: the error raised once the value is evaluated, when the
+        # assignee is a local constant of the same function, or None
+        self.error = None
     def __repr__(self):
         return f"AssignmentExpr({self.assignee} = {self.value})"
     
@@ -0,0 +1,172 @@
+from values import StringVal, ArrayVal, MapVal, NUMBER_TYPES, TYPED_ELEMENTS, type_of, concat
+from vectorized import elementwise
+
+# Operator semantics shared by every execution engine
+# Each engine looks the operator function up once (or per node) instead of comparing strings
+# Numbers, booleans and null are raw Python values, see values.py
+# Binary and comparison operators with an array on either side work element-wise, see vectorized.py
+
+# Called when an operand of an arithmetic operator isn't a number
+def _non_numbers(symbol, operator_fn, left, right):
+    if (type(left) is ArrayVal or type(right) is ArrayVal):
+        return elementwise(symbol, operator_fn, left, right)
+    raise Exception("Only numbers supported when evaluating binary expressions")
+
+# + also joins two strings, see concat()
+def add(left, right):
+    if (type(left) not in NUMBER_TYPES or type(right) not in NUMBER_TYPES):
+        if (type(left) is StringVal and type(right) is StringVal):
+            return concat(left, right)
+        return _non_numbers("+", add, left, right)
+    return left + right
+
+def subtract(left, right):
+    if (type(left) not in NUMBER_TYPES or type(right) not in NUMBER_TYPES):
+        return _non_numbers("-", subtract, left, right)
+    return left - right
+
+def multiply(left, right):
+    if (type(left) not in NUMBER_TYPES or type(right) not in NUMBER_TYPES):
+        return _non_numbers("*", multiply, left, right)
+    return left * right
+
+def divide(left, right):
+    if (type(left) not in NUMBER_TYPES or type(right) not in NUMBER_TYPES):
+        return _non_numbers("/", divide, left, right)
+    return left / right
+
+def modulo(left, right):
+    if (type(left) not in NUMBER_TYPES or type(right) not in NUMBER_TYPES):
+        return _non_numbers("%", modulo, left, right)
+    return left % right
+
+BINARY_OPERATORS = {
+    "+": add,
+    "-": subtract,
+    "*": multiply,
+    "/": divide,
+    "%": modulo,
+}
+
+def negate(operand):
+    if (type(operand) not in NUMBER_TYPES):
+        raise Exception("Unary '-' expects a number")
+    return -operand
+
+def logical_not(operand):
+    if (type(operand) is not bool):
+        raise Exception("Unary '!' expects a boolean")
+    return not operand
+
+UNARY_OPERATORS = {
+    "-": negate,
+    "!": logical_not,
+}
+
+# Comparisons with null are only allowed for == and !=
+# Returns the Python values to compare, strings are compared by their contents
+def _comparable(left, right):
+    if (left is None or right is None):
+        raise Exception(f"Cannot compare null {type_of(right)} with {type_of(left)}")
+    if (type_of(left) != type_of(right)):
+        raise Exception("Cannot compare values of different types")
+    if (type(left) is StringVal):
+        return left.value, right.value
+    return left, right
+
+# An array compared with null is still just not null
+def equal(left, right):
+    if (left is None or right is None):
+        return left is None and right is None
+    if (type(left) is ArrayVal or type(right) is ArrayVal):
+        return elementwise("==", equal, left, right)
+    left, right = _comparable(left, right)
+    return left == right
+
+def not_equal(left, right):
+    if (left is None or right is None):
+        return not (left is None and right is None)
+    if (type(left) is ArrayVal or type(right) is ArrayVal):
+        return elementwise("!=", not_equal, left, right)
+    left, right = _comparable(left, right)
+    return left != right
+
+def greater(left, right):
+    if (type(left) is ArrayVal or type(right) is ArrayVal):
+        return elementwise(">", greater, left, right)
+    left, right = _comparable(left, right)
+    return left > right
+
+def greater_or_equal(left, right):
+    if (type(left) is ArrayVal or type(right) is ArrayVal):
+        return elementwise(">=", greater_or_equal, left, right)
+    left, right = _comparable(left, right)
+    return left >= right
+
+def less(left, right):
+    if (type(left) is ArrayVal or type(right) is ArrayVal):
+        return elementwise("<", less, left, right)
+    left, right = _comparable(left, right)
+    return left < right
+
+def less_or_equal(left, right):
+    if (type(left) is ArrayVal or type(right) is ArrayVal):
+        return elementwise("<=", less_or_equal, left, right)
+    left, right = _comparable(left, right)
+    return left <= right
+
+COMPARISON_OPERATORS = {
+    "==": equal,
+    "!=": not_equal,
+    ">": greater,
+    ">=": greater_or_equal,
+    "<": less,
+    "<=": less_or_equal,
+}
+
+# Maps are indexed by key, see MapVal
+def _check_index(array_val, index_val):
+    if (type_of(array_val) != "array"):
+        raise Exception("Can only index arrays, maps and strings")
+    if (type(index_val) not in NUMBER_TYPES):
+        raise Exception("Array index must be a number")
+    if (index_val < 0 or index_val >= len(array_val.elements)):
+        raise Exception("Array index out of bounds")
+
+# Indexing a string gives a string of the one character
+def _string_index(string_val, index_val):
+    if (type(index_val) not in NUMBER_TYPES):
+        raise Exception("String index must be a number")
+    if (index_val < 0 or index_val >= string_val.size):
+        raise Exception("String index out of bounds")
+    return StringVal(string_val.value[index_val])
+
+def index_get(array_val, index_val):
+    if (type(array_val) is MapVal):
+        return array_val.get(index_val)
+    if (type(array_val) is StringVal):
+        return _string_index(array_val, index_val)
+    _check_index(array_val, index_val)
+    return array_val.elements[index_val]
+
+def index_set(array_val, index_val, value):
+    if (type(array_val) is MapVal):
+        return array_val.set(index_val, value)
+    if (type(array_val) is StringVal):
+        raise Exception("Strings cannot be changed")
+    _check_index(array_val, index_val)
+    elements = array_val.elements
+
+    # A typed array only takes values of its element type
+    if (type(elements) is not list):
+        if (type(value) is TYPED_ELEMENTS[elements.typecode]):
+            try:
+                elements[index_val] = value
+                return value
+            except OverflowError:
+                pass
+        array_val.unpack()
+        elements = array_val.elements
+
+    elements[index_val] = value
+    return value
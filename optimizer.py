@@ -0,0 +1,239 @@
+from nodes import NodeType, NumericLiteral, StringLiteral, Literal, Block
+from values import StringVal, NUMBER_TYPES
+from operations import BINARY_OPERATORS, UNARY_OPERATORS, COMPARISON_OPERATORS
+
+# Names declared before the program runs, they're consts so nothing can redeclare them at the top level
+BUILTIN_CONSTANTS = {
+    "true": True,
+    "false": False,
+    "null": None,
+}
+
+# A scope seen by the optimizer: the program itself ("global"), a function body or a block
+# Unlike the resolver's scopes, every declaration in the scope is known before its statements are
+# optimized, so a name used inside a function can be checked against declarations that come later
+class Scope:
+    def __init__(self, parent, kind, statements, params=()):
+        self.parent = parent
+        self.kind = kind
+        # Index of the statement being optimized, declarations before it have already run
+        self.position = -1
+        # name -> [(index, node)], params are declared at index -1
+        self.declarations = {}
+
+        for param in params:
+            self.declarations.setdefault(param, []).append((-1, None))
+        for index, stmt in enumerate(statements):
+            if (stmt.type == NodeType.VAR_DECLARATION):
+                self.declarations.setdefault(stmt.identifier.value, []).append((index, stmt))
+            elif (stmt.type == NodeType.FUNCTION_DECLARATION):
+                self.declarations.setdefault(stmt.name, []).append((index, stmt))
+
+# Rewrites the AST from Parser.produce_ast() before it's run, the result runs on every engine:
+#   - operators whose operands are all literals are folded into a literal
+#   - reads of a const whose value is a literal are replaced by that literal
+#   - if/elif branches with literal conditions are picked or dropped
+#   - statements after a return in the same block are dropped
+# Anything that would raise when it runs (e.g. 1 + "a", if (5) {}) is left as it is
+class Optimizer:
+    def __init__(self):
+        self.scope = None
+
+    def optimize_program(self, program):
+        program.body = self.optimize_body(program.body, "global")
+        return program
+
+    # Optimizes the statements of a new scope and returns the statements to keep
+    def optimize_body(self, statements, kind, params=()):
+        statements = drop_unreachable(statements)
+        self.scope = Scope(self.scope, kind, statements, params)
+
+        for index, stmt in enumerate(statements):
+            self.scope.position = index
+            statements[index] = self.optimize_node(stmt)
+
+        self.scope = self.scope.parent
+        return statements
+
+    def optimize_node(self, node):
+        match node.type:
+            case NodeType.NUMERIC_LITERAL | NodeType.STRING_LITERAL | NodeType.LITERAL:
+                return node
+            case NodeType.IDENTIFIER:
+                constant = self.lookup_constant(node.symbol)
+                if (constant is not None):
+                    return constant
+                return node
+            case NodeType.BINARY_EXPR:
+                return self.fold_operator(node, BINARY_OPERATORS)
+            case NodeType.COMPARISON_EXPR:
+                return self.fold_operator(node, COMPARISON_OPERATORS)
+            case NodeType.UNARY_EXPR:
+                node.operand = self.optimize_node(node.operand)
+                operator_fn = UNARY_OPERATORS.get(node.operator)
+                if (operator_fn is None or not is_literal(node.operand)):
+                    return node
+                return fold(node, operator_fn, literal_value(node.operand))
+            case NodeType.ASSIGNMENT_EXPR:
+                # The assignee is a target, not a read, so a const there is kept (and raises when run)
+                node.value = self.optimize_node(node.value)
+                if (node.assignee.type == NodeType.INDEX_EXPR):
+                    node.assignee.array = self.optimize_node(node.assignee.array)
+                    node.assignee.index = self.optimize_node(node.assignee.index)
+                return node
+            case NodeType.VAR_DECLARATION:
+                node.value = self.optimize_node(node.value)
+                return node
+            case NodeType.BLOCK:
+                node.body = self.optimize_body(node.body, "block")
+                return node
+            case NodeType.IF_STMT:
+                return self.optimize_if_stmt(node)
+            case NodeType.WHILE_LOOP:
+                node.condition = self.optimize_node(node.condition)
+                node.body = self.optimize_node(node.body)
+                return node
+            case NodeType.FUNCTION_DECLARATION:
+                # The body runs directly in the call env, so params and locals share a scope
+                node.body.body = self.optimize_body(node.body.body, "function", node.params)
+                return node
+            case NodeType.CALL_EXPR:
+                node.callee = self.optimize_node(node.callee)
+                node.args = [self.optimize_node(arg) for arg in node.args]
+                return node
+            case NodeType.RETURN_STMT:
+                if (node.value is not None):
+                    node.value = self.optimize_node(node.value)
+                return node
+            case NodeType.ARRAY_LITERAL:
+                node.elements = [self.optimize_node(element) for element in node.elements]
+                return node
+            case NodeType.MAP_LITERAL:
+                node.entries = [(self.optimize_node(key), self.optimize_node(value)) for key, value in node.entries]
+                return node
+            case NodeType.INDEX_EXPR:
+                node.array = self.optimize_node(node.array)
+                node.index = self.optimize_node(node.index)
+                return node
+            case _:
+                raise Exception(f"No evaluation rule for {node.type}")
+
+    def fold_operator(self, node, operators):
+        node.left = self.optimize_node(node.left)
+        node.right = self.optimize_node(node.right)
+        operator_fn = operators.get(node.operator)
+        if (operator_fn is None or not is_literal(node.left) or not is_literal(node.right)):
+            return node
+        return fold(node, operator_fn, literal_value(node.left), literal_value(node.right))
+
+    def optimize_if_stmt(self, node):
+        # Every branch as (condition, block, keyword), the keyword is part of the error message
+        # a non-boolean condition raises
+        branches = [(node.condition, node.body, "If")]
+        for elif_condition, elif_block in node.elif_branches:
+            branches.append((elif_condition, elif_block, "Elif"))
+
+        kept = []
+        else_block = node.else_block
+        for condition, block, keyword in branches:
+            condition = self.optimize_node(condition)
+            if (condition.type == NodeType.LITERAL and condition.value is False):
+                continue
+            if (condition.type == NodeType.LITERAL and condition.value is True):
+                # The branches after this one can never run
+                else_block = block
+                break
+            if (len(kept) == 0 and keyword == "Elif"):
+                # Nothing before it is left, but a non-boolean condition must still raise the elif error
+                kept.append((Literal(False), Block([]), "If"))
+            kept.append((condition, block, keyword))
+
+        if (len(kept) == 0):
+            if (else_block is None):
+                return Literal(None)
+            return self.optimize_node(else_block)
+
+        node.condition = kept[0][0]
+        node.body = self.optimize_node(kept[0][1])
+        node.elif_branches = [(condition, self.optimize_node(block)) for condition, block, keyword in kept[1:]]
+        if (else_block is not None):
+            else_block = self.optimize_node(else_block)
+        node.else_block = else_block
+        return node
+
+    # Returns a literal node with the const's value if name is certain to be that const wherever
+    # it's read here, otherwise None
+    def lookup_constant(self, name):
+        scope = self.scope
+        # Set once the lookup leaves a function body, the body might run at any time after that
+        crosses_function = False
+
+        while (scope is not None):
+            declarations = scope.declarations.get(name)
+            if (declarations is not None):
+                earlier = [stmt for index, stmt in declarations if index < scope.position]
+                later = len(earlier) < len(declarations)
+
+                if (crosses_function and later):
+                    # Which declaration is visible depends on when the function is called
+                    return None
+                if (len(earlier) > 0):
+                    return constant_of(earlier[-1])
+                # Not declared yet when this runs, so the name is looked up further out
+
+            if (scope.kind == "function"):
+                crosses_function = True
+            scope = scope.parent
+
+        if (name in BUILTIN_CONSTANTS):
+            return make_literal(BUILTIN_CONSTANTS[name])
+        return None
+
+# A copy of the declaration's value, when it's a const holding a literal
+def constant_of(declaration):
+    if (declaration is None or declaration.type != NodeType.VAR_DECLARATION):
+        return None
+    if (not declaration.isConst or not is_literal(declaration.value)):
+        return None
+    return make_literal(literal_value(declaration.value))
+
+# Only the statements up to and including the first return can run
+def drop_unreachable(statements):
+    for index, stmt in enumerate(statements):
+        if (stmt.type == NodeType.RETURN_STMT):
+            return statements[:index + 1]
+    return statements
+
+# Runs operator_fn on the operands, the node is kept when that raises
+def fold(node, operator_fn, *operands):
+    try:
+        value = operator_fn(*operands)
+    except Exception:
+        return node
+
+    literal = make_literal(value)
+    if (literal is None):
+        return node
+    return literal
+
+def is_literal(node):
+    return node.type in (NodeType.NUMERIC_LITERAL, NodeType.STRING_LITERAL, NodeType.LITERAL)
+
+# The value the node evaluates to
+def literal_value(node):
+    if (node.type == NodeType.STRING_LITERAL):
+        return StringVal(node.value)
+    return node.value
+
+# The node that evaluates to value, None for values without one (arrays, functions)
+def make_literal(value):
+    if (type(value) in NUMBER_TYPES):
+        return NumericLiteral(value)
+    if (type(value) is StringVal):
+        return StringLiteral(value.value)
+    if (type(value) is bool or value is None):
+        return Literal(value)
+    return None
+
+def optimize(program):
+    return Optimizer().optimize_program(program)
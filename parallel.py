@@ -0,0 +1,451 @@
+import os
+import time
+import pickle
+from array import array
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from nodes import NodeType, Program
+from environment import Environment, find_declared
+from values import FunctionVal, NativeFunctionVal, StringVal, ArrayVal, type_of
+from callbacks import function_caller
+from memo import Memo
+from native_functions import native_print, native_random
+from native_collections import check_array, native_push, native_pop, native_sort, native_remove
+from tasks import native_spawn, native_send, native_receive, native_close, native_sleep, native_read_file, native_write_file
+from vm.code import Code
+
+# pmap, pfilter and preduce: map, filter and reduce with the calls spread over worker processes
+# The function can't be sent as it is (its body may be closures and its env holds everything
+# around it), so what's sent is its FunctionDeclaration node and a snapshot of the names it
+# uses from outside, found by walking the declaration like the resolver does. A worker compiles
+# that again with the same engine and calls it on its chunk of the array
+# Only functions whose calls can't be told apart from running in the caller's process are sent:
+#   - everything they use from outside must be a number, string, boolean, null, a function
+#     (sent the same way) or a native without side effects. Arrays and maps could be changed
+#     while the workers have copies, so they're rejected
+#   - they can't assign to a name from outside or to an element of an argument or of anything
+#     from outside, the change would be lost
+#   - they can't use print, random, push, pop, sort or remove, or the task and I/O natives
+# preduce combines the results of chunks with fn too, so fn has to be associative
+# Elements are first run here, in chunks of 1, 2, 4, ... until PROBE_TIME has passed. That times
+# a call, and arrays that take less than PARALLEL_MIN_TIME in total never go to the pool. The
+# rest is cut into chunks taking about CHUNK_TIME each, with at least 4 per worker
+
+# Worker processes, the pool is only used when there's more than one
+workers = os.cpu_count() or 1
+
+PROBE_TIME = 0.005
+PARALLEL_MIN_TIME = 0.05
+CHUNK_TIME = 0.05
+
+# Natives whose calls change something, the same ones that call note_side_effect()
+SIDE_EFFECT_NATIVES = {
+    native_print, native_random, native_push, native_pop, native_sort, native_remove,
+    native_spawn, native_send, native_receive, native_close, native_sleep, native_read_file, native_write_file,
+}
+
+# Values from outside a function that are sent as they are, anything else could be changed
+SENDABLE_TYPES = {int, float, bool, type(None), StringVal, NativeFunctionVal}
+
+pool = None
+
+# Set in the worker processes, where the parallel natives run everything themselves
+# Batch mode's workers set it too (see batch.init_worker)
+in_worker = False
+
+def get_pool():
+    global pool
+    if (pool is None):
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+    return pool
+
+def init_worker():
+    global in_worker
+    in_worker = True
+
+# What a function declaration uses from outside itself
+# Scopes are tracked the way the resolver does, function bodies are walked when the scope
+# they're declared in ends so they see every name in it. frames counts the frames from a use
+# up to the function's own call frame, the resolved engines address names by depth from the use
+# Element assignments are only allowed through a local that has only ever held an array or
+# map literal, one level deep: anything else (a param, an alias of one, a value from outside,
+# what a call returned, an element of a literal) could be shared with the caller
+class CaptureFinder:
+    def __init__(self, declaration):
+        # name -> (Identifier node of a use, frames at the use)
+        self.free = {}
+        # Names from outside that are assigned to, and names of values whose elements are
+        # assigned to that the function may not own
+        self.assigned = set()
+        self.changed = set()
+        # (name, Local or None when it's from outside, how many indexes deep) of every element
+        # assignment, checked at the end since a later assignment can make a local shared
+        self.element_stores = []
+        # Every scope maps the names declared in it to their Local
+        self.scopes = []
+        self.deferred = []
+
+        self.begin_scope(declaration.params)
+        self.visit_statements(declaration.body.body, 1)
+        self.end_scope()
+
+        for name, local, depth in self.element_stores:
+            if (local is None or not local.owned or depth > 1):
+                self.changed.add(name)
+
+    def begin_scope(self, names=()):
+        self.scopes.append({name: Local(False) for name in names})
+        self.deferred.append([])
+
+    def end_scope(self):
+        for node, frames in self.deferred[-1]:
+            self.begin_scope(node.params)
+            self.visit_statements(node.body.body, frames + 1)
+            self.end_scope()
+        self.scopes.pop()
+        self.deferred.pop()
+
+    # The index of the scope name is declared in, None if it's from outside
+    def lookup(self, name):
+        for i in range(len(self.scopes) - 1, -1, -1):
+            if (name in self.scopes[i]):
+                return i
+        return None
+
+    # The Local a name refers to, None if it's from outside
+    def local(self, name):
+        scope = self.lookup(name)
+        return None if scope is None else self.scopes[scope][name]
+
+    def visit_statements(self, statements, frames):
+        for stmt in statements:
+            self.visit(stmt, frames)
+
+    def visit(self, node, frames):
+        match node.type:
+            case NodeType.NUMERIC_LITERAL | NodeType.STRING_LITERAL | NodeType.LITERAL:
+                return
+            case NodeType.IDENTIFIER:
+                if (self.lookup(node.symbol) is None and node.symbol not in self.free):
+                    self.free[node.symbol] = (node, frames)
+            case NodeType.BINARY_EXPR | NodeType.COMPARISON_EXPR:
+                self.visit(node.left, frames)
+                self.visit(node.right, frames)
+            case NodeType.UNARY_EXPR:
+                self.visit(node.operand, frames)
+            case NodeType.ASSIGNMENT_EXPR:
+                self.visit(node.value, frames)
+                if (node.assignee.type == NodeType.IDENTIFIER):
+                    local = self.local(node.assignee.symbol)
+                    if (local is None):
+                        self.assigned.add(node.assignee.symbol)
+                    elif (not is_new_value(node.value)):
+                        local.owned = False
+                else:
+                    target = node.assignee
+                    depth = 0
+                    while (target.type == NodeType.INDEX_EXPR):
+                        target = target.array
+                        depth += 1
+                    if (target.type == NodeType.IDENTIFIER):
+                        self.element_stores.append((target.symbol, self.local(target.symbol), depth))
+                self.visit(node.assignee, frames)
+            case NodeType.VAR_DECLARATION:
+                self.visit(node.value, frames)
+                self.scopes[-1][node.identifier.value] = Local(is_new_value(node.value))
+            case NodeType.BLOCK:
+                # Blocks with declarations get a frame with the resolved engines
+                self.begin_scope()
+                self.visit_statements(node.body, frames + 1 if node.frame_size else frames)
+                self.end_scope()
+            case NodeType.IF_STMT:
+                self.visit(node.condition, frames)
+                self.visit(node.body, frames)
+                for elif_condition, elif_block in node.elif_branches:
+                    self.visit(elif_condition, frames)
+                    self.visit(elif_block, frames)
+                if (node.else_block is not None):
+                    self.visit(node.else_block, frames)
+            case NodeType.WHILE_LOOP:
+                self.visit(node.condition, frames)
+                self.visit(node.body, frames)
+            case NodeType.FUNCTION_DECLARATION:
+                self.scopes[-1][node.name] = Local(False)
+                self.deferred[-1].append((node, frames))
+            case NodeType.CALL_EXPR:
+                self.visit(node.callee, frames)
+                for arg in node.args:
+                    self.visit(arg, frames)
+            case NodeType.RETURN_STMT:
+                if (node.value is not None):
+                    self.visit(node.value, frames)
+            case NodeType.ARRAY_LITERAL:
+                for element in node.elements:
+                    self.visit(element, frames)
+            case NodeType.MAP_LITERAL:
+                for key, value in node.entries:
+                    self.visit(key, frames)
+                    self.visit(value, frames)
+            case NodeType.INDEX_EXPR:
+                self.visit(node.array, frames)
+                self.visit(node.index, frames)
+            case _:
+                raise Exception(f"No evaluation rule for {node.type}")
+
+class Local:
+    __slots__ = ("owned",)
+
+    def __init__(self, owned):
+        # False once the local could hold a value the function didn't make itself
+        self.owned = owned
+
+# Whether an expression always makes a new array or map
+def is_new_value(node):
+    return node.type == NodeType.ARRAY_LITERAL or node.type == NodeType.MAP_LITERAL
+
+# The value of a name fn uses from outside, MISSING if it isn't declared (yet)
+# The tree-walker's env is an Environment, the resolved engines' a Frame
+def captured_value(fn, name, node, frames):
+    env = fn.env
+    if (type(env) is Environment):
+        try:
+            return env.lookup_var(name)
+        except Exception:
+            return MISSING
+
+    if (node.slot is None):
+        try:
+            return env.globals.lookup_var(name)
+        except Exception:
+            return MISSING
+    addresses = [
+        (depth - frames, slot, is_const)
+        for depth, slot, is_const in ((node.depth, node.slot, node.constant),) + node.fallbacks
+    ]
+    slots, slot, is_const = find_declared(env, addresses)
+    if (slots is None):
+        try:
+            return env.globals.lookup_var(name)
+        except Exception:
+            return MISSING
+    return slots[slot]
+
+MISSING = object()
+
+# The engine that made fn, from the kind of body it has (see callbacks.py)
+def engine_of(fn):
+    if (type(fn.body) is Code):
+        return "vm"
+    if (callable(fn.body)):
+        return "closure"
+    return "tree"
+
+def unwrap_memo(value):
+    memo = getattr(value.fn, "__self__", None)
+    return memo.fn if type(memo) is Memo else None
+
+# Everything a worker needs to make fn again: its declaration and the declarations of the
+# functions it uses, and the values of every other name they use from outside
+# Raises if fn can't be run in another process. Natives are only ever run here, None
+def capture(name, fn):
+    if (type(fn) is NativeFunctionVal and unwrap_memo(fn) is not None):
+        fn = unwrap_memo(fn)
+    if (type(fn) is NativeFunctionVal):
+        if (fn.fn in SIDE_EFFECT_NATIVES):
+            raise Exception(f"{name}() can't run a native function with side effects in parallel")
+        return None
+
+    def reject(function, reason):
+        raise Exception(f"{name}() can't run {function.name} in parallel: {reason}")
+
+    declarations = {}
+    values = {}
+    pending = [fn]
+    while (len(pending) > 0):
+        function = pending.pop()
+        if (declarations.get(function.name, function) is not function or function.name in values):
+            reject(fn, f"it uses two different things named '{function.name}'")
+        if (function.name in declarations):
+            continue
+        declarations[function.name] = function
+
+        captures = CaptureFinder(function.declaration)
+        for var in sorted(captures.assigned):
+            reject(function, f"it assigns to '{var}', which is declared outside of it")
+        for var in sorted(captures.changed):
+            reject(function, f"it changes the contents of '{var}', which it doesn't own")
+
+        for var, (node, frames) in captures.free.items():
+            value = captured_value(function, var, node, frames)
+            if (value is MISSING):
+                continue
+            if (type(value) is NativeFunctionVal and unwrap_memo(value) is not None):
+                value = unwrap_memo(value)
+            if (type(value) is FunctionVal):
+                if (value.name != var):
+                    reject(function, f"it uses the function {value.name} as '{var}'")
+                pending.append(value)
+                continue
+
+            if (type(value) not in SENDABLE_TYPES):
+                reject(function, f"it uses the {type_of(value)} '{var}' from outside of it, which could be changed")
+            if (type(value) is NativeFunctionVal and value.fn in SIDE_EFFECT_NATIVES):
+                reject(function, f"it calls {var}(), which has side effects")
+            if (var in declarations or (var in values and not same_value(values[var], value))):
+                reject(fn, f"it uses two different things named '{var}'")
+            values[var] = value
+
+    return (engine_of(fn), [function.declaration for function in declarations.values()], values, fn.name)
+
+def same_value(a, b):
+    if (type(a) is not type(b)):
+        return False
+    if (type(a) is StringVal):
+        return a.value == b.value
+    return a is b or a == b
+
+# Worker side: the function a capture() stands for, made once per worker
+loaded = {}
+
+def load_function(payload):
+    loaded_fn = loaded.get(payload)
+    if (loaded_fn is not None):
+        return loaded_fn
+
+    # Imported here: library imports this module for the natives
+    from embed import compile_ast, execute
+    from library import create_global_env
+
+    engine, declarations, values, name = pickle.loads(payload)
+    env = Environment(parent=create_global_env(), in_function=False)
+    for var, value in values.items():
+        env.declare_var(var, value)
+    program = Program()
+    program.body.extend(declarations)
+    execute(compile_ast(program, engine), env, engine)
+
+    if (len(loaded) >= 16):
+        loaded.clear()
+    loaded_fn = loaded[payload] = (env.lookup_var(name), env)
+    return loaded_fn
+
+def map_chunk(call, elements):
+    return [call([element]) for element in elements]
+
+def filter_chunk(call, elements):
+    keep = [call([element]) for element in elements]
+    for value in keep:
+        if (type(value) is not bool):
+            raise Exception("pfilter() function must return a boolean")
+    return keep
+
+def reduce_chunk(call, elements):
+    elements = iter(elements)
+    result = next(elements)
+    for element in elements:
+        result = call([result, element])
+    return result
+
+# native name -> (what a worker does with a chunk, how many arguments fn takes)
+CHUNK_FUNCTIONS = {
+    "pmap": (map_chunk, 1),
+    "pfilter": (filter_chunk, 1),
+    "preduce": (reduce_chunk, 2),
+}
+
+def run_chunk(payload, name, elements):
+    fn, env = load_function(payload)
+    work, arity = CHUNK_FUNCTIONS[name]
+    return work(function_caller(name, fn, env, arity), elements)
+
+# Runs elements through run_here(chunk) in this process while timing it, then the rest on the
+# pool when that's worth it. Returns the results of the chunks run here and of the ones run
+# on the pool, in order
+def run_parallel(name, fn, elements, run_here):
+    captured = capture(name, fn)
+    count = len(elements)
+    here = []
+    done = 0
+    size = 1
+    start = time.perf_counter()
+    while (done < count):
+        here.append(run_here(elements[done:done + size]))
+        done += size
+        if (time.perf_counter() - start >= PROBE_TIME):
+            break
+        size *= 2
+    if (done >= count):
+        return here, []
+
+    per_element = (time.perf_counter() - start) / done
+    remaining = count - done
+    if (captured is None or workers <= 1 or in_worker or per_element * remaining < PARALLEL_MIN_TIME):
+        here.append(run_here(elements[done:]))
+        return here, []
+
+    payload = pickle.dumps(captured, protocol=pickle.HIGHEST_PROTOCOL)
+    size = max(1, min(int(CHUNK_TIME / per_element), -(-remaining // (workers * 4))))
+    chunks = [elements[i:i + size] for i in range(done, count, size)]
+    return here, list(get_pool().map(run_chunk, repeat(payload), repeat(name), chunks))
+
+def check_function_args(name, args, expected):
+    if (len(args) != 2):
+        raise Exception(f"{name}() expects {expected}")
+    check_array(name, args[0])
+
+# pmap(arr, fn), map() with the calls spread over worker processes
+def native_pmap(args, env):
+    check_function_args("pmap", args, "an array and a function")
+    arr, fn = args
+    call = function_caller("pmap", fn, env, 1)
+
+    here, pooled = run_parallel("pmap", fn, arr.elements, lambda chunk: map_chunk(call, chunk))
+    return ArrayVal([value for part in here + pooled for value in part])
+
+# pfilter(arr, fn), filter() with the calls spread over worker processes
+def native_pfilter(args, env):
+    check_function_args("pfilter", args, "an array and a function")
+    arr, fn = args
+    call = function_caller("pfilter", fn, env, 1)
+
+    here, pooled = run_parallel("pfilter", fn, arr.elements, lambda chunk: filter_chunk(call, chunk))
+    keep = [value for part in here + pooled for value in part]
+    kept = [element for element, value in zip(arr.elements, keep) if value]
+    if (type(arr.elements) is list):
+        return ArrayVal(kept)
+    return ArrayVal(array(arr.elements.typecode, kept))
+
+# preduce(arr, fn) or preduce(arr, fn, initial), reduce() with the calls spread over worker
+# processes. Each chunk is folded on its own and the results are folded with fn again, so
+# fn(fn(a, b), c) has to equal fn(a, fn(b, c))
+def native_preduce(args, env):
+    if (len(args) < 2 or len(args) > 3):
+        raise Exception("preduce() expects an array, a function and an optional initial value")
+    arr, fn = args[0], args[1]
+    check_array("preduce", arr)
+    call = function_caller("preduce", fn, env, 2)
+
+    elements = arr.elements
+    if (len(args) == 3):
+        result = args[2]
+    elif (len(elements) == 0):
+        raise Exception("preduce() of an empty array needs an initial value")
+    else:
+        result = elements[0]
+        elements = elements[1:]
+
+    def reduce_here(chunk):
+        nonlocal result
+        for element in chunk:
+            result = call([result, element])
+
+    here, pooled = run_parallel("preduce", fn, elements, reduce_here)
+    for value in pooled:
+        result = call([result, value])
+    return result
+
+PARALLEL_FUNCTIONS = {
+    "pmap": native_pmap,
+    "pfilter": native_pfilter,
+    "preduce": native_preduce,
+}
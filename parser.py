@@ -3,25 +3,27 @@ from nodes import (
     VarDeclaration, AssignmentExpr, Block, ComparisonExpr, 
     IfStmt, FunctionDeclaration, CallExpr, WhileLoop, 
     StringLiteral, UnaryExpr, ReturnStmt, ArrayLiteral,
-    IndexExpr
+    IndexExpr, MapLiteral
     )
-from lexer import Token, TokenType
+from lexer import Token, TokenType, TOKEN_NAMES
 
+# Returned once the tokens run out
+END_OF_TOKENS = Token("EOF", TokenType.EOF)
 
 class Parser:
-    def __init__(self, tokens: list[Token]):
-        self.tokens = tokens
-        self.pos = 0
+    # tokens can be a list or any iterable, e.g. lexer.iter_tokens() to parse while scanning
+    # Only the current token is kept
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.current = next(self.tokens, END_OF_TOKENS)
 
     # Helper returns cur token
     def current_token(self):
-        if (self.pos < len(self.tokens)):
-            return self.tokens[self.pos]
-        return Token("EOF", TokenType.EOF)
+        return self.current
 
     # Helper moves to next token
     def advance(self):
-        self.pos += 1
+        self.current = next(self.tokens, END_OF_TOKENS)
 
     # Helper returns true if hasn't reached EOF yet
     def not_eof(self):
@@ -38,7 +40,7 @@ class Parser:
         token = self.current_token()
 
         if (token.type != token_type):
-            raise Exception(f"Expected {token_type}, got {token.type}")
+            raise Exception(f"Expected {TOKEN_NAMES[token_type]}, got {TOKEN_NAMES[token.type]}")
         
         self.advance()
         return token
@@ -46,11 +48,15 @@ class Parser:
     def produce_ast(self):
         program = Program()
 
-        while self.not_eof():
-            stmt = self.parse_stmt()
+        for stmt in self.iter_statements():
             program.body.append(stmt)
 
         return program
+
+    # Yields top-level statements one at a time, each one is parsed only when it's asked for
+    def iter_statements(self):
+        while self.not_eof():
+            yield self.parse_stmt()
     
     def parse_stmt(self):
         match self.current_token().type:
@@ -58,6 +64,12 @@ class Parser:
                 return self.parse_while_loop()
             case TokenType.FDECLARE:
                 return self.parse_function_declaration()
+            case TokenType.PURE:
+                # pure fdeclare, the function's results are memoized (see memo.py)
+                self.advance()
+                declaration = self.parse_function_declaration()
+                declaration.pure = True
+                return declaration
             case TokenType.DECLARE:
                 return self.parse_var_declaration()
             case TokenType.CONST:
@@ -196,9 +208,10 @@ class Parser:
     def parse_additive_expr(self):
         left = self.parse_multiplicative_expr()
 
+        # The token type is checked too, a string token can hold "+" as well
         while(
-            self.current_token().value == '+' or 
-            self.current_token().value == '-'
+            self.current_token().type == TokenType.OPERATOR and
+            self.current_token().value in ('+', '-')
             ):
             operator = self.cur_token_and_advance().value
 
@@ -212,9 +225,8 @@ class Parser:
         left = self.parse_unary_expr()
 
         while(
-            self.current_token().value == '*' or 
-            self.current_token().value == '/' or 
-            self.current_token().value == '%'
+            self.current_token().type == TokenType.OPERATOR and
+            self.current_token().value in ('*', '/', '%')
             ):
             operator = self.cur_token_and_advance().value
 
@@ -225,7 +237,7 @@ class Parser:
         return left
     
     def parse_unary_expr(self):
-        if (self.current_token().value in ('-', '!')):
+        if (self.current_token().type != TokenType.STRING and self.current_token().value in ('-', '!')):
             operator = self.cur_token_and_advance().value
             operand = self.parse_unary_expr()
             return UnaryExpr(operator, operand)
@@ -296,5 +308,26 @@ class Parser:
                 self.expect(TokenType.CLOSE_SQR_PAREN)
                 return ArrayLiteral(elements)
 
+            # Map literals, e.g. {"a": 1, 2: true}
+            # A { that starts a statement is still a block (see parse_stmt)
+            case TokenType.OPEN_CURLY_PAREN:
+                self.advance()
+                entries = []
+
+                if (self.current_token().type != TokenType.CLOSE_CURLY_PAREN):
+                    entries.append(self.parse_map_entry())
+                    while (self.current_token().type == TokenType.COMMA):
+                        self.advance()
+                        entries.append(self.parse_map_entry())
+
+                self.expect(TokenType.CLOSE_CURLY_PAREN)
+                return MapLiteral(entries)
+
             case _:
                 raise Exception(f"Unexpected token: {self.current_token()}")
+
+    def parse_map_entry(self):
+        key = self.parse_expr()
+        self.expect(TokenType.COLON)
+        value = self.parse_expr()
+        return (key, value)
@@ -0,0 +1,159 @@
+import time
+import eval.interpreter as interpreter
+import eval.expressions as expressions
+from nodes import NodeType
+from eval.interpreter import evaluate
+
+# Deterministic profiler for the tree-walker (--profile)
+# While it's installed, the tree-walker's call env helpers and while evaluator are wrapped
+# by the timed versions below, so runs without --profile don't pay anything for it
+#   - user functions: calls, inclusive and exclusive wall time per fdeclare name
+#     (a recursive function's inclusive time only counts its outermost call)
+#   - while loops: how many times each one ran and how many iterations it did in total
+#   - collapsed stacks ("<main>;outer;inner <microseconds>"), the exclusive time of every call
+#     stack, for flamegraph tools
+
+MAIN = "<main>"
+
+class FunctionStats:
+    __slots__ = ("calls", "inclusive", "exclusive")
+
+    def __init__(self):
+        self.calls = 0
+        self.inclusive = 0
+        self.exclusive = 0
+
+class LoopStats:
+    __slots__ = ("runs", "iterations", "time")
+
+    def __init__(self):
+        self.runs = 0
+        self.iterations = 0
+        self.time = 0
+
+class Profiler:
+    def __init__(self, program):
+        self.functions = {}
+        # WhileLoop node -> LoopStats, and its "function:while#n" label
+        self.loops = {}
+        self.loop_labels = {}
+        # Call stack (tuple of names) -> exclusive nanoseconds
+        self.stacks = {}
+        # [name, start, time spent in calls made from it, call stack] of every call being timed
+        self.frames = []
+        # name -> calls of it being timed right now
+        self.active = {}
+        self.saved = None
+
+        self.label_loops(program.body, MAIN, {})
+
+    # Numbers the loops of every function in source order, the label says where a loop is
+    # since nodes don't keep line numbers
+    def label_loops(self, statements, function, counts):
+        for stmt in statements:
+            match stmt.type:
+                case NodeType.WHILE_LOOP:
+                    counts[function] = counts.get(function, 0) + 1
+                    self.loop_labels[stmt] = f"{function}:while#{counts[function]}"
+                    self.label_loops(stmt.body.body, function, counts)
+                case NodeType.BLOCK:
+                    self.label_loops(stmt.body, function, counts)
+                case NodeType.IF_STMT:
+                    self.label_loops(stmt.body.body, function, counts)
+                    for condition, block in stmt.elif_branches:
+                        self.label_loops(block.body, function, counts)
+                    if (stmt.else_block is not None):
+                        self.label_loops(stmt.else_block.body, function, counts)
+                case NodeType.FUNCTION_DECLARATION:
+                    self.label_loops(stmt.body.body, stmt.name, counts)
+
+    def install(self):
+        self.saved = (expressions.acquire_call_env, expressions.release_call_env, interpreter.eval_while_loop)
+        expressions.acquire_call_env = self.acquire_call_env
+        expressions.release_call_env = self.release_call_env
+        interpreter.eval_while_loop = self.eval_while_loop
+        self.frames.append([MAIN, time.perf_counter_ns(), 0, (MAIN,)])
+        self.active[MAIN] = 1
+
+    def uninstall(self):
+        expressions.acquire_call_env, expressions.release_call_env, interpreter.eval_while_loop = self.saved
+        # Calls an error went through have already been closed by release_call_env()
+        while (len(self.frames) > 0):
+            self.exit()
+
+    def enter(self, name):
+        self.frames.append([name, time.perf_counter_ns(), 0, self.frames[-1][3] + (name,)])
+        self.active[name] = self.active.get(name, 0) + 1
+
+    def exit(self):
+        name, start, child_time, stack = self.frames.pop()
+        elapsed = time.perf_counter_ns() - start
+
+        stats = self.functions.get(name)
+        if (stats is None):
+            stats = self.functions[name] = FunctionStats()
+        stats.calls += 1
+        stats.exclusive += elapsed - child_time
+        self.active[name] -= 1
+        if (self.active[name] == 0):
+            stats.inclusive += elapsed
+
+        self.stacks[stack] = self.stacks.get(stack, 0) + elapsed - child_time
+        if (len(self.frames) > 0):
+            self.frames[-1][2] += elapsed
+
+    # Every kind of call (eval_call_expr, call_declaring_params, call_function) starts with
+    # acquire_call_env() and ends with release_call_env(). eval_call_expr and call_function
+    # evaluate the arguments first, so those are timed in the caller
+    def acquire_call_env(self, fn):
+        self.enter(fn.name)
+        return self.saved[0](fn)
+
+    def release_call_env(self, fn, call_env):
+        self.saved[1](fn, call_env)
+        self.exit()
+
+    def eval_while_loop(self, node, env):
+        stats = self.loops.get(node)
+        if (stats is None):
+            stats = self.loops[node] = LoopStats()
+        stats.runs += 1
+
+        def count_iteration(body, body_env):
+            stats.iterations += 1
+            return evaluate(body, body_env)
+
+        start = time.perf_counter_ns()
+        try:
+            return self.saved[2](node, env, count_iteration)
+        finally:
+            stats.time += time.perf_counter_ns() - start
+
+    def print_report(self, file):
+        total = self.functions[MAIN].inclusive or 1
+
+        print("Functions (by exclusive time)", file=file)
+        print(f"{'name':<24}{'calls':>10}{'inclusive ms':>15}{'exclusive ms':>15}{'exclusive %':>13}", file=file)
+        ordered = sorted(self.functions.items(), key=lambda item: item[1].exclusive, reverse=True)
+        for name, stats in ordered:
+            print(
+                f"{name:<24}{stats.calls:>10}{stats.inclusive / 1e6:>15.3f}"
+                f"{stats.exclusive / 1e6:>15.3f}{100 * stats.exclusive / total:>12.1f}%",
+                file=file
+            )
+
+        if (len(self.loops) > 0):
+            print(file=file)
+            print("Loops (by time)", file=file)
+            print(f"{'loop':<32}{'runs':>10}{'iterations':>14}{'ms':>15}", file=file)
+            ordered = sorted(self.loops.items(), key=lambda item: item[1].time, reverse=True)
+            for node, stats in ordered:
+                label = self.loop_labels.get(node, "while")
+                print(f"{label:<32}{stats.runs:>10}{stats.iterations:>14}{stats.time / 1e6:>15.3f}", file=file)
+
+    # One "name;name;name microseconds" line per call stack
+    def write_stacks(self, file):
+        for stack, nanoseconds in self.stacks.items():
+            microseconds = nanoseconds // 1000
+            if (microseconds > 0):
+                file.write(f"{';'.join(stack)} {microseconds}\n")
@@ -0,0 +1,194 @@
+from nodes import NodeType
+
+# A scope seen by the resolver: the program itself ("global"), a function body or a block
+class Scope:
+    def __init__(self, parent, kind):
+        self.parent = parent
+        self.kind = kind
+        # name -> slot, the global scope only tracks names (slot None)
+        self.names = {}
+        self.constants = set()
+        # Local function bodies are resolved when the scope ends so they can see every name in it
+        self.deferred = []
+
+    # Returns the name's slot and the error the declaration raises when it runs, None unless the
+    # name is already declared here (the later declaration keeps using the first one's slot)
+    def declare(self, name, is_const):
+        if (name in self.names):
+            return self.names[name], f"Cannot declare variable '{name}', it is already defined."
+
+        slot = None if self.kind == "global" else len(self.names)
+        self.names[name] = slot
+        if (is_const):
+            self.constants.add(name)
+        return slot, None
+
+    # Blocks without declarations are run in their parent's frame
+    def has_frame(self):
+        return self.kind == "function" or (self.kind == "block" and len(self.names) > 0)
+
+# Runs after parsing and gives every local Identifier, VarDeclaration and FunctionDeclaration
+# a slot, so the compiled engines can use Frames instead of looking names up in Environments.
+# Top-level names stay in the global Environment and are still looked up by name.
+# Redeclarations and const reassignments that can be seen here are stored in the node as the
+# error it raises when it runs, so they're reported at the same point as with the tree-walker.
+class Resolver:
+    def __init__(self):
+        self.scope = Scope(None, "global")
+        # (identifier, scope it's used in, scopes it's declared in), depths are worked out at the end
+        # once every scope knows whether it needs a frame
+        self.references = []
+
+    def resolve_program(self, program):
+        for stmt in program.body:
+            self.resolve_node(stmt)
+        self.finish()
+        return program
+
+    def finish(self):
+        for node, scope, targets in self.references:
+            addresses = [
+                (self.depth_between(scope, target), target.names[node.symbol], node.symbol in target.constants)
+                for target in targets
+            ]
+            node.depth = addresses[0][0]
+            node.constant = addresses[0][2]
+            node.fallbacks = tuple(addresses[1:])
+        self.references = []
+
+    def depth_between(self, scope, target):
+        depth = 0
+        while (scope is not target):
+            if (scope.has_frame()):
+                depth += 1
+            scope = scope.parent
+        return depth
+
+    def begin_scope(self, kind):
+        self.scope = Scope(self.scope, kind)
+        return self.scope
+
+    def end_scope(self):
+        scope = self.scope
+        for node in scope.deferred:
+            self.resolve_function_body(node)
+        self.scope = scope.parent
+        return scope
+
+    def resolve_statements(self, statements):
+        for stmt in statements:
+            self.resolve_node(stmt)
+
+    def resolve_node(self, node):
+        match node.type:
+            case NodeType.NUMERIC_LITERAL | NodeType.STRING_LITERAL | NodeType.LITERAL:
+                return
+            case NodeType.IDENTIFIER:
+                self.resolve_identifier(node)
+            case NodeType.BINARY_EXPR | NodeType.COMPARISON_EXPR:
+                self.resolve_node(node.left)
+                self.resolve_node(node.right)
+            case NodeType.UNARY_EXPR:
+                self.resolve_node(node.operand)
+            case NodeType.ASSIGNMENT_EXPR:
+                self.resolve_node(node.value)
+                if (node.assignee.type == NodeType.IDENTIFIER):
+                    target = self.resolve_identifier(node.assignee)
+                    # Globals are checked by the global env, and names from an enclosing function
+                    # when they're stored to (it depends on which of its addresses is declared)
+                    if (target is not None and target.kind != "global" and not node.assignee.checked
+                            and node.assignee.symbol in target.constants):
+                        node.error = f"Cannot reassign constant '{node.assignee.symbol}'."
+                else:
+                    self.resolve_node(node.assignee)
+            case NodeType.VAR_DECLARATION:
+                # The value is resolved first so `declare x = x;` sees the outer x
+                self.resolve_node(node.value)
+                node.slot, node.error = self.scope.declare(node.identifier.value, node.isConst)
+            case NodeType.BLOCK:
+                self.begin_scope("block")
+                self.resolve_statements(node.body)
+                node.frame_size = len(self.end_scope().names)
+            case NodeType.IF_STMT:
+                self.resolve_node(node.condition)
+                self.resolve_node(node.body)
+                for elif_condition, elif_block in node.elif_branches:
+                    self.resolve_node(elif_condition)
+                    self.resolve_node(elif_block)
+                if (node.else_block is not None):
+                    self.resolve_node(node.else_block)
+            case NodeType.WHILE_LOOP:
+                self.resolve_node(node.condition)
+                self.resolve_node(node.body)
+            case NodeType.FUNCTION_DECLARATION:
+                node.slot, node.error = self.scope.declare(node.name, True)
+                # Top-level functions only see globals, which are looked up by name anyway
+                if (self.scope.kind == "global"):
+                    self.resolve_function_body(node)
+                else:
+                    self.scope.deferred.append(node)
+            case NodeType.CALL_EXPR:
+                self.resolve_node(node.callee)
+                for arg in node.args:
+                    self.resolve_node(arg)
+            case NodeType.RETURN_STMT:
+                if (node.value is not None):
+                    self.resolve_node(node.value)
+            case NodeType.ARRAY_LITERAL:
+                for element in node.elements:
+                    self.resolve_node(element)
+            case NodeType.MAP_LITERAL:
+                for key, value in node.entries:
+                    self.resolve_node(key)
+                    self.resolve_node(value)
+            case NodeType.INDEX_EXPR:
+                self.resolve_node(node.array)
+                self.resolve_node(node.index)
+            case _:
+                raise Exception(f"No evaluation rule for {node.type}")
+
+    # The body runs directly in the call frame, params take the first slots
+    def resolve_function_body(self, node):
+        self.begin_scope("function")
+        for param in node.params:
+            slot, error = self.scope.declare(param, False)
+            if (error is not None and node.params_error is None):
+                node.params_error = error
+        self.resolve_statements(node.body.body)
+        node.frame_size = len(self.end_scope().names)
+
+    # Returns the scope the name was found in, None for globals
+    # A name used from an enclosing function can be declared there after the function (bodies are
+    # resolved at the end of their scope), so until that declaration runs the name is still found
+    # further out, as in the tree-walker. Every scope further out that declares it is kept as a
+    # fallback, and the global env comes after the last one
+    def resolve_identifier(self, node):
+        scope = self.scope
+        crosses_function = False
+
+        while (scope is not None and scope.kind != "global"):
+            if (node.symbol in scope.names):
+                node.slot = scope.names[node.symbol]
+                node.checked = crosses_function
+                targets = [scope]
+                if (crosses_function):
+                    outer = scope.parent
+                    while (outer is not None and outer.kind != "global"):
+                        if (node.symbol in outer.names):
+                            targets.append(outer)
+                        outer = outer.parent
+                self.references.append((node, self.scope, targets))
+                return scope
+            if (scope.kind == "function"):
+                crosses_function = True
+            scope = scope.parent
+
+        node.slot = None
+        node.depth = None
+        node.fallbacks = ()
+        if (scope is not None and node.symbol in scope.names):
+            return scope
+        return None
+
+def resolve(program):
+    return Resolver().resolve_program(program)
@@ -0,0 +1,135 @@
+import sys
+import threading
+import eval.expressions
+import eval.statements
+import vm.machine
+import callbacks
+from closure.compiler import ClosureCompiler
+from values import FunctionVal
+from nodes import Node
+
+# Sampling profiler (--sample FILE), for long runs where the timing done by --profile would
+# change the results too much. Works with every engine.
+# A thread wakes up every interval and looks at the main thread's Python stack
+# (sys._current_frames()). That stack already holds everything needed to rebuild the RowScript
+# one, so the interpreter keeps no shadow stack of its own and runs exactly as it does without
+# sampling:
+#   - tree: frames running a call (eval_call_expr, call_function, ...) have the FunctionVal in
+#     fn once the body has started (result is set), and the innermost frame running a list of
+#     statements has the current one in stmt, its node type ends the stack
+#   - closure: the call closures have the FunctionVal in fn, the body has started when the
+#     next frame is the function's invoke closure. Calls from natives (map, ...) go through
+#     call_closure in callbacks.py, which has it in fn too
+#   - vm: every run() has the calls waiting for a result in calls and the running code in code
+# tests/test_sampler.py checks the stacks this gives on every engine, so renaming one of these
+# locals has to come with a change here
+# Each sample counts once for its stack, written out in collapsed format for flamegraph tools
+
+DEFAULT_INTERVAL = 0.01
+
+MAIN = "<main>"
+
+# Code objects of the frames that matter -> what they are
+TREE_CALL = 0
+TREE_STATEMENTS = 1
+CLOSURE_CALL = 2
+VM_RUN = 3
+CLOSURE_CALLBACK = 4
+
+def find_code(function, name):
+    for const in function.__code__.co_consts:
+        if (getattr(const, "co_name", None) == name):
+            yield const
+
+FRAME_KINDS = {
+    eval.expressions.eval_call_expr.__code__: TREE_CALL,
+    eval.expressions.call_declaring_params.__code__: TREE_CALL,
+    eval.expressions.call_function.__code__: TREE_CALL,
+    eval.statements.eval_program.__code__: TREE_STATEMENTS,
+    eval.statements.eval_block.__code__: TREE_STATEMENTS,
+    vm.machine.run.__code__: VM_RUN,
+}
+for code in find_code(ClosureCompiler.compile_call_expr, "call"):
+    FRAME_KINDS[code] = CLOSURE_CALL
+for code in find_code(callbacks.function_caller, "call_closure"):
+    FRAME_KINDS[code] = CLOSURE_CALLBACK
+CLOSURE_INVOKE = set(find_code(ClosureCompiler.compile_function_decl, "invoke"))
+
+class Sampler:
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        # Call stack (tuple of names) -> number of samples
+        self.counts = {}
+        self.target = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    # Starts sampling the thread calling it
+    def start(self):
+        self.target = threading.get_ident()
+        self.thread = threading.Thread(target=self.sample_loop, name="rowscript-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def sample_loop(self):
+        while (not self.stopped.wait(self.interval)):
+            frame = sys._current_frames().get(self.target)
+            if (frame is None):
+                break
+            stack = rowscript_stack(frame)
+            self.counts[stack] = self.counts.get(stack, 0) + 1
+
+    def write_stacks(self, file):
+        for stack, count in self.counts.items():
+            file.write(f"{';'.join(stack)} {count}\n")
+
+# The RowScript call stack of the Python stack ending in frame, outermost first
+def rowscript_stack(frame):
+    frames = []
+    while (frame is not None):
+        if (frame.f_code in FRAME_KINDS or frame.f_code in CLOSURE_INVOKE):
+            frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+
+    stack = [MAIN]
+    statement = None
+    for i, frame in enumerate(frames):
+        kind = FRAME_KINDS.get(frame.f_code)
+        if (kind is None):
+            continue
+        local_vars = frame.f_locals
+
+        if (kind == TREE_CALL):
+            fn = local_vars.get("fn")
+            if (type(fn) is FunctionVal and "result" in local_vars):
+                stack.append(fn.name)
+                statement = None
+            stmt = local_vars.get("stmt")
+            if (isinstance(stmt, Node)):
+                statement = stmt
+        elif (kind == TREE_STATEMENTS):
+            stmt = local_vars.get("stmt")
+            if (isinstance(stmt, Node)):
+                statement = stmt
+        elif (kind == CLOSURE_CALL):
+            fn = local_vars.get("fn")
+            body_started = i + 1 < len(frames) and frames[i + 1].f_code in CLOSURE_INVOKE
+            if (type(fn) is FunctionVal and body_started):
+                stack.append(fn.name)
+        elif (kind == CLOSURE_CALLBACK):
+            stack.append(local_vars["fn"].name)
+        elif (kind == VM_RUN):
+            for waiting in local_vars.get("calls", ()):
+                stack.append(waiting[0].name)
+            code = local_vars.get("code")
+            if (code is not None):
+                stack.append(code.name)
+
+    if (statement is not None):
+        stack.append(f"[{statement.type}]")
+    # The top-level code of the vm is the program itself
+    return tuple(name for name in stack if name != "<program>")
@@ -1,3 +1,9 @@
-class ReturnSignal(Exception):
+# What a return statement evaluates to
+# Blocks, loops and ifs stop as soon as a statement gives one back and pass it up unchanged,
+# the call that's running unwraps the value. Nothing is raised, so returns cost no more than
+# falling off the end of a function.
+class ReturnSignal:
+    __slots__ = ("value",)
+
     def __init__(self, value):
-        self.value = value
\ No newline at end of file
+        self.value = value
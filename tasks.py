@@ -0,0 +1,324 @@
+import asyncio
+import threading
+from collections import deque
+from values import RuntimeVal, StringVal, NULL, type_of
+from callbacks import function_caller
+from memo import note_side_effect
+
+# Tasks (spawn, join), channels and I/O natives that let other tasks run while they wait
+# Every task is a Python thread, so each one has its own stack and the engines don't need to be
+# able to pause in the middle of a call. Only one of them runs RowScript code at a time: the
+# one holding the scheduler's baton. It's only handed over where a task has to wait:
+#   - join() and receiving from an empty channel (or sending to a full one) wait on a condition
+#     that shares the baton's lock
+#   - readFile, writeFile and sleep release the baton while the work is done on an asyncio event
+#     loop running in its own thread, so any number of them can be waiting at once
+# A task that never waits runs until it's done, so tasks can't interrupt each other: the engines
+# don't need locks and a script can't see a change half-made. A spawned task first runs when its
+# parent waits. sleep(0) just lets the others run
+# The scheduler starts with the first spawn() and finish() (called when the script ends) waits
+# for every task that's still running
+
+class TaskVal(RuntimeVal):
+    def __init__(self, name):
+        super().__init__("task")
+        self.name = name
+        self.done = False
+        self.result = NULL
+        self.error = None
+        # Whether join() has seen the result, an error nobody joined is raised by finish()
+        self.joined = False
+
+    def __repr__(self):
+        return f"<task {self.name}>"
+
+class ChannelVal(RuntimeVal):
+    def __init__(self, capacity=None):
+        super().__init__("channel")
+        self.items = deque()
+        # None for no limit
+        self.capacity = capacity
+        self.closed = False
+
+    def __repr__(self):
+        return "<channel>"
+
+# Raised in tasks still running when the script they belong to stopped with an error
+class TaskCancelled(BaseException):
+    pass
+
+class Scheduler:
+    def __init__(self):
+        self.baton = threading.Lock()
+        # Notified whenever a task ends or a channel changes
+        self.changed = threading.Condition(self.baton)
+        self.tasks = []
+        # Tasks (the script's own thread included) that haven't ended and aren't waiting on
+        # changed. When the last of them waits, nothing could ever wake it up
+        self.active = 1
+        # Tasks waiting on changed. notify() counts them as active again straight away: a task
+        # that was woken up but hasn't got the baton back yet can still change something
+        self.waiting = 0
+        self.cancelled = False
+        # Taken by the thread that runs the script, it's the one that called spawn() first
+        self.baton.acquire()
+
+    def spawn(self, name, call, args):
+        task = TaskVal(name)
+        self.tasks.append(task)
+        self.active += 1
+        thread = threading.Thread(target=self.run_task, args=(task, call, args), name=f"rowscript-{name}", daemon=True)
+        thread.start()
+        return task
+
+    def run_task(self, task, call, args):
+        self.baton.acquire()
+        try:
+            if (not self.cancelled):
+                task.result = call(args)
+        except TaskCancelled:
+            pass
+        except RecursionError:
+            task.error = "maximum recursion depth exceeded"
+        except Exception as e:
+            task.error = str(e)
+        finally:
+            task.done = True
+            self.active -= 1
+            self.notify()
+            self.baton.release()
+
+    # Waits with the baton released until ready() is true
+    def wait_until(self, ready, waiting_for):
+        while (not ready()):
+            if (self.active == 1):
+                raise Exception(f"Deadlock: every task is waiting, {waiting_for} can never happen")
+            self.active -= 1
+            self.waiting += 1
+            self.changed.wait()
+            self.check_cancelled()
+
+    # Wakes up every waiting task to check whether it can go on
+    def notify(self):
+        self.active += self.waiting
+        self.waiting = 0
+        self.changed.notify_all()
+
+    # Runs a coroutine on the event loop with the baton released, so other tasks can run
+    def wait_for(self, coroutine):
+        self.baton.release()
+        try:
+            return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result()
+        finally:
+            self.baton.acquire()
+            self.check_cancelled()
+
+    def check_cancelled(self):
+        if (self.cancelled):
+            raise TaskCancelled()
+
+scheduler = None
+
+def get_scheduler():
+    global scheduler
+    if (scheduler is None):
+        scheduler = Scheduler()
+    return scheduler
+
+# Called when the script is done: waits for every task, then stops the scheduler
+# Raises the error of a task that failed and was never joined
+def finish():
+    global scheduler
+    if (scheduler is None):
+        return
+    current = scheduler
+    try:
+        current.wait_until(lambda: all(task.done for task in current.tasks), "the end of the script")
+    finally:
+        abort()
+    for task in current.tasks:
+        if (task.error is not None and not task.joined):
+            raise Exception(f"Task {task.name} failed: {task.error}")
+
+# Stops the scheduler without waiting, tasks still running are stopped the next time they wait
+def abort():
+    global scheduler
+    if (scheduler is None):
+        return
+    current = scheduler
+    scheduler = None
+    current.cancelled = True
+    current.changed.notify_all()
+    current.baton.release()
+
+# The event loop I/O natives wait on, in a thread of its own
+loop = None
+loop_lock = threading.Lock()
+
+def get_loop():
+    global loop
+    with (loop_lock):
+        if (loop is None):
+            new_loop = asyncio.new_event_loop()
+            threading.Thread(target=new_loop.run_forever, name="rowscript-io", daemon=True).start()
+            loop = new_loop
+    return loop
+
+# Runs a coroutine from a native: letting other tasks run if there are any
+def wait_for(coroutine):
+    if (scheduler is not None):
+        return scheduler.wait_for(coroutine)
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result()
+
+def check_task(name, value):
+    if (type_of(value) != "task"):
+        raise Exception(f"{name}() expects a task")
+
+def check_channel(name, value):
+    if (type_of(value) != "channel"):
+        raise Exception(f"{name}() expects a channel")
+
+def check_string(name, value):
+    if (type(value) is not StringVal):
+        raise Exception(f"{name}() expects a string")
+
+# spawn(fn, args...), starts running fn(args...) as a new task and returns it
+def native_spawn(args, env):
+    if (len(args) < 1):
+        raise Exception("spawn() expects a function and its arguments")
+    fn = args[0]
+    call = function_caller("spawn", fn, env, len(args) - 1)
+    note_side_effect()
+    return get_scheduler().spawn(getattr(fn, "name", None) or "native", call, list(args[1:]))
+
+# join(task), waits for the task to end and returns what its function returned
+# An error in the task is raised again here
+def native_join(args, env):
+    if (len(args) != 1):
+        raise Exception("join() expects exactly one argument")
+    task = args[0]
+    check_task("join", task)
+
+    if (not task.done):
+        if (scheduler is None):
+            raise Exception(f"Task {task.name} was stopped")
+        scheduler.wait_until(lambda: task.done, f"task {task.name} ending")
+    task.joined = True
+    if (task.error is not None):
+        raise Exception(f"Task {task.name} failed: {task.error}")
+    return task.result
+
+# channel() or channel(capacity), a queue tasks can pass values through
+# send() to a channel holding capacity values waits until one is received
+def native_channel(args, env):
+    if (len(args) > 1):
+        raise Exception("channel() expects an optional capacity")
+    capacity = None
+    if (len(args) == 1):
+        capacity = args[0]
+        if (type(capacity) is not int or capacity < 1):
+            raise Exception("channel() capacity must be a positive integer")
+    return ChannelVal(capacity)
+
+def native_send(args, env):
+    if (len(args) != 2):
+        raise Exception("send() expects a channel and a value")
+    channel, value = args
+    check_channel("send", channel)
+    if (channel.closed):
+        raise Exception("send() on a closed channel")
+
+    note_side_effect()
+    if (channel.capacity is not None and len(channel.items) >= channel.capacity):
+        get_scheduler().wait_until(lambda: len(channel.items) < channel.capacity or channel.closed, "a receive")
+        if (channel.closed):
+            raise Exception("send() on a closed channel")
+    channel.items.append(value)
+    if (scheduler is not None):
+        scheduler.notify()
+    return NULL
+
+# receive(channel), the oldest value sent to the channel, waits for one if there's none
+# Returns null once the channel is closed and empty
+def native_receive(args, env):
+    if (len(args) != 1):
+        raise Exception("receive() expects exactly one argument")
+    channel = args[0]
+    check_channel("receive", channel)
+
+    note_side_effect()
+    if (len(channel.items) == 0 and not channel.closed):
+        get_scheduler().wait_until(lambda: len(channel.items) > 0 or channel.closed, "a send")
+    if (len(channel.items) == 0):
+        return NULL
+    value = channel.items.popleft()
+    if (scheduler is not None):
+        scheduler.notify()
+    return value
+
+# close(channel), nothing more can be sent and receivers get null once it's empty
+def native_close(args, env):
+    if (len(args) != 1):
+        raise Exception("close() expects exactly one argument")
+    channel = args[0]
+    check_channel("close", channel)
+
+    note_side_effect()
+    channel.closed = True
+    if (scheduler is not None):
+        scheduler.notify()
+    return NULL
+
+# sleep(ms), other tasks run in the meantime
+def native_sleep(args, env):
+    if (len(args) != 1 or type(args[0]) not in (int, float) or args[0] < 0):
+        raise Exception("sleep() expects a number of milliseconds")
+    note_side_effect()
+    wait_for(asyncio.sleep(args[0] / 1000))
+    return NULL
+
+def read_file(path):
+    with (open(path, "r") as f):
+        return f.read()
+
+def write_file(path, text):
+    with (open(path, "w") as f):
+        f.write(text)
+
+# readFile(path), the contents of a text file
+def native_read_file(args, env):
+    if (len(args) != 1):
+        raise Exception("readFile() expects exactly one argument")
+    check_string("readFile", args[0])
+
+    note_side_effect()
+    try:
+        return StringVal(wait_for(asyncio.to_thread(read_file, args[0].value)))
+    except OSError as e:
+        raise Exception(f"readFile() couldn't read {args[0].value}: {e.strerror}") from None
+
+# writeFile(path, text), replaces the contents of a text file
+def native_write_file(args, env):
+    if (len(args) != 2):
+        raise Exception("writeFile() expects a path and a string")
+    check_string("writeFile", args[0])
+    check_string("writeFile", args[1])
+
+    note_side_effect()
+    try:
+        wait_for(asyncio.to_thread(write_file, args[0].value, args[1].value))
+    except OSError as e:
+        raise Exception(f"writeFile() couldn't write {args[0].value}: {e.strerror}") from None
+    return NULL
+
+TASK_FUNCTIONS = {
+    "spawn": native_spawn,
+    "join": native_join,
+    "channel": native_channel,
+    "send": native_send,
+    "receive": native_receive,
+    "close": native_close,
+    "sleep": native_sleep,
+    "readFile": native_read_file,
+    "writeFile": native_write_file,
+}
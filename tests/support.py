@@ -0,0 +1,37 @@
+# Helpers shared by the tests
+import io
+import os
+import sys
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.setrecursionlimit(10000)
+
+from embed import run, ENGINES
+from library import create_global_env
+import tasks
+
+# Runs source the way main.py does, waiting for the tasks it spawned
+def run_to_end(source, engine, optimized):
+    try:
+        run(source, create_global_env(), engine, optimized)
+        tasks.finish()
+    finally:
+        tasks.abort()
+
+# What source prints when run on engine, in a new global env
+def run_script(source, engine="tree", optimized=False):
+    output = io.StringIO()
+    with (contextlib.redirect_stdout(output)):
+        run_to_end(source, engine, optimized)
+    return output.getvalue()
+
+# What source prints before it fails on engine, and the exception it raises (None if it doesn't)
+def run_failing_script(source, engine="tree", optimized=False):
+    output = io.StringIO()
+    try:
+        with (contextlib.redirect_stdout(output)):
+            run_to_end(source, engine, optimized)
+    except Exception as error:
+        return output.getvalue(), error
+    return output.getvalue(), None
@@ -0,0 +1,47 @@
+import unittest
+from array import array
+from support import run_script, ENGINES
+from embed import run
+from library import create_global_env
+from values import ArrayVal
+
+# The ArrayVal the script's last statement gives
+def array_of(source, engine="tree"):
+    value = run(source, create_global_env(), engine)
+    assert type(value) is ArrayVal
+    return value
+
+class TypedArrayTest(unittest.TestCase):
+    # All-int and all-float arrays are packed, anything else stays a list so no element changes type
+    def test_storage(self):
+        self.assertEqual(ArrayVal([1, 2]).elements, array("q", [1, 2]))
+        self.assertEqual(ArrayVal([1.5, 2.5]).elements, array("d", [1.5, 2.5]))
+        for elements in ([1, 2.0], [True, False], [2 ** 63, 1], [], [1, "a"]):
+            with (self.subTest(elements=elements)):
+                self.assertIs(type(ArrayVal(list(elements)).elements), list)
+
+    def test_storage_after_changes(self):
+        cases = {
+            "declare a = [1, 2]; a[0] = 5; push(a, 3); a;": ("q", [5, 2, 3]),
+            "range(3);": ("q", [0, 1, 2]),
+            "declare a = [1, 2, 3]; a[0] = 2.5; a;": (None, [2.5, 2, 3]),
+            "declare a = [1.5]; a[0] = 2; a;": (None, [2]),
+            "declare a = [1, 2]; push(a, true); a;": (None, [1, 2, True]),
+            "declare a = [9223372036854775807, 1]; a[1] = a[0] + 1; a;": (None, [2 ** 63 - 1, 2 ** 63]),
+        }
+        for source, (typecode, elements) in cases.items():
+            for engine in ENGINES:
+                with (self.subTest(source=source, engine=engine)):
+                    value = array_of(source, engine)
+                    self.assertEqual(getattr(value.elements, "typecode", None), typecode)
+                    self.assertEqual([(type(x), x) for x in value.elements], [(type(x), x) for x in elements])
+
+    # Packing never shows: what's printed is the same as for a list
+    def test_printing(self):
+        source = 'declare a = [1, 2, 3]; a[0] = 2.5; print(a); push(a, "x"); print(a, " ", length(a)); print([1.5, 2.5], " ", range(3));'
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(source, engine), "[2.5, 2, 3]\n[2.5, 2, 3, x] 4\n[1.5, 2.5] [0, 1, 2]\n")
+
+if __name__ == "__main__":
+    unittest.main()
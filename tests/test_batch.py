@@ -0,0 +1,96 @@
+import io
+import os
+import tempfile
+import unittest
+# Imported first, it puts the interpreter on sys.path
+import support
+from batch import run_batch, find_scripts
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.scripts = os.path.join(temp.name, "scripts")
+        self.outputs = os.path.join(temp.name, "outputs")
+        self.cache_dir = os.path.join(temp.name, "cache")
+
+    def write_script(self, relative, source):
+        path = os.path.join(self.scripts, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with (open(path, "w") as f):
+            f.write(source)
+
+    # Returns the number of failures and what run_batch printed, one line per script then the summary
+    def run_scripts(self, **options):
+        out = io.StringIO()
+        failures = run_batch(self.scripts, cache_dir=self.cache_dir, output_dir=self.outputs, out=out, **options)
+        return failures, out.getvalue().splitlines()
+
+    def read_output(self, relative):
+        with (open(os.path.join(self.outputs, relative)) as f):
+            return f.read()
+
+    def test_finds_scripts_in_a_stable_order(self):
+        for relative in ("b.rs", "a.rs", "sub/c.rs", "notes.txt"):
+            self.write_script(relative, "")
+        found = [os.path.relpath(path, self.scripts) for path in find_scripts(self.scripts)]
+        self.assertEqual(found, ["a.rs", "b.rs", os.path.join("sub", "c.rs")])
+
+    def test_statuses_and_outputs(self):
+        self.write_script("ok.rs", 'print("hello");')
+        self.write_script("sub/broken.rs", 'print("before"); print(missing);')
+        for engine in support.ENGINES:
+            with (self.subTest(engine=engine)):
+                failures, lines = self.run_scripts(workers=2, engine=engine)
+                self.assertEqual(failures, 1)
+                self.assertTrue(lines[0].startswith("ok "))
+                self.assertTrue(lines[0].endswith("ok.rs"))
+                self.assertTrue(lines[1].startswith("failed "))
+                self.assertTrue(lines[1].endswith("broken.rs: Cannot resolve 'missing' as it does not exist."))
+                self.assertIn("2 scripts", lines[2])
+                self.assertIn("1 ok, 1 failed, 0 timed out", lines[2])
+                self.assertEqual(self.read_output("ok.out"), "hello\n")
+                self.assertEqual(self.read_output(os.path.join("sub", "broken.out")), "before\n")
+
+    # Scripts run one after another in the same worker, each in its own env
+    def test_scripts_dont_share_globals(self):
+        for name in ("a.rs", "b.rs", "c.rs"):
+            self.write_script(name, "const x = 1; declare y = [x]; y[0] = 2; print(y);")
+        failures, lines = self.run_scripts(workers=1)
+        self.assertEqual(failures, 0)
+        for name in ("a.out", "b.out", "c.out"):
+            self.assertEqual(self.read_output(name), "[2]\n")
+
+    def test_timeout(self):
+        self.write_script("loop.rs", 'print("started"); while (true) { }')
+        self.write_script("quick.rs", 'print("done");')
+        failures, lines = self.run_scripts(workers=1, timeout=0.5)
+        self.assertEqual(failures, 1)
+        self.assertTrue(lines[0].startswith("timeout "))
+        self.assertTrue(lines[0].endswith("loop.rs: took longer than 0.5s"))
+        self.assertTrue(lines[1].startswith("ok "))
+        self.assertEqual(self.read_output("loop.out"), "started\n")
+        # The timeout doesn't leave half-written entries in the cache
+        self.assertEqual([name for name in os.listdir(self.cache_dir) if name.endswith(".tmp")], [])
+
+    # pmap runs serially in a worker (every core already runs a script) and gives the same result
+    def test_pmap_in_a_worker(self):
+        self.write_script("pmap.rs", "fdeclare double(x) { return x * 2; } print(pmap([1, 2, 3], double));")
+        failures, lines = self.run_scripts(workers=1)
+        self.assertEqual(failures, 0)
+        self.assertEqual(self.read_output("pmap.out"), "[2, 4, 6]\n")
+
+    # Another run finds every script in the cache and prints the same thing
+    def test_cached_run(self):
+        self.write_script("fib.rs", "fdeclare fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); } print(fib(15));")
+        for engine in support.ENGINES:
+            with (self.subTest(engine=engine)):
+                self.run_scripts(workers=1, engine=engine)
+                entries = len(os.listdir(self.cache_dir))
+                failures, lines = self.run_scripts(workers=1, engine=engine)
+                self.assertEqual(failures, 0)
+                self.assertEqual(len(os.listdir(self.cache_dir)), entries)
+                self.assertEqual(self.read_output("fib.out"), "610\n")
+
+if __name__ == "__main__":
+    unittest.main()
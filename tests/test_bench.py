@@ -0,0 +1,45 @@
+import os
+import io
+import sys
+import unittest
+import contextlib
+from support import run_script, ENGINES
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+import harness
+
+class BenchmarkTest(unittest.TestCase):
+    # The programs measure the engines, so they have to do the same thing on each of them
+    def test_programs_run_the_same_on_every_engine(self):
+        for name, source in harness.load_programs({"arrays", "calls", "fib", "nested_loops", "scopes"}).items():
+            expected = run_script(source, "tree")
+            self.assertNotEqual(expected, "")
+            for engine in ENGINES[1:]:
+                with (self.subTest(program=name, engine=engine)):
+                    self.assertEqual(run_script(source, engine), expected)
+
+    # Every copy of the generated chunk gets its own names, so nothing is declared twice
+    def test_generated_source_runs(self):
+        self.assertEqual([harness.letters(n) for n in (0, 25, 26, 27, 675, 676)], ["a", "z", "ba", "bb", "zz", "baa"])
+        run_script(harness.generate_source())
+
+    def test_percentile(self):
+        ordered = list(range(1, 21))
+        self.assertEqual(harness.percentile(ordered, 0.5), 11)
+        self.assertEqual(harness.percentile(ordered, 0.95), 19)
+        self.assertEqual(harness.percentile([7], 0.95), 7)
+
+    def test_results(self):
+        with (contextlib.redirect_stdout(io.StringIO()) as output):
+            results = harness.run_benchmarks({"small": "declare x = 1 + 2; print(x);"}, repeats=3)
+        self.assertEqual(list(results), ["small"])
+        self.assertEqual(list(results["small"]), list(harness.PHASES))
+        for phase, stats in results["small"].items():
+            with (self.subTest(phase=phase)):
+                self.assertEqual(set(stats), {"median", "p95", "min", "gc", "kept", "peak_kb"})
+                self.assertLessEqual(stats["min"], stats["median"])
+                self.assertLessEqual(stats["median"], stats["p95"])
+        # What the script prints isn't mixed into the report
+        self.assertNotIn("3\n", output.getvalue().splitlines(keepends=True))
+
+if __name__ == "__main__":
+    unittest.main()
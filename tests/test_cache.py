@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from support import ENGINES
+from cache import ScriptCache
+from embed import compile_source, execute
+from library import create_global_env
+
+SOURCE = "declare x = 2; x * 21;"
+
+class ScriptCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ScriptCache(self.directory.name)
+        self.compiles = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def compile(self, engine):
+        def compile(source):
+            self.compiles += 1
+            return compile_source(source, engine)
+        return compile
+
+    def test_second_load_skips_compiling(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.compiles = 0
+                for run in range(2):
+                    compiled = self.cache.load_or_compile(SOURCE, (engine,), self.compile(engine))
+                    self.assertEqual(execute(compiled, create_global_env(), engine), 42)
+                self.assertEqual(self.compiles, 1)
+
+    def test_changed_source_misses(self):
+        self.cache.load_or_compile(SOURCE, ("tree",), self.compile("tree"))
+        self.cache.load_or_compile(SOURCE + " 1;", ("tree",), self.compile("tree"))
+        self.assertEqual(self.compiles, 2)
+
+    def test_corrupt_entry_is_a_miss(self):
+        key = self.cache.key(SOURCE, ("tree",))
+        with (open(self.cache.path(key), "wb") as f):
+            f.write(b"not a pickle")
+        self.cache.load_or_compile(SOURCE, ("tree",), self.compile("tree"))
+        self.assertEqual(self.compiles, 1)
+        self.assertIsNotNone(self.cache.load(key))
+
+    def test_unwritable_dir_still_runs(self):
+        with (mock.patch("tempfile.mkstemp", side_effect=PermissionError("read-only"))):
+            compiled = self.cache.load_or_compile(SOURCE, ("tree",), self.compile("tree"))
+        self.assertEqual(execute(compiled, create_global_env(), "tree"), 42)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    # e.g. batch mode's ScriptTimeout going off while the entry is written
+    def test_interrupted_store_leaves_no_temp_file(self):
+        with (mock.patch("os.replace", side_effect=KeyboardInterrupt)):
+            with (self.assertRaises(KeyboardInterrupt)):
+                self.cache.store("key", [1, 2])
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+if __name__ == "__main__":
+    unittest.main()
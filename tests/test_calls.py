@@ -0,0 +1,57 @@
+import unittest
+from support import run_script, run_failing_script, ENGINES
+from embed import parse
+from eval.interpreter import evaluate
+from library import create_global_env
+import eval.expressions as expressions
+
+class CallFastPathTest(unittest.TestCase):
+    def setUp(self):
+        expressions.free_call_envs.clear()
+
+    def assert_free_list_is_sound(self):
+        free = expressions.free_call_envs
+        self.assertLessEqual(len(free), expressions.MAX_FREE_CALL_ENVS)
+        self.assertEqual(len({id(env) for env in free}), len(free))
+        for env in free:
+            self.assertEqual((env.parent, env.variables, env.constants), (None, {}, set()))
+
+    # A reused env starts empty, so the second call can declare x again
+    def test_reused_env_starts_empty(self):
+        source = "fdeclare f(first) { if (first) { const x = 1; return x; } declare x = 2; return x; } print(f(true), \" \", f(false));"
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(source, engine), "1 2\n")
+        self.assertGreater(len(expressions.free_call_envs), 0)
+        self.assert_free_list_is_sound()
+
+    # Calls that fail, from the script and from natives, still give their env back once
+    def test_failed_calls_release_their_env(self):
+        for source in (
+            "fdeclare f(n) { if (n == 0) { return missing; } return f(n - 1); } f(100);",
+            "fdeclare f(x) { return missing; } map([1, 2, 3], f);",
+            "fdeclare f(a, a) { return a; } f(1, 2);",
+        ):
+            with (self.subTest(source=source)):
+                output, error = run_failing_script(source)
+                self.assertIsNotNone(error)
+                self.assert_free_list_is_sound()
+
+    # An env a function declared in the body can still reach is never reused
+    def test_env_kept_by_an_inner_function(self):
+        source = (
+            "fdeclare make(n) { fdeclare get() { return n; } return get; } declare a = make(1); declare b = make(2);"
+            " fdeclare noise(x) { declare n = x; return n; } noise(3); noise(4); print(a(), \" \", b());"
+        )
+        self.assertEqual(run_script(source), "1 2\n")
+
+    # What the fast path needs is worked out the first time the declaration runs
+    def test_metadata_is_stored_in_the_declaration(self):
+        program = parse("fdeclare f(a, b) { return a; } fdeclare g(a, a) { fdeclare h() { } }")
+        f, g = program.body
+        evaluate(program, create_global_env())
+        self.assertEqual((f.unique_params, f.reuse_env), (True, True))
+        self.assertEqual((g.unique_params, g.reuse_env), (False, False))
+
+if __name__ == "__main__":
+    unittest.main()
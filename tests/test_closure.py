@@ -0,0 +1,25 @@
+import unittest
+# Imported first, it puts the interpreter on sys.path
+import support
+from embed import compile_source
+from closure.compiler import compile_program
+from environment import Frame
+from library import create_global_env
+
+class ClosureCompilerTest(unittest.TestCase):
+    # The closures don't hold on to the env of a run, so the same ones can run again
+    def test_closures_run_again_in_a_new_env(self):
+        program = compile_program(compile_source("declare n = 0; while (n < 5) { n = n + 2; } n;", "closure"))
+        self.assertEqual(program(Frame.root(create_global_env())), 6)
+        self.assertEqual(program(Frame.root(create_global_env())), 6)
+
+    # A run only changes its own globals
+    def test_runs_dont_share_globals(self):
+        program = compile_program(compile_source("declare count = 1; fdeclare bump() { count = count + 1; } bump(); count;", "closure"))
+        first = create_global_env()
+        self.assertEqual(program(Frame.root(first)), 2)
+        self.assertEqual(program(Frame.root(create_global_env())), 2)
+        self.assertEqual(first.lookup_var("count"), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from support import run_script, run_failing_script, ENGINES
+
+# script -> expected output
+SCRIPTS = {
+    'print(range(3), " ", range(2, 5), " ", range(5, 0, -2), " ", range(0));': "[0, 1, 2] [2, 3, 4] [5, 3, 1] []\n",
+    'declare a = [1]; print(push(a, 2, 3)); print(pop(a), " ", a);': "3\n3 [1, 2]\n",
+    'declare a = range(6); print(slice(a, 1, 3), " ", slice(a, -2), " ", slice(a, 4, 100), " ", slice(a, 3, 1));':
+        "[1, 2] [4, 5] [4, 5] []\n",
+    'print(sum([1, 2.5]), " ", sum(range(5)), " ", sum([]), " ", min([3, 1.5]), " ", max(["b", "c", "a"]));': "3.5 10 0 1.5 c\n",
+    'fdeclare desc(a, b) { return b - a; } print(sort([3, 1, 2]), " ", sort(["b", "a"]), " ", sort([1, 3, 2], desc));':
+        "[1, 2, 3] [a, b] [3, 2, 1]\n",
+    # Only values of the same type are equal, true isn't 1 and "1" isn't 1
+    'print(indexOf([1, 2, 3], 2), " ", indexOf([1, true], true), " ", indexOf(["a", "b"], "b"), " ", indexOf([1], "1"),'
+    ' " ", indexOf([1.0, 2], 1), " ", indexOf(range(4), 9));': "1 1 1 -1 0 -1\n",
+    'print(binarySearch([1, 3, 5, 7], 5), " ", binarySearch([1, 3], 2), " ", binarySearch(["a", "c"], "c"), " ", binarySearch([], 1));':
+        "2 -1 1 -1\n",
+    'fdeclare sq(x) { return x * x; } fdeclare odd(x) { return x % 2 == 1; } fdeclare add(a, b) { return a + b; }'
+    ' print(map(range(4), sq), " ", filter(range(5), odd), " ", reduce(range(5), add), " ", reduce([], add, 7), " ", reduce(["a", "b"], add, "!"));':
+        "[0, 1, 4, 9] [1, 3] 10 7 !ab\n",
+    # sort() changes the array it's given and returns it
+    "declare a = [2, 1]; declare b = sort(a); b[0] = 5; print(a);": "[5, 2]\n",
+}
+
+# script -> error message
+FAILING_SCRIPTS = {
+    "range(1.5);": "range() expects integers",
+    "range(1, 5, 0);": "range() step cannot be 0",
+    "push(5, 1);": "push() expects an array",
+    "pop([]);": "pop() called on an empty array",
+    "slice([1, 2], 0.5);": "slice() expects integer indices",
+    'sum([1, "a"]);': "sum() expects an array of numbers",
+    "min([]);": "min() called on an empty array",
+    'sort([1, "a"]);': "sort() expects an array of numbers or an array of strings",
+    "fdeclare bad(a, b) { return true; } sort([1, 2], bad);": "sort() comparator must return a number",
+    'binarySearch([1, 2], "a");': "binarySearch() value must be a number",
+    "fdeclare one(x) { return x; } filter([1], one);": "filter() function must return a boolean",
+    "fdeclare add(a, b) { return a + b; } reduce([], add);": "reduce() of an empty array needs an initial value",
+    "fdeclare sq(x) { return x * x; } map([1], sq, 2);": "map() expects an array and a function",
+    "fdeclare two(a, b) { return a; } map([1], two);": "Incorrect number of arguments",
+}
+
+class CollectionsTest(unittest.TestCase):
+    def test_functions(self):
+        for source, expected in SCRIPTS.items():
+            for engine in ENGINES:
+                with (self.subTest(source=source, engine=engine)):
+                    self.assertEqual(run_script(source, engine), expected)
+
+    def test_errors(self):
+        for source, message in FAILING_SCRIPTS.items():
+            for engine in ENGINES:
+                with (self.subTest(source=source, engine=engine)):
+                    output, error = run_failing_script(source, engine)
+                    self.assertEqual(str(error), message)
+
+    # The natives live above the globals, so a script can declare its own
+    def test_script_can_declare_its_own(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script("fdeclare sum(a) { return 0; } print(sum([1, 2]));", engine), "0\n")
+
+if __name__ == "__main__":
+    unittest.main()
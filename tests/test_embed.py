@@ -0,0 +1,75 @@
+import io
+import unittest
+import contextlib
+from support import ENGINES
+from embed import Interpreter, CompiledProgram
+from values import NativeFunctionVal, FunctionVal
+
+class InterpreterTest(unittest.TestCase):
+    def test_compile_once_execute_many(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                interpreter = Interpreter(engine)
+                program = interpreter.compile("declare total = sum(values) * factor; total;")
+                self.assertEqual(interpreter.execute(program, globals={"values": [1, 2, 3], "factor": 2}), 12)
+                self.assertEqual(interpreter.execute(program, globals={"values": [5], "factor": 0.5}), 2.5)
+
+    def test_optimized(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                interpreter = Interpreter(engine, optimized=True)
+                self.assertEqual(interpreter.run("const k = 2; k * 3 + x;", {"x": 1}), 7)
+
+    # Strings, lists, tuples and dicts go in as strings, arrays and maps and come back out the same way
+    def test_values(self):
+        inputs = {"text": "hi", "items": (1, "a", [2.5, None]), "table": {"k": [True], 3: "three"}}
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                interpreter = Interpreter(engine)
+                self.assertEqual(interpreter.run("[text + \"!\", items, table];", inputs),
+                    ["hi!", [1, "a", [2.5, None]], {"k": [True], 3: "three"}])
+                self.assertEqual(interpreter.run('table["k"][0];', inputs), True)
+                self.assertIsInstance(interpreter.run("fdeclare f() { } f;"), FunctionVal)
+
+    def test_natives_passed_in(self):
+        def native_twice(args, env):
+            return args[0] * 2
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(Interpreter(engine).run("twice(21);", {"twice": NativeFunctionVal(native_twice)}), 42)
+
+    # Every run gets its own env on top of a shared one it can't change
+    def test_runs_are_isolated(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                interpreter = Interpreter(engine)
+                interpreter.run("declare leaked = 1;")
+                with (self.assertRaisesRegex(Exception, "Cannot resolve 'leaked'")):
+                    interpreter.run("leaked;")
+                # A script may declare its own print, the next run still has the native one
+                self.assertEqual(interpreter.run("declare print = 5; print;"), 5)
+                output = io.StringIO()
+                with (contextlib.redirect_stdout(output)):
+                    interpreter.run('print("ok");')
+                self.assertEqual(output.getvalue(), "ok\n")
+                with (self.assertRaisesRegex(Exception, "Cannot reassign constant 'print'")):
+                    interpreter.run("print = 5;")
+
+    def test_programs_cant_be_changed(self):
+        program = Interpreter().compile("1;")
+        self.assertIsInstance(program, CompiledProgram)
+        with (self.assertRaises(AttributeError)):
+            program.engine = "vm"
+
+    def test_bad_uses(self):
+        with (self.assertRaisesRegex(ValueError, "Unknown engine 'jit'")):
+            Interpreter("jit")
+        with (self.assertRaisesRegex(ValueError, "compiled for the vm engine, not tree")):
+            Interpreter("tree").execute(Interpreter("vm").compile("1;"))
+        with (self.assertRaisesRegex(TypeError, "expects a program made by Interpreter.compile")):
+            Interpreter().execute("1;")
+        with (self.assertRaisesRegex(TypeError, "Cannot pass a set to RowScript")):
+            Interpreter().run("x;", {"x": {1}})
+
+if __name__ == "__main__":
+    unittest.main()
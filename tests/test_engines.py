@@ -0,0 +1,317 @@
+# Every script here has to print the same thing on every engine
+# Usage: python -m unittest discover tests
+import unittest
+from support import run_script, run_failing_script, ENGINES
+
+# name -> (script, expected output)
+SCRIPTS = {
+    "arithmetic": (
+        'print(1 + 2 * 3, " ", (1 + 2) * 3, " ", 7 / 2, " ", 8 / 2, " ", 7 % 3, " ", -7 % 3, " ", 2 - -3);',
+        "7 9 3.5 4.0 1 2 5\n",
+    ),
+    "comparisons": (
+        'print(!true, " ", -(2 + 3), " ", 1 == 1.0, " ", "a" == "a", " ", 1 != 2, " ", 3 <= 3, " ", null == null);',
+        "false -5 true true true true true\n",
+    ),
+    "if-elif-else": (
+        'declare a = 5; if (a > 10) { print("big"); } elif (a == 5) { print("five"); } else { print("small"); }'
+        ' if (a < 0) { print("neg"); } else { print("pos"); }',
+        "five\npos\n",
+    ),
+    # A number as the condition runs the loop that many times, whatever happens to it
+    "counted-while": (
+        "declare x = 3; declare n = 0; while (x) { x = x + 1; n = n + 1; } print(n, \" \", x);",
+        "3 6\n",
+    ),
+    "block-in-loop": (
+        "declare i = 0; declare total = 0; while (i < 5) { { declare sq = i * i; total = total + sq; } i = i + 1; } print(total);",
+        "30\n",
+    ),
+    # Without return a function gives the value of its last statement
+    "implicit-return": (
+        "fdeclare add(a, b) { a + b; } print(add(2, 3)); fdeclare nothing() { } print(nothing());",
+        "5\nnull\n",
+    ),
+    "return-from-loop": (
+        "fdeclare early(n) { declare i = 0; while (true) { if (i == n) { return i * 10; } i = i + 1; } } print(early(4));",
+        "40\n",
+    ),
+    "closure-counter": (
+        "fdeclare counter() { declare count = 0; fdeclare next() { count = count + 1; return count; } return next; }"
+        " declare c = counter(); c(); c(); print(c()); declare d = counter(); print(d());",
+        "3\n1\n",
+    ),
+    "global-read-after-change": (
+        "declare x = 1; fdeclare get() { return x; } x = 5; print(get());",
+        "5\n",
+    ),
+    "recursion": (
+        "fdeclare deep(n) { if (n == 0) { return 0; } return 1 + deep(n - 1); } print(deep(200));",
+        "200\n",
+    ),
+    "arrays": (
+        'declare arr = [1, [2, 3], "x"]; arr[1][0] = 20; arr[2] = arr[0] + 1; print(arr, " ", length(arr), " ", arr[1][1]);',
+        "[1, [20, 3], 2] 3 3\n",
+    ),
+    # The inner function sees the global x until outer's own x is declared
+    "outer-declared-later": (
+        "declare x = 1; fdeclare outer() { fdeclare inner() { return x; } print(inner()); declare x = 2; print(inner()); } outer();",
+        "1\n2\n",
+    ),
+    # Every loop iteration runs the body in a new frame, so each function keeps its own k
+    "functions-made-in-a-loop": (
+        "declare fns = []; declare i = 0; while (i < 3) { declare k = i * 10; fdeclare get() { return k; } push(fns, get); i = i + 1; }"
+        " declare first = fns[0]; declare last = fns[2]; print(first(), \" \", last());",
+        "0 20\n",
+    ),
+    "functions-made-by-separate-calls": (
+        "fdeclare make(n) { fdeclare get() { return n; } return get; } declare a = make(1); declare b = make(2); print(a(), \" \", b(), \" \", a());",
+        "1 2 1\n",
+    ),
+    "names-from-several-functions-out": (
+        "declare total = 0; fdeclare outer(a) { fdeclare middle(b) { fdeclare inner(c) { { { total = total + a + b + c; } } return total; }"
+        " return inner(b + 1); } return middle(a + 1); } outer(1); print(outer(10));",
+        "39\n",
+    ),
+    "functions-as-values": (
+        "fdeclare apply(f, x) { return f(x); } fdeclare twice(x) { return x * 2; } print(apply(twice, 4), \" \", map([1, 2], twice));",
+        "8 [2, 4]\n",
+    ),
+    # On the vm `return f(...)` reuses the current call, the result has to be the same
+    "tail-recursion": (
+        "fdeclare loop(n, acc) { if (n == 0) { return acc; } return loop(n - 1, acc + n); } print(loop(100, 0));",
+        "5050\n",
+    ),
+    "mutual-tail-calls": (
+        "fdeclare even(n) { if (n == 0) { return true; } return odd(n - 1); }"
+        " fdeclare odd(n) { if (n == 0) { return false; } return even(n - 1); } print(even(11), \" \", odd(11));",
+        "false true\n",
+    ),
+    "tail-call-to-a-native": (
+        "fdeclare len(x) { return length(x); } print(len([1, 2, 3]));",
+        "3\n",
+    ),
+    "tail-call-to-a-local-function": (
+        "fdeclare outer(n) { fdeclare inner(m) { return m + n; } return inner(1); } print(outer(5));",
+        "6\n",
+    ),
+    "tail-call-from-a-block": (
+        "fdeclare f(n) { declare x = [n]; { return g(x); } } fdeclare g(a) { return a[0] * 2; } print(f(4));",
+        "8\n",
+    ),
+    # Every call of a pure function is still memoized when it's a tail call
+    "pure-tail-calls": (
+        'pure fdeclare down(n) { if (n == 0) { return "done"; } return down(n - 1); } print(down(50)); print(memoStats(down)["misses"]);',
+        "done\n51\n",
+    ),
+    # Numbers, booleans and null are plain Python values, ints stay ints until a float is involved
+    "primitive-values": (
+        'declare x = 5; x = x + 1; print(x * 1.0, " ", x, " ", 10 / 4, " ", 1 + 2.5, " ", 1 - 1.0, " ", [true, null, 1, 1.5]);'
+        ' print(true == true, " ", null == null, " ", true != false);',
+        "6.0 6 2.5 3.5 0.0 [true, null, 1, 1.5]\ntrue true true\n",
+    ),
+    # The optimizer can't replace k in f, f could be called before k is declared
+    "const-declared-after-its-reader": (
+        "fdeclare f() { return k; } const k = 3; print(f());",
+        "3\n",
+    ),
+    "param-shadowing-a-const": (
+        'const k = 2; fdeclare f(k) { return k; } print(f(5), " ", k * 10);',
+        "5 20\n",
+    ),
+    "string-const": (
+        'const s = "ab"; print(s + s, " ", length(s));',
+        "abab 2\n",
+    ),
+    # A return inside blocks, branches and loops ends the whole call and nothing more
+    "return-from-nested-statements": (
+        'fdeclare f(n) { while (true) { { if (n > 2) { { return "big"; } } elif (n > 0) { return "small"; } } return "zero"; } }'
+        ' print(f(5), " ", f(1), " ", f(0));',
+        "big small zero\n",
+    ),
+    "return-without-a-value": (
+        "fdeclare f() { return; } print(f());",
+        "null\n",
+    ),
+    "return-from-an-inner-call": (
+        "fdeclare outer() { fdeclare inner() { return 1; } inner(); return 2; } print(outer());",
+        "2\n",
+    ),
+    "return-or-last-value": (
+        "fdeclare f(xs) { declare total = 0; declare i = 0; while (i < length(xs)) { if (xs[i] < 0) { return -1; }"
+        " total = total + xs[i]; i = i + 1; } total; } print(f([1, 2]), \" \", f([1, -2, 3]));",
+        "3 -1\n",
+    ),
+    "return-from-a-callback": (
+        "fdeclare g(x) { if (x == 2) { return true; } return false; } print(filter([1, 2, 3], g));",
+        "[2]\n",
+    ),
+    "element-wise-operators": (
+        'print([1, 2, 3] + [10, 20, 30], " ", [1, 2, 3] * 2, " ", 3 < [1, 5], " ", [1, 2] == [1, 3], " ", [1.5, 2] / 2, " ", 10 % [3, 4]);'
+        ' print([[1, 2], [3]] + [[10, 20], [30]], " ", ["a", "b"] + "!", " ", [9223372036854775807] + 1, " ", [] + []);',
+        "[11, 22, 33] [2, 4, 6] [false, true] [true, false] [0.75, 1.0] [1, 2]\n[[11, 22], [33]] [a!, b!] [9223372036854775808] []\n",
+    ),
+    # Reads of names that aren't local are cached at the node, these have to see every change
+    "native-replaced-by-a-later-declaration": (
+        "fdeclare total(a) { return sum(a); } print(total([1, 2])); fdeclare sum(a) { return 0; } print(total([1, 2]));",
+        "3\n0\n",
+    ),
+    "global-read-in-a-loop": (
+        'declare x = 1; fdeclare get() { return x; } declare i = 0; while (i < 2) { print(get()); i = i + 1; }'
+        ' { declare x = 5; print(get(), " ", x); } x = 7; print(get());',
+        "1\n1\n1 5\n7\n",
+    ),
+    "global-declared-after-the-function": (
+        "fdeclare f() { declare out = []; declare i = 0; while (i < 2) { push(out, y); i = i + 1; } return out; }"
+        " declare y = 3; print(f()); y = 4; print(f());",
+        "[3, 3]\n[4, 4]\n",
+    ),
+    "global-shadowed-in-a-block": (
+        'declare n = 1; fdeclare f() { declare r = n; { declare n = 2; r = r + n; } return r + n; } print(f(), " ", f());',
+        "4 4\n",
+    ),
+    # Errors the resolver can see are raised when the statement runs, never before
+    "const-reassigned-in-uncalled-function": (
+        'const y = 2; fdeclare f() { y = 3; } print("before");',
+        "before\n",
+    ),
+    "const-reassigned-in-untaken-branch": (
+        'fdeclare g() { const c = 1; if (false) { c = 2; } return c; } print(g());',
+        "1\n",
+    ),
+    "redeclared-in-uncalled-function": (
+        'fdeclare f() { declare x = 1; declare x = 2; } print("before");',
+        "before\n",
+    ),
+    "duplicate-params-uncalled": (
+        'fdeclare f(a, a) { return a; } print("before");',
+        "before\n",
+    ),
+}
+
+# name -> (script, output before the error, error message)
+FAILING_SCRIPTS = {
+    "undeclared-name": (
+        'print("before"); print(missing);',
+        "before\n",
+        "Cannot resolve 'missing' as it does not exist.",
+    ),
+    "const-reassigned-global": (
+        "const k = 1; k = 2;",
+        "",
+        "Cannot reassign constant 'k'.",
+    ),
+    "wrong-argument-count": (
+        "fdeclare f(a) { return a; } print(f(1, 2));",
+        "",
+        "Incorrect number of arguments",
+    ),
+    "wrong-argument-count-in-tail-call": (
+        "fdeclare f(n) { if (n == 0) { return 0; } return f(n - 1, 2); } f(3);",
+        "",
+        "Incorrect number of arguments",
+    ),
+    "not-a-boolean": (
+        "print(!0);",
+        "",
+        "Unary '!' expects a boolean",
+    ),
+    # bool is an int in Python, but not a number in RowScript
+    "boolean-in-arithmetic": (
+        "print(true + 1);",
+        "",
+        "Only numbers supported when evaluating binary expressions",
+    ),
+    "number-compared-to-boolean": (
+        "print(1 == true);",
+        "",
+        "Cannot compare values of different types",
+    ),
+    "negated-boolean": (
+        "print(-true);",
+        "",
+        "Unary '-' expects a number",
+    ),
+    "null-in-arithmetic": (
+        "print(null + 1);",
+        "",
+        "Only numbers supported when evaluating binary expressions",
+    ),
+    # The dropped if still can't hide the elif's error
+    "elif-condition-after-a-dropped-branch": (
+        "if (false) { print(1); } elif (5) { print(2); }",
+        "",
+        "Elif condition must be a boolean",
+    ),
+    "return-at-the-top-level": (
+        'return 5; print("after");',
+        "",
+        "Return statement can only be used inside a function",
+    ),
+    "element-wise-different-lengths": (
+        "print([1, 2] + [1, 2, 3]);",
+        "",
+        "Cannot apply '+' to arrays of different lengths (2 and 3)",
+    ),
+    "element-wise-division-by-zero": (
+        "print([1, 0] / [1, 0]);",
+        "",
+        "division by zero",
+    ),
+    "mixed-comparison": (
+        'print(1 < "a");',
+        "",
+        "Cannot compare values of different types",
+    ),
+    "redeclared-in-block": (
+        'print("before"); { declare x = 1; declare x = 2; } print("after");',
+        "before\n",
+        "Cannot declare variable 'x', it is already defined.",
+    ),
+    "redeclared-global": (
+        'print("before"); declare z = 1; declare z = 2;',
+        "before\n",
+        "Cannot declare variable 'z', it is already defined.",
+    ),
+    "redeclared-local-function": (
+        'fdeclare f() { fdeclare g() { return 1; } print("before"); fdeclare g() { return 2; } } f();',
+        "before\n",
+        "Cannot declare variable 'g', it is already defined.",
+    ),
+    "duplicate-params-called": (
+        'print("before"); fdeclare f(a, a) { return a; } print("after"); f(1, 2);',
+        "before\nafter\n",
+        "Cannot declare variable 'a', it is already defined.",
+    ),
+    "const-reassigned-local": (
+        'fdeclare h() { const c = 1; print(c); c = 2; print(c); } h();',
+        "1\n",
+        "Cannot reassign constant 'c'.",
+    ),
+    "const-reassigned-from-inner-function": (
+        'fdeclare h() { const c = 1; fdeclare set() { c = 2; } print(c); set(); } h();',
+        "1\n",
+        "Cannot reassign constant 'c'.",
+    ),
+}
+
+class EngineParityTest(unittest.TestCase):
+    # With --optimize too, folding and dropping branches must never change what a script does
+    def test_scripts(self):
+        for name, (source, expected) in SCRIPTS.items():
+            for engine in ENGINES:
+                for optimized in (False, True):
+                    with (self.subTest(script=name, engine=engine, optimized=optimized)):
+                        self.assertEqual(run_script(source, engine, optimized), expected)
+
+    def test_errors(self):
+        for name, (source, expected, message) in FAILING_SCRIPTS.items():
+            for engine in ENGINES:
+                for optimized in (False, True):
+                    with (self.subTest(script=name, engine=engine, optimized=optimized)):
+                        output, error = run_failing_script(source, engine, optimized)
+                        self.assertEqual(output, expected)
+                        self.assertEqual(str(error), message)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import pickle
+import unittest
+# Imported first, it puts the interpreter on sys.path
+import support
+from embed import Interpreter, parse
+from eval.interpreter import evaluate
+from library import create_global_env
+from nodes import Node, NodeType, NO_CACHE
+
+# Every Identifier node under node
+def identifiers(node):
+    if (isinstance(node, list)):
+        for item in node:
+            yield from identifiers(item)
+        return
+    if (not isinstance(node, Node)):
+        return
+    if (node.type == NodeType.IDENTIFIER):
+        yield node
+    for value in vars(node).values():
+        if (isinstance(value, (list, tuple, Node))):
+            yield from identifiers(list(value) if isinstance(value, tuple) else value)
+
+class InlineCacheTest(unittest.TestCase):
+    # The cache remembers the global env it was filled from, another run never uses it
+    def test_runs_with_other_globals(self):
+        interpreter = Interpreter("tree")
+        program = interpreter.compile("fdeclare get() { return limit; } declare i = 0; declare total = 0; while (i < 3) { total = total + get(); i = i + 1; } total;")
+        self.assertEqual(interpreter.execute(program, {"limit": 1}), 3)
+        self.assertEqual(interpreter.execute(program, {"limit": 10}), 30)
+
+    def test_filled_for_global_reads(self):
+        program = parse("declare x = 1; fdeclare f() { return x + length([]); } f();")
+        evaluate(program, create_global_env())
+        cached = {node.symbol for node in identifiers(program.body) if node.cache is not NO_CACHE}
+        self.assertEqual(cached, {"x", "length", "f"})
+
+    # Names some block or function around the read declares are looked up through the envs
+    def test_local_names_are_marked(self):
+        program = parse("declare n = 1; fdeclare f(a) { declare r = a + n; { declare n = 2; r = r + n; } return r; } f(1);")
+        evaluate(program, create_global_env())
+        maybe_local = {(node.symbol, node.maybe_local) for node in identifiers(program.body)}
+        self.assertIn(("a", True), maybe_local)
+        # n before the block is the global one, in the block it's the block's
+        self.assertIn(("n", False), maybe_local)
+        self.assertIn(("n", True), maybe_local)
+        self.assertIn(("f", False), maybe_local)
+
+    # pmap pickles function declarations, the cache points into this run's envs
+    def test_dropped_when_pickled(self):
+        program = parse("declare x = 1; x;")
+        evaluate(program, create_global_env())
+        node = program.body[1]
+        self.assertIsNot(node.cache, NO_CACHE)
+        self.assertEqual(pickle.loads(pickle.dumps(node)).cache, NO_CACHE)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+# Imported first, it puts the interpreter on sys.path
+import support
+from lexer import tokenize, iter_tokens, tokenize_compact, TokenType, TOKEN_NAMES
+
+SOURCE = """
+// A comment
+pure fdeclare add(a, b) { return a + b; }
+/* multi
+   line */ declare x = [1.5, 20]; const s = "a // b";
+if (x[0] >= 1 != false) { x = {"k": -3 % 2 / 1}; } elif (!done <= 2) { } else { while (x < 1) { } }
+"""
+
+# (kind name, text) of every token
+def summary(tokens):
+    return [(TOKEN_NAMES[token.type], token.value) for token in tokens]
+
+class LexerTest(unittest.TestCase):
+    def test_tokens(self):
+        tokens = summary(tokenize(SOURCE))
+        self.assertEqual(tokens[:12], [
+            ("PURE", "pure"), ("FDECLARE", "fdeclare"), ("IDENTIFIER", "add"), ("OPEN_PAREN", "("),
+            ("IDENTIFIER", "a"), ("COMMA", ","), ("IDENTIFIER", "b"), ("CLOSE_PAREN", ")"),
+            ("OPEN_CURLY_PAREN", "{"), ("RETURN", "return"), ("IDENTIFIER", "a"), ("OPERATOR", "+"),
+        ])
+        self.assertIn(("NUMBER", "1.5"), tokens)
+        self.assertIn(("STRING", "a // b"), tokens)
+        for kind, text in (("GREATER_THAN_OR_EQ", ">="), ("NOT_EQUALS", "!="), ("LESS_THAN_OR_EQ", "<="),
+                ("EXCLAMATION", "!"), ("COLON", ":"), ("OPERATOR", "%"), ("OPERATOR", "/")):
+            self.assertIn((kind, text), tokens)
+        self.assertEqual(tokens[-1], ("EOF", "EndOfFile"))
+
+    # The three ways of scanning give the same tokens
+    def test_scanners_agree(self):
+        expected = summary(tokenize(SOURCE))
+        self.assertEqual(summary(iter_tokens(SOURCE)), expected)
+        compact = tokenize_compact(SOURCE)
+        self.assertEqual(summary(compact[i] for i in range(len(compact))), expected)
+
+    def test_identifiers_are_shared(self):
+        first, second = [token.value for token in tokenize("name + name;") if token.type == TokenType.IDENTIFIER]
+        self.assertIs(first, second)
+
+    def test_unclosed_string_runs_to_the_end(self):
+        self.assertEqual(summary(tokenize('print("abc')), [
+            ("IDENTIFIER", "print"), ("OPEN_PAREN", "("), ("STRING", "abc"), ("EOF", "EndOfFile"),
+        ])
+
+    def test_errors(self):
+        for source, message in (("x = 1 & 2;", "Unexpected character: &"), ("x; /* never ends", "Must end multi-line comment")):
+            for scan in (tokenize, tokenize_compact):
+                with (self.subTest(source=source, scan=scan.__name__)):
+                    with (self.assertRaisesRegex(Exception, message)):
+                        scan(source)
+
+if __name__ == "__main__":
+    unittest.main()
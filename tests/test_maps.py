@@ -0,0 +1,42 @@
+import unittest
+from support import run_script, run_failing_script, ENGINES
+
+# script -> expected output
+SCRIPTS = {
+    'declare stock = {"apples": 2}; stock["apples"] = stock["apples"] + 1; stock["pears"] = 1; print(stock);':
+        "{apples: 3, pears: 1}\n",
+    # 1 and 1.0 are equal numbers, so they're the same key, true and "1" aren't
+    'declare m = {1: "int", 1.0: "float", true: "bool", null: "null", "1": "str"};'
+    ' print(length(m), " ", m[1], " ", m[true], " ", m[null], " ", m["1"]);': "4 float bool null str\n",
+    'declare m = {"a": 1, "b": 2}; print(keys(m), " ", has(m, "a"), " ", has(m, "z"), " ", remove(m, "a"), " ", remove(m, "a"), " ", m, " ", length(m));':
+        "[a, b] true false true false {b: 2} 1\n",
+    'declare m = {}; m["x"] = [1]; m["x"][0] = 5; print(m, " ", {"n": {"k": null}});': "{x: [5]} {n: {k: null}}\n",
+    # Keys keep the order they were added in
+    'declare m = {"b": 1, "a": 2}; m["c"] = 3; remove(m, "b"); m["b"] = 4; print(keys(m));': "[a, c, b]\n",
+    # A string key is found by its text, however the string was built
+    'declare m = {"s" + "t": 1}; print(m["st"], " ", has(m, "s" + "t"));': "1 true\n",
+}
+
+# script -> error message
+FAILING_SCRIPTS = {
+    'declare m = {"a": 1}; print(m["b"]);': "Key b not found in map",
+    "declare m = {[1]: 2};": "Map keys must be numbers, strings, booleans or null, got array",
+    "keys([1]);": "keys() expects a map",
+}
+
+class MapTest(unittest.TestCase):
+    def test_maps(self):
+        for source, expected in SCRIPTS.items():
+            for engine in ENGINES:
+                with (self.subTest(source=source, engine=engine)):
+                    self.assertEqual(run_script(source, engine), expected)
+
+    def test_errors(self):
+        for source, message in FAILING_SCRIPTS.items():
+            for engine in ENGINES:
+                with (self.subTest(source=source, engine=engine)):
+                    output, error = run_failing_script(source, engine)
+                    self.assertEqual(str(error), message)
+
+if __name__ == "__main__":
+    unittest.main()
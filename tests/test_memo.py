@@ -0,0 +1,69 @@
+import unittest
+from support import run_script, run_failing_script, ENGINES
+
+class MemoTest(unittest.TestCase):
+    # Arguments that are equal but of different types get their own entries
+    def test_keys_include_the_type(self):
+        source = "pure fdeclare id(x) { return x; } print(id(1)); print(id(1.0)); print(id(true)); print(id(1));"
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(source, engine), "1\n1.0\ntrue\n1\n")
+
+    def assert_output(self, source, expected):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(source, engine), expected)
+
+    def test_recursive_calls_hit(self):
+        self.assert_output(
+            "pure fdeclare fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); } print(fib(80)); print(memoStats(fib));",
+            "23416728348467685\n{hits: 78, misses: 81, bypassed: 0, entries: 81}\n"
+        )
+
+    # With room for two entries, 3 drops 2 (used least recently), not 1 (added first)
+    def test_least_recently_used_is_dropped(self):
+        self.assert_output(
+            "declare calls = 0; fdeclare sq(x) { calls = calls + 1; return x * x; } declare m = memo(sq, 2);"
+            " m(1); m(2); m(1); m(3); m(2); m(1); print(calls, \" \", memoStats(m));",
+            "5 {hits: 1, misses: 5, bypassed: 0, entries: 2}\n"
+        )
+
+    def test_array_arguments_always_run(self):
+        self.assert_output(
+            'pure fdeclare first(a) { return a[0]; } print(first([1]), " ", first([1]), " ", memoStats(first));',
+            "1 1 {hits: 0, misses: 0, bypassed: 2, entries: 0}\n"
+        )
+
+    def test_calls_with_side_effects_arent_kept(self):
+        self.assert_output(
+            'pure fdeclare noisy(x) { print("run ", x); return x; } noisy(1); noisy(1); print(memoStats(noisy));',
+            "run 1\nrun 1\n{hits: 0, misses: 2, bypassed: 0, entries: 0}\n"
+        )
+
+    # A kept array could be changed by the caller
+    def test_array_results_arent_kept(self):
+        self.assert_output(
+            'pure fdeclare make(x) { return [x]; } declare a = make(1); a[0] = 9; print(make(1), " ", memoStats(make));',
+            "[1] {hits: 0, misses: 2, bypassed: 0, entries: 0}\n"
+        )
+
+    def test_string_arguments_hit(self):
+        self.assert_output(
+            'pure fdeclare s(x) { return x + "!"; } print(s("a"), s("a"), " ", memoStats(s)["hits"]);',
+            "a!a! 1\n"
+        )
+
+    def test_errors(self):
+        scripts = {
+            "fdeclare f(x) { return x; } memo(f, 0);": "memo() size must be a positive integer",
+            "memo(print);": "memo() expects a user-defined function",
+            "memoStats(5);": "memoStats() expects a memoized function, got number",
+        }
+        for source, message in scripts.items():
+            for engine in ENGINES:
+                with (self.subTest(source=source, engine=engine)):
+                    output, error = run_failing_script(source, engine)
+                    self.assertEqual(str(error), message)
+
+if __name__ == "__main__":
+    unittest.main()
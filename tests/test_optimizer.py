@@ -0,0 +1,48 @@
+import unittest
+# Imported first, it puts the interpreter on sys.path
+import support
+from embed import parse
+from optimizer import optimize
+
+# The optimized statements of source, as printed by --dump-ast
+def optimized(source):
+    return repr(optimize(parse(source)).body)
+
+class OptimizerTest(unittest.TestCase):
+    def assert_same(self, source, expected_source):
+        self.assertEqual(optimized(source), repr(parse(expected_source).body))
+
+    def assert_unchanged(self, source):
+        self.assert_same(source, source)
+
+    def test_folds_constant_expressions(self):
+        self.assert_same("declare x = 1 + 2 * 3;", "declare x = 7;")
+        self.assert_same('declare s = "a" + "b";', 'declare s = "ab";')
+        self.assertEqual(optimized("declare b = !(1 < 2);"), "[VarDeclaration(Token(IDENTIFIER, 'b') = Literal(False), isConst=False)]")
+
+    def test_propagates_literal_consts(self):
+        self.assert_same("const k = 4; declare y = k * 2;", "const k = 4; declare y = 8;")
+
+    def test_picks_literal_branches(self):
+        self.assert_same("if (true) { print(1); } else { print(2); }", "{ print(1); }")
+        self.assert_same("if (1 > 2) { print(1); } elif (true) { print(2); } else { print(3); }", "{ print(2); }")
+
+    def test_drops_statements_after_return(self):
+        self.assert_same("fdeclare f() { return 1; print(2); }", "fdeclare f() { return 1; }")
+
+    # Anything that raises when it runs is left to raise
+    def test_keeps_what_raises(self):
+        self.assert_unchanged('declare z = 1 + "a";')
+        self.assert_unchanged("declare q = 1 / 0;")
+        self.assert_unchanged("if (5) { print(1); }")
+        self.assert_unchanged("const k = 3; { k = 4; }")
+
+    # A read is only replaced when it's certain to be the const
+    def test_keeps_reads_that_might_be_something_else(self):
+        # f could run before k is declared
+        self.assert_unchanged("fdeclare f() { return k; } const k = 3;")
+        self.assert_unchanged("const k = 3; fdeclare f() { declare k = 1; return k; }")
+        self.assert_unchanged("const k = 3; fdeclare f(k) { return k; }")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from unittest import mock
+from support import run_script, run_failing_script, ENGINES
+import parallel
+
+class CaptureTest(unittest.TestCase):
+    def assert_rejected(self, source, message):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                with (self.assertRaisesRegex(Exception, message)):
+                    run_script(source, engine)
+
+    def test_changing_an_alias_of_a_param(self):
+        self.assert_rejected(
+            "declare a = [[0], [0]]; fdeclare f(x) { declare y = x; y[0] = 1; return 0; } pmap(a, f);",
+            "changes the contents of 'y'"
+        )
+
+    def test_changing_a_local_assigned_a_param(self):
+        self.assert_rejected(
+            "declare a = [[0], [0]]; fdeclare f(x) { declare y = [1]; y = x; y[0] = 1; return 0; } pmap(a, f);",
+            "changes the contents of 'y'"
+        )
+
+    def test_changing_a_param_in_a_helper(self):
+        self.assert_rejected(
+            "declare a = [[0], [0]]; fdeclare g(z) { z[0] = 1; return 0; } fdeclare f(x) { return g(x); } pmap(a, f);",
+            "can't run g in parallel: it changes the contents of 'z'"
+        )
+
+    def test_changing_an_element_of_a_literal(self):
+        self.assert_rejected(
+            "declare a = [[0], [0]]; fdeclare f(x) { declare y = [x]; y[0][0] = 1; return 0; } pmap(a, f);",
+            "changes the contents of 'y'"
+        )
+
+    def test_changing_an_array_it_made(self):
+        source = "fdeclare f(x) { declare y = [0, 0]; y[1] = x * 2; return y; } print(pmap([1, 2], f));"
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(source, engine), "[[0, 2], [0, 4]]\n")
+
+PROGRAM = (
+    "const factor = 3; fdeclare scale(x) { return x * factor; } fdeclare big(x) { return scale(x) > 6; }"
+    " fdeclare add(a, b) { return a + b; } pure fdeclare square(x) { return x * x; } declare a = range(40);"
+    " print(pmap(a, scale)); print(pfilter(a, big)); print(preduce(a, add)); print(preduce(a, add, 100));"
+    " print(pmap(a, square)); print(pmap([[1], [1, 2]], length)); print(preduce([], add, 0));"
+)
+
+def expected_output():
+    a = range(40)
+    return "".join(f"{line}\n" for line in (
+        [x * 3 for x in a], [x for x in a if x * 3 > 6], sum(a), sum(a) + 100, [x * x for x in a], [1, 2], 0,
+    ))
+
+class ParallelTest(unittest.TestCase):
+    # Every element after the first goes to a real pool of two workers
+    def use_pool(self):
+        patches = [
+            mock.patch.object(parallel, "workers", 2),
+            mock.patch.object(parallel, "PROBE_TIME", 0),
+            mock.patch.object(parallel, "PARALLEL_MIN_TIME", 0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.shut_down_pool)
+
+    def shut_down_pool(self):
+        if (parallel.pool is not None):
+            parallel.pool.shutdown()
+            parallel.pool = None
+
+    # Short arrays never leave the script's process
+    def test_results_in_process(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(PROGRAM, engine), expected_output())
+
+    # The workers compile the functions again with the same engine
+    def test_results_from_the_pool(self):
+        self.use_pool()
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(PROGRAM, engine), expected_output())
+                self.assertIsNotNone(parallel.pool)
+
+    def test_errors_from_the_pool(self):
+        self.use_pool()
+        source = "fdeclare odd(x) { if (x == 3) { return 1; } return x % 2 == 1; } pfilter(range(10), odd);"
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                output, error = run_failing_script(source, engine)
+                self.assertEqual(str(error), "pfilter() function must return a boolean")
+
+    def test_rejected_functions(self):
+        scripts = {
+            "declare data = [1]; fdeclare f(x) { return x + data[0]; } pmap([1], f);":
+                "pmap() can't run f in parallel: it uses the array 'data' from outside of it, which could be changed",
+            "declare total = 0; fdeclare f(x) { total = total + x; return x; } pmap([1], f);":
+                "pmap() can't run f in parallel: it assigns to 'total', which is declared outside of it",
+            "fdeclare f(x) { print(x); return x; } pmap([1], f);":
+                "pmap() can't run f in parallel: it calls print(), which has side effects",
+            "pmap([1], print);":
+                "pmap() can't run a native function with side effects in parallel",
+            "fdeclare add(a, b) { return a + b; } preduce([], add);":
+                "preduce() of an empty array needs an initial value",
+        }
+        for source, message in scripts.items():
+            for engine in ENGINES:
+                with (self.subTest(source=source, engine=engine)):
+                    output, error = run_failing_script(source, engine)
+                    self.assertEqual(str(error), message)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import io
+import unittest
+# Imported first, it puts the interpreter on sys.path
+import support
+import eval.interpreter as interpreter
+import eval.expressions as expressions
+from embed import compile_source, execute
+from library import create_global_env
+from profiler import Profiler, MAIN
+
+SOURCE = """
+fdeclare fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+fdeclare sq(x) { return x * x; }
+fdeclare loops(n) {
+    declare i = 0;
+    while (i < n) { declare j = 0; while (j < 2) { j = j + 1; } i = i + 1; }
+    return i;
+}
+declare k = 0;
+while (k < 3) { fib(5); k = k + 1; }
+loops(4);
+map([1, 2, 3], sq);
+"""
+
+# The profiler after running source on the tree engine, and the error the run raised
+def profile(source):
+    program = compile_source(source, "tree")
+    profiler = Profiler(program)
+    profiler.install()
+    error = None
+    try:
+        execute(program, create_global_env(), "tree")
+    except Exception as e:
+        error = e
+    finally:
+        profiler.uninstall()
+    return profiler, error
+
+class ProfilerTest(unittest.TestCase):
+    def test_calls_and_loops(self):
+        profiler, error = profile(SOURCE)
+        self.assertIsNone(error)
+        calls = {name: stats.calls for name, stats in profiler.functions.items()}
+        # fib(5) makes 15 calls, callbacks from map count too
+        self.assertEqual(calls, {MAIN: 1, "fib": 45, "sq": 3, "loops": 1})
+        loops = {profiler.loop_labels[node]: (stats.runs, stats.iterations) for node, stats in profiler.loops.items()}
+        self.assertEqual(loops, {"<main>:while#1": (1, 3), "loops:while#1": (1, 4), "loops:while#2": (4, 8)})
+
+    def test_times(self):
+        profiler, error = profile(SOURCE)
+        main = profiler.functions[MAIN]
+        for name, stats in profiler.functions.items():
+            with (self.subTest(name=name)):
+                self.assertLessEqual(stats.exclusive, stats.inclusive)
+                self.assertLessEqual(stats.inclusive, main.inclusive)
+        # A recursive function's inclusive time only counts its outermost calls
+        self.assertLess(profiler.functions["fib"].inclusive, main.inclusive)
+        self.assertEqual(sum(profiler.stacks.values()), main.inclusive)
+
+    def test_stacks(self):
+        profiler, error = profile(SOURCE)
+        stacks = set(profiler.stacks)
+        self.assertIn((MAIN, "fib", "fib", "fib", "fib", "fib"), stacks)
+        self.assertIn((MAIN, "sq"), stacks)
+        self.assertIn((MAIN, "loops"), stacks)
+        for stack in stacks:
+            self.assertEqual(stack[0], MAIN)
+
+    # Calls an error goes through are closed, and the tree-walker is put back as it was
+    def test_error_and_uninstall(self):
+        saved = (expressions.acquire_call_env, expressions.release_call_env, interpreter.eval_while_loop)
+        profiler, error = profile("fdeclare f(n) { if (n == 0) { return missing; } return f(n - 1); } f(3);")
+        self.assertIsNotNone(error)
+        self.assertEqual(profiler.functions["f"].calls, 4)
+        self.assertEqual(profiler.frames, [])
+        self.assertEqual((expressions.acquire_call_env, expressions.release_call_env, interpreter.eval_while_loop), saved)
+
+    def test_report(self):
+        profiler, error = profile(SOURCE)
+        report = io.StringIO()
+        profiler.print_report(report)
+        lines = report.getvalue().splitlines()
+        self.assertEqual(lines[0], "Functions (by exclusive time)")
+        self.assertIn("Loops (by time)", lines)
+        self.assertTrue(any(line.startswith("loops:while#2") and line.split()[1:3] == ["4", "8"] for line in lines))
+
+if __name__ == "__main__":
+    unittest.main()
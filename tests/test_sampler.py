@@ -0,0 +1,86 @@
+# The sampler rebuilds the RowScript stack from the locals of the interpreter's Python frames
+# (see rowscript_stack), so these catch a renamed local or a new call path on any engine
+# Usage: python -m unittest discover tests
+import re
+import sys
+import unittest
+from support import ENGINES
+from embed import run
+from library import create_global_env
+from values import NativeFunctionVal, NULL
+from sampler import Sampler, rowscript_stack
+
+# What rowscript_stack gives each time the script calls sample(), a native that looks at its
+# own Python stack, so the stacks don't depend on when a sampling thread wakes up
+def sampled_stacks(source, engine):
+    stacks = []
+    def native_sample(args, env):
+        stacks.append(";".join(rowscript_stack(sys._getframe())))
+        return NULL
+
+    env = create_global_env()
+    env.declare_var("sample", NativeFunctionVal(native_sample), True)
+    run(source, env, engine)
+    return stacks
+
+FACTORIAL = "fdeclare fact(n) { if (n < 2) { sample(); return 1; } return n * fact(n - 1); } fact(3);"
+CALLBACK = "fdeclare leaf(x) { sample(); return x; } fdeclare outer() { return map([1, 2], leaf); } outer();"
+TAIL_CALLS = "fdeclare f(n) { if (n == 0) { return sample(); } return f(n - 1); } f(3);"
+
+class SamplerTest(unittest.TestCase):
+    def test_recursive_calls(self):
+        expected = {
+            "tree": ["<main>;fact;fact;fact;[CALL_EXPR]"],
+            "vm": ["<main>;fact;fact;fact"],
+            "closure": ["<main>;fact;fact;fact"],
+        }
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(sampled_stacks(FACTORIAL, engine), expected[engine])
+
+    def test_calls_from_natives(self):
+        expected = {
+            "tree": ["<main>;outer;leaf;[CALL_EXPR]"] * 2,
+            "vm": ["<main>;outer;leaf"] * 2,
+            "closure": ["<main>;outer;leaf"] * 2,
+        }
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(sampled_stacks(CALLBACK, engine), expected[engine])
+
+    # The vm reuses the call for `return f(...)`, so only one f is waiting
+    def test_tail_calls(self):
+        expected = {
+            "tree": ["<main>;f;f;f;f;[RETURN_STMT]"],
+            "vm": ["<main>;f"],
+            "closure": ["<main>;f;f;f;f"],
+        }
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(sampled_stacks(TAIL_CALLS, engine), expected[engine])
+
+    def test_top_level(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                expected = "<main>;[CALL_EXPR]" if engine == "tree" else "<main>"
+                self.assertEqual(sampled_stacks("sample();", engine), [expected])
+
+    # A real sampling thread: which stacks get sampled depends on timing, but every one of
+    # them has to be made of fib calls
+    def test_sampling_thread(self):
+        source = "fdeclare fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); } fib(20);"
+        stack_format = re.compile(r"<main>(;fib)*(;\[[A-Z_]+\])?")
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                sampler = Sampler(interval=0.001)
+                sampler.start()
+                try:
+                    run(source, create_global_env(), engine)
+                finally:
+                    sampler.stop()
+                self.assertTrue(sampler.counts)
+                for stack in sampler.counts:
+                    self.assertTrue(stack_format.fullmatch(";".join(stack)), stack)
+
+if __name__ == "__main__":
+    unittest.main()
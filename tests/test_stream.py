@@ -0,0 +1,39 @@
+import io
+import unittest
+import contextlib
+from support import ENGINES
+from embed import run_stream
+from library import create_global_env
+from test_engines import SCRIPTS
+
+def stream_output(source, engine, optimized=False):
+    output = io.StringIO()
+    with (contextlib.redirect_stdout(output)):
+        run_stream(source, create_global_env(), engine, optimized)
+    return output.getvalue()
+
+class StreamTest(unittest.TestCase):
+    # Running one top-level statement at a time prints the same thing as running the whole script
+    def test_same_output_as_whole_scripts(self):
+        for name, (source, expected) in SCRIPTS.items():
+            for engine in ENGINES:
+                with (self.subTest(script=name, engine=engine)):
+                    self.assertEqual(stream_output(source, engine), expected)
+                    self.assertEqual(stream_output(source, engine, optimized=True), expected)
+
+    # Statements run as soon as they're parsed, before the parser gets to an error further on
+    def test_runs_before_the_rest_is_parsed(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                output = io.StringIO()
+                with (self.assertRaises(Exception), contextlib.redirect_stdout(output)):
+                    run_stream('declare x = 2; print(x * 3); declare = ;', create_global_env(), engine)
+                self.assertEqual(output.getvalue(), "6\n")
+
+    def test_returns_the_last_value(self):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_stream("declare x = 4; x * 2;", create_global_env(), engine), 8)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import pickle
+import unittest
+from support import run_script, ENGINES
+from values import StringVal, concat
+
+LONG = "p" * 70
+
+class RopeTest(unittest.TestCase):
+    def assert_prints(self, source, expected):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(source, engine), expected)
+
+    def test_append(self):
+        self.assert_prints(
+            'declare s = ""; declare i = 0; while (i < 100) { s = s + "ab"; i = i + 1; } print(length(s)); print(s[0]); print(s[199]);',
+            "200\na\nb\n"
+        )
+
+    def test_prepend(self):
+        self.assert_prints(
+            'declare s = "z"; declare i = 0; while (i < 100) { s = "ab" + s; i = i + 1; } print(length(s)); print(s[0]); print(s[200]);',
+            "201\na\nz\n"
+        )
+
+    def test_self_concat(self):
+        self.assert_prints(
+            'declare s = "0123456789"; declare i = 0; while (i < 4) { s = s + s; i = i + 1; } print(length(s)); print(s);',
+            "160\n" + "0123456789" * 16 + "\n"
+        )
+
+    # Two strings built on the same one each keep their own text
+    def test_shared_prefix(self):
+        self.assert_prints(
+            f'declare s = "{LONG}"; declare a = s + "-a"; declare b = s + "-b"; declare c = a + "!"; '
+            'print(a); print(b); print(c); print(s);',
+            f"{LONG}-a\n{LONG}-b\n{LONG}-a!\n{LONG}\n"
+        )
+
+    def test_deep_rope(self):
+        text = StringVal("")
+        for i in range(200000):
+            text = concat(StringVal("ab"), text) if i % 2 else concat(text, StringVal("cd"))
+        self.assertEqual(text.size, 400000)
+        self.assertEqual(pickle.loads(pickle.dumps(text)).value, text.value)
+        self.assertEqual(text.value[:4], "abab")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import time
+import tempfile
+import unittest
+from support import run_script, run_failing_script, ENGINES
+import tasks
+
+class TasksTest(unittest.TestCase):
+    def assert_output(self, source, expected):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                self.assertEqual(run_script(source, engine), expected)
+
+    def assert_fails(self, source, expected, message):
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                output, error = run_failing_script(source, engine)
+                self.assertEqual((output, str(error)), (expected, message))
+                # A failed script never leaves its scheduler behind for the next one
+                self.assertIsNone(tasks.scheduler)
+
+    def test_channel_of_results(self):
+        self.assert_output(
+            "fdeclare square(results, x) { sleep(10); send(results, x * x); } declare results = channel();"
+            " spawn(square, results, 2); spawn(square, results, 3); declare first = receive(results);"
+            " print(first + receive(results) + 1);",
+            "14\n"
+        )
+
+    # A spawned task first runs when its parent waits
+    def test_spawned_task_runs_when_the_parent_waits(self):
+        self.assert_output(
+            'fdeclare work(name) { print(name, " runs"); return name + "!"; } declare t = spawn(work, "a");'
+            ' print("parent"); print(join(t));',
+            "parent\na runs\na!\n"
+        )
+
+    # With a capacity of 1 the producer waits for every value to be taken
+    def test_bounded_channel(self):
+        self.assert_output(
+            'fdeclare produce(ch) { declare i = 0; while (i < 3) { send(ch, i); print("sent ", i); i = i + 1; } close(ch); }'
+            ' declare ch = channel(1); spawn(produce, ch); declare v = receive(ch);'
+            ' while (v != null) { print("got ", v); v = receive(ch); } print("closed");',
+            "sent 0\ngot 0\nsent 1\ngot 1\nsent 2\ngot 2\nclosed\n"
+        )
+
+    def test_task_waiting_longer_ends_later(self):
+        self.assert_output(
+            'fdeclare a(ch) { sleep(20); send(ch, "a"); } fdeclare b(ch) { send(ch, "b"); }'
+            ' declare ch = channel(); spawn(a, ch); spawn(b, ch); print(receive(ch), receive(ch));',
+            "ba\n"
+        )
+
+    # Sleeping tasks all wait on the event loop at once
+    def test_sleeps_overlap(self):
+        source = "fdeclare nap() { sleep(200); } declare all = []; declare i = 0; while (i < 10) { push(all, spawn(nap)); i = i + 1; }"
+        for engine in ENGINES:
+            with (self.subTest(engine=engine)):
+                start = time.perf_counter()
+                run_script(source, engine)
+                self.assertLess(time.perf_counter() - start, 1.5)
+
+    def test_files(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "data.txt").replace("\\", "/")
+        self.assert_output(
+            f'fdeclare save(text) {{ writeFile("{path}", text); return readFile("{path}"); }}'
+            f' declare t = spawn(save, "saved"); print(join(t));',
+            "saved\n"
+        )
+        with (open(path) as f):
+            self.assertEqual(f.read(), "saved")
+
+    def test_error_raised_by_join(self):
+        self.assert_fails(
+            'fdeclare bad() { return missing; } declare t = spawn(bad); sleep(0); print("after"); join(t);',
+            "after\n",
+            "Task bad failed: Cannot resolve 'missing' as it does not exist."
+        )
+
+    # An error in a task nobody joined is raised once the script ends
+    def test_error_in_a_task_nobody_joined(self):
+        self.assert_fails(
+            'fdeclare bad() { return missing; } spawn(bad); print("end");',
+            "end\n",
+            "Task bad failed: Cannot resolve 'missing' as it does not exist."
+        )
+
+    def test_deadlock(self):
+        self.assert_fails(
+            'declare ch = channel(); print("waiting"); receive(ch);',
+            "waiting\n",
+            "Deadlock: every task is waiting, a send can never happen"
+        )
+
+    def test_send_on_a_closed_channel(self):
+        self.assert_fails("declare ch = channel(); close(ch); send(ch, 1);", "", "send() on a closed channel")
+
+    def test_bad_arguments(self):
+        self.assert_fails("join(5);", "", "join() expects a task")
+        self.assert_fails("channel(0);", "", "channel() capacity must be a positive integer")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+from array import array
+# Imported first, it puts the interpreter on sys.path
+import support
+import vectorized
+from vectorized import elementwise, FAST_OPERATORS, NUMPY_MIN_LENGTH
+from operations import BINARY_OPERATORS, COMPARISON_OPERATORS
+from values import ArrayVal
+
+# Elements with their types, so 2 and 2.0 or 1 and true aren't equal
+def typed(value):
+    return [(type(x), x) for x in value.elements]
+
+def apply(symbol, left, right):
+    operator_fn = BINARY_OPERATORS.get(symbol) or COMPARISON_OPERATORS[symbol]
+    return elementwise(symbol, operator_fn, left, right)
+
+class ElementwiseTest(unittest.TestCase):
+    def test_numbers(self):
+        self.assertEqual(typed(apply("+", ArrayVal([1, 2]), ArrayVal([10, 20]))), [(int, 11), (int, 22)])
+        self.assertEqual(typed(apply("/", ArrayVal([3, 4]), 2)), [(float, 1.5), (float, 2.0)])
+        self.assertEqual(typed(apply("%", 10, ArrayVal([3, 4]))), [(int, 1), (int, 2)])
+        self.assertEqual(typed(apply("<", 3, ArrayVal([1, 5]))), [(bool, False), (bool, True)])
+        self.assertEqual(typed(apply("*", ArrayVal([1.5, 2]), 2)), [(float, 3.0), (int, 4)])
+
+    # Arrays that aren't all numbers go through the RowScript operator, element by element
+    def test_other_elements(self):
+        nested = apply("+", ArrayVal([ArrayVal([1, 2]), ArrayVal([3])]), ArrayVal([ArrayVal([10, 20]), ArrayVal([30])]))
+        self.assertEqual([typed(inner) for inner in nested.elements], [[(int, 11), (int, 22)], [(int, 33)]])
+        with (self.assertRaisesRegex(Exception, "Only numbers supported")):
+            apply("-", ArrayVal(["a"]), 1)
+        with (self.assertRaisesRegex(Exception, "Cannot compare values of different types")):
+            apply("<", ArrayVal([True]), 1)
+
+    def test_different_lengths(self):
+        with (self.assertRaisesRegex(Exception, r"Cannot apply '\+' to arrays of different lengths \(2 and 3\)")):
+            apply("+", ArrayVal([1, 2]), ArrayVal([1, 2, 3]))
+
+    def test_division_by_zero(self):
+        with (self.assertRaisesRegex(Exception, "division by zero")):
+            apply("/", ArrayVal([1, 2]), ArrayVal([1, 0]))
+
+# Big arrays go through NumPy when it's installed, the results have to be exactly Python's
+@unittest.skipUnless(vectorized.numpy is not None, "NumPy isn't installed")
+class NumpyTest(unittest.TestCase):
+    def assert_same_as_python(self, symbol, left, right):
+        with (mock.patch.object(vectorized, "numpy", None)):
+            try:
+                expected = typed(apply(symbol, left, right))
+            except Exception as error:
+                with (self.assertRaisesRegex(Exception, str(error))):
+                    apply(symbol, left, right)
+                return
+        self.assertEqual(typed(apply(symbol, left, right)), expected)
+
+    def test_same_results_as_python(self):
+        length = NUMPY_MIN_LENGTH
+        ints = ArrayVal(array("q", range(-length // 2, length // 2)))
+        floats = ArrayVal(array("d", (x / 4 for x in range(length))))
+        nonzero = ArrayVal(array("q", range(1, length + 1)))
+        for symbol in FAST_OPERATORS:
+            for left, right in ((ints, nonzero), (floats, nonzero), (ints, 3), (2.5, floats), (ints, floats)):
+                with (self.subTest(symbol=symbol, left=type(left).__name__, right=type(right).__name__)):
+                    self.assert_same_as_python(symbol, left, right)
+
+    # NumPy would wrap around, give inf or round, so Python runs these instead
+    def test_falls_back_to_python(self):
+        length = NUMPY_MIN_LENGTH
+        huge = ArrayVal(array("q", [2 ** 62] * length))
+        zeros = ArrayVal(array("q", [0] * length))
+        self.assert_same_as_python("+", huge, huge)
+        self.assert_same_as_python("*", huge, 4)
+        self.assert_same_as_python("/", huge, zeros)
+        self.assert_same_as_python("<", huge, 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+# Imported first, it puts the interpreter on sys.path
+import support
+from embed import compile_source
+from library import create_global_env
+from vm.code import Code
+from vm.machine import execute
+
+class CompiledCodeTest(unittest.TestCase):
+    # The bytecode doesn't depend on the env it runs in, so one Code can be run again
+    def test_code_runs_again_in_a_new_env(self):
+        code = compile_source("declare total = 0; declare i = 0; while (i < 4) { total = total + i; i = i + 1; } total;", "vm")
+        self.assertIsInstance(code, Code)
+        self.assertEqual(execute(code, create_global_env()), 6)
+        self.assertEqual(execute(code, create_global_env()), 6)
+
+    # Function bodies are compiled once, every call runs the same Code
+    def test_function_bodies_are_compiled_once(self):
+        code = compile_source("fdeclare square(x) { return x * x; } square(3) + square(4);", "vm")
+        bodies = [const.code for const in code.constants if hasattr(const, "code")]
+        self.assertEqual([body.name for body in bodies], ["square"])
+        self.assertEqual(execute(code, create_global_env()), 25)
+
+# Calls are kept in a list, not on the Python stack (the tests run with a recursion limit of 10000)
+class CallStackTest(unittest.TestCase):
+    def test_recursion_deeper_than_python_allows(self):
+        code = compile_source("fdeclare deep(n) { if (n == 0) { return 0; } return 1 + deep(n - 1); } deep(30000);", "vm")
+        self.assertEqual(execute(code, create_global_env()), 30000)
+
+    # deep(0) runs while the program and deep(10) to deep(1) wait for a result
+    def test_max_depth(self):
+        code = compile_source("fdeclare deep(n) { if (n == 0) { return 0; } return 1 + deep(n - 1); } deep(10);", "vm")
+        self.assertEqual(execute(code, create_global_env(), max_depth=11), 10)
+        with (self.assertRaisesRegex(Exception, "Maximum call depth exceeded")):
+            execute(code, create_global_env(), max_depth=10)
+
+    # A tail call replaces the call making it, so it never adds to the depth
+    def test_tail_calls_run_in_constant_space(self):
+        code = compile_source("fdeclare loop(n, acc) { if (n == 0) { return acc; } return loop(n - 1, acc + n); } loop(20000, 0);", "vm")
+        self.assertEqual(execute(code, create_global_env(), max_depth=1), 200010000)
+
+    def test_mutual_tail_calls_run_in_constant_space(self):
+        code = compile_source(
+            "fdeclare even(n) { if (n == 0) { return true; } return odd(n - 1); }"
+            " fdeclare odd(n) { if (n == 0) { return false; } return even(n - 1); } even(20001);",
+            "vm"
+        )
+        self.assertIs(execute(code, create_global_env(), max_depth=1), False)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,45 +1,101 @@
+from array import array
+
+# Numbers, booleans and null are plain Python int/float, bool and None at runtime
+# Only heap types (strings, arrays, maps, functions) are wrapped in a RuntimeVal
 class RuntimeVal:
     def __init__(self, type):
         self.type = type
 
-class NumberVal(RuntimeVal):
-    def __init__(self, value: int):
-        super().__init__("number")
+# Strings made by + are ropes: a node holding the two strings it joins (left and right), joined
+# only when something needs the whole text (comparing, indexing, using it as a map key, ...)
+# Flat strings have left and right set to None and value set to their text
+class StringVal(RuntimeVal):
+    def __init__(self, value):
+        super().__init__("string")
         self.value = value
+        self.left = None
+        self.right = None
+        # Number of characters, known without joining a rope
+        self.size = len(value)
 
-    def __repr__(self):
-        return str(self.value)
+    @staticmethod
+    def rope(left, right, size):
+        string = StringVal.__new__(StringVal)
+        string.type = "string"
+        string.left = left
+        string.right = right
+        string.size = size
+        return string
 
-class NullVal(RuntimeVal):
-    def __init__(self):
-        super().__init__("null")
-        
-    def __repr__(self):
-        return "null"
-
-class BoolVal(RuntimeVal):
-    def __init__(self, value):
-        super().__init__("boolean")
+    # Only called when value isn't set, i.e. for a rope that hasn't been joined yet
+    # The joined text replaces the children, so they can be freed
+    def __getattr__(self, name):
+        if (name != "value"):
+            raise AttributeError(name)
+        value = "".join(self.pieces())
         self.value = value
+        self.left = None
+        self.right = None
+        return value
 
-    def __repr__(self):
-        return "true" if self.value else "false"
+    # The texts of the flat strings under a rope, in order
+    # Walked with a list instead of recursion, a rope built in a loop is as deep as the loop is long
+    def pieces(self):
+        pending = [self]
+        while (len(pending) > 0):
+            string = pending.pop()
+            if (string.left is None):
+                yield string.value
+            else:
+                pending.append(string.right)
+                pending.append(string.left)
+
+    # Writes the text with write() piece by piece, a rope doesn't get joined
+    def write_to(self, write):
+        if (self.left is None):
+            write(self.value)
+        else:
+            for piece in self.pieces():
+                write(piece)
+
+    # Sent joined (pmap sends strings to worker processes), pickling a deep rope would recurse
+    def __getstate__(self):
+        return {"type": self.type, "value": self.value, "left": None, "right": None, "size": self.size}
 
-class StringVal(RuntimeVal):
-    def __init__(self, value):
-        super().__init__("string")
-        self.value = value
-    
     def __repr__(self):
         return self.value
 
+# Joining short strings right away is cheaper than keeping the pieces
+ROPE_MIN_SIZE = 64
+
+# left + right for two strings, without copying either one's text
+# The new rope only points at both, so building a string of n pieces with s = s + piece or
+# s = piece + s takes O(n) overall, not O(n^2). Strings are never changed, so ropes can
+# share their children (s + s, or t = s + "a" and u = s + "b")
+def concat(left, right):
+    size = left.size + right.size
+    if (left.left is None and right.left is None and size < ROPE_MIN_SIZE):
+        return StringVal(left.value + right.value)
+    return StringVal.rope(left, right, size)
+
 class FunctionVal(RuntimeVal):
-    def __init__(self, params, body, env):
+    def __init__(self, params, body, env, unique_params=False, reuse_env=False, name=None, declaration=None):
         super().__init__("function")
+        # The name it was declared with, for profiles
+        self.name = name
+        # The FunctionDeclaration node it was made from, so it can be compiled again elsewhere
+        # (pmap, ... send it to worker processes, see parallel.py)
+        self.declaration = declaration
         self.params = params
         self.body = body
         # This is the env where the function was created
         self.env = env
+        # Worked out once so calls don't have to, the last two are only used by the tree-walker:
+        # unique_params means the params can be bound all at once (a repeated name has to raise),
+        # reuse_env means nothing declared in the body can keep the call env after the call
+        self.arity = len(params)
+        self.unique_params = unique_params
+        self.reuse_env = reuse_env
     
     def __repr__(self):
         return f"<function params={self.params}>"
@@ -55,10 +111,139 @@ class NativeFunctionVal(RuntimeVal):
 class ArrayVal(RuntimeVal):
     def __init__(self, elements):
         super().__init__("array")
-        self.elements = elements
+        # A list, or a compact array.array when every element is an int or every element is a float
+        # Anything that reads elements works the same on both, stores go through index_set
+        self.elements = pack_elements(elements)
+
+    # Switches a typed array back to a list, before storing a value it can't hold
+    def unpack(self):
+        self.elements = list(self.elements)
+
+    # Adds value at the end, a typed array that can't hold it becomes a list first
+    # An empty list is packed again, so arrays built up from [] are typed too
+    def append(self, value):
+        elements = self.elements
+        if (type(elements) is list):
+            if (len(elements) == 0):
+                self.elements = pack_elements([value])
+            else:
+                elements.append(value)
+            return
+
+        if (type(value) is TYPED_ELEMENTS[elements.typecode]):
+            try:
+                elements.append(value)
+                return
+            except OverflowError:
+                pass
+        self.unpack()
+        self.elements.append(value)
+
+    def __repr__(self):
+        return "[" + ", ".join([stringify(element) for element in self.elements]) + "]"
+
+class MapVal(RuntimeVal):
+    def __init__(self):
+        super().__init__("map")
+        # map_key(key) -> value, so looking a key up is a single dict lookup
+        self.entries = {}
+
+    def get(self, key):
+        try:
+            return self.entries[map_key(key)]
+        except KeyError:
+            raise Exception(f"Key {stringify(key)} not found in map") from None
+
+    def set(self, key, value):
+        self.entries[map_key(key)] = value
+        return value
+
+    def has(self, key):
+        return map_key(key) in self.entries
+
+    # Returns whether the key was there
+    def remove(self, key):
+        return self.entries.pop(map_key(key), MISSING) is not MISSING
+
+    # The keys as RowScript values, in insertion order
+    def keys(self):
+        return [key_value(key) for key in self.entries]
+
     def __repr__(self):
-        return f"{self.elements}"
+        return "{" + ", ".join([f"{stringify(key_value(key))}: {stringify(value)}" for key, value in self.entries.items()]) + "}"
 
-TRUE = BoolVal(True)
-FALSE = BoolVal(False)
-NULL = NullVal()
\ No newline at end of file
+MISSING = object()
+
+# The dict key for a RowScript map key, only numbers, strings, booleans and null can be keys
+# Strings are keyed by their text and numbers by themselves (1 and 1.0 are the same key,
+# as 1 == 1.0). Booleans are tagged, otherwise true would be the same key as 1
+def map_key(value):
+    value_type = type(value)
+    if (value_type is StringVal):
+        return value.value
+    if (value_type is int or value_type is float or value is None):
+        return value
+    if (value_type is bool):
+        return ("boolean", value)
+    raise Exception(f"Map keys must be numbers, strings, booleans or null, got {type_of(value)}")
+
+# The RowScript value a dict key from map_key() stands for
+def key_value(key):
+    key_type = type(key)
+    if (key_type is str):
+        return StringVal(key)
+    if (key_type is tuple):
+        return key[1]
+    return key
+
+# array.array typecode -> the exact Python type of every element in it
+# Arrays mixing ints and floats stay lists so ints don't turn into floats
+TYPED_ELEMENTS = {
+    "q": int,
+    "d": float,
+}
+
+# Returns elements (a list) as an array.array when they all have the same number type
+def pack_elements(elements):
+    if (type(elements) is not list or len(elements) == 0):
+        # Already packed
+        return elements
+
+    element_types = set(map(type, elements))
+    if (element_types == {int}):
+        try:
+            return array("q", elements)
+        except OverflowError:
+            # Ints that don't fit in 64 bits
+            return elements
+    if (element_types == {float}):
+        return array("d", elements)
+    return elements
+
+TRUE = True
+FALSE = False
+NULL = None
+
+# Python types that count as RowScript numbers (bool is an int subclass, so it's checked by exact type)
+NUMBER_TYPES = (int, float)
+
+# Returns the RowScript type name of any runtime value
+def type_of(value):
+    value_type = type(value)
+    if (value_type is int or value_type is float):
+        return "number"
+    if (value_type is bool):
+        return "boolean"
+    if (value is None):
+        return "null"
+    return value.type
+
+# How a runtime value is printed
+def stringify(value):
+    if (value is True):
+        return "true"
+    if (value is False):
+        return "false"
+    if (value is None):
+        return "null"
+    return str(value)
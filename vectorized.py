@@ -0,0 +1,126 @@
+import operator
+from array import array
+from itertools import repeat
+from values import ArrayVal, NUMBER_TYPES
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Element-wise operators for arrays (array + array, array * 2, 3 < array, ...)
+# The operator is applied to every pair of elements and the results make a new array
+#   - both sides are arrays of numbers (or one is a number): Python's own operator runs over
+#     them with map(), or NumPy for big arrays when it's installed and gives the same results
+#   - anything else: the RowScript operator runs on every pair, so elements get the same checks
+#     and errors as they would on their own (and nested arrays work element-wise too)
+
+# Arrays shorter than this aren't worth converting for NumPy
+NUMPY_MIN_LENGTH = 512
+
+# RowScript operator name -> (Python operator, NumPy ufunc name)
+# On numbers the Python operator does exactly what the RowScript one does
+FAST_OPERATORS = {
+    "+": (operator.add, "add"),
+    "-": (operator.sub, "subtract"),
+    "*": (operator.mul, "multiply"),
+    "/": (operator.truediv, "true_divide"),
+    "%": (operator.mod, "remainder"),
+    "==": (operator.eq, "equal"),
+    "!=": (operator.ne, "not_equal"),
+    ">": (operator.gt, "greater"),
+    ">=": (operator.ge, "greater_equal"),
+    "<": (operator.lt, "less"),
+    "<=": (operator.le, "less_equal"),
+}
+
+INT64_LIMIT = 2 ** 63
+# Ints past this can't all be represented as floats, NumPy would round them before comparing
+FLOAT_EXACT_LIMIT = 2 ** 53
+
+# symbol is the RowScript operator, operator_fn its function from operations.py
+# At least one of left and right is an array
+def elementwise(symbol, operator_fn, left, right):
+    left_is_array = type(left) is ArrayVal
+    right_is_array = type(right) is ArrayVal
+
+    if (left_is_array and right_is_array and len(left.elements) != len(right.elements)):
+        raise Exception(
+            f"Cannot apply '{symbol}' to arrays of different lengths "
+            f"({len(left.elements)} and {len(right.elements)})"
+        )
+
+    left_values = left.elements if left_is_array else repeat(left)
+    right_values = right.elements if right_is_array else repeat(right)
+
+    if (is_numeric(left) and is_numeric(right)):
+        python_fn, ufunc_name = FAST_OPERATORS[symbol]
+
+        if (numpy is not None):
+            length = len(left.elements) if left_is_array else len(right.elements)
+            if (length >= NUMPY_MIN_LENGTH):
+                result = numpy_elementwise(symbol, ufunc_name, left, right)
+                if (result is not None):
+                    return result
+
+        return ArrayVal(list(map(python_fn, left_values, right_values)))
+
+    return ArrayVal(list(map(operator_fn, left_values, right_values)))
+
+# A number, or an array whose elements are all ints or all floats (see ArrayVal)
+def is_numeric(value):
+    if (type(value) is ArrayVal):
+        return type(value.elements) is array
+    return type(value) in NUMBER_TYPES
+
+# Runs the operator with NumPy, returns None when the result could differ from Python's
+# (int64 overflow, division by zero, or big ints that lose precision as floats)
+def numpy_elementwise(symbol, ufunc_name, left, right):
+    left_np = as_numpy(left)
+    right_np = as_numpy(right)
+    if (left_np is None or right_np is None):
+        return None
+
+    left_bound = magnitude(left_np)
+    right_bound = magnitude(right_np)
+    left_int = left_np.dtype.kind == "i"
+    right_int = right_np.dtype.kind == "i"
+
+    if (left_int and right_int):
+        if (symbol in ("+", "-") and left_bound + right_bound >= INT64_LIMIT):
+            return None
+        if (symbol == "*" and left_bound * right_bound >= INT64_LIMIT):
+            return None
+    if (symbol == "/" or left_int != right_int):
+        # Both sides become floats
+        if ((left_int and left_bound > FLOAT_EXACT_LIMIT) or (right_int and right_bound > FLOAT_EXACT_LIMIT)):
+            return None
+    if (symbol in ("/", "%") and not numpy.all(right_np != 0)):
+        # Python raises, NumPy would give inf or nan
+        return None
+
+    # Python doesn't warn about float overflow (inf) or nan either
+    with (numpy.errstate(all="ignore")):
+        result = getattr(numpy, ufunc_name)(left_np, right_np)
+
+    if (result.dtype.kind == "b"):
+        return ArrayVal(result.tolist())
+    elements = array("q" if result.dtype.kind == "i" else "d")
+    elements.frombytes(result.astype(elements.typecode).tobytes())
+    return ArrayVal(elements)
+
+# A NumPy view of a typed array (no copy), or a 0-d array for a number
+def as_numpy(value):
+    if (type(value) is ArrayVal):
+        return numpy.frombuffer(value.elements, dtype=value.elements.typecode)
+    if (type(value) is int):
+        if (value >= INT64_LIMIT or value < -INT64_LIMIT):
+            return None
+        return numpy.array(value, dtype="q")
+    return numpy.array(value, dtype="d")
+
+# The largest absolute value in the array (0 for floats, only int overflow is checked with it)
+def magnitude(values):
+    if (values.dtype.kind != "i" or values.size == 0):
+        return 0
+    return max(int(values.max()), -int(values.min()))
@@ -0,0 +1,23 @@
+# A compiled unit of bytecode: the program itself or the body of a function
+class Code:
+    def __init__(self, name, instructions, constants, names, frame_size=0):
+        self.name = name
+        self.instructions = instructions
+        self.constants = constants
+        self.names = names
+        # Number of slots a call frame needs, only used by function bodies
+        self.frame_size = frame_size
+    def __repr__(self):
+        return f"Code({self.name}, {len(self.instructions) // 2} instructions)"
+
+# Stored in the constant pool, MAKE_FUNCTION turns it into a FunctionVal at runtime
+class FunctionTemplate:
+    def __init__(self, name, params, code, pure=False, declaration=None):
+        self.name = name
+        self.params = params
+        self.code = code
+        self.pure = pure
+        # The resolved FunctionDeclaration node, for FunctionVal.declaration
+        self.declaration = declaration
+    def __repr__(self):
+        return f"FunctionTemplate({self.name}, params={self.params})"
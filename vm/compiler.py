@@ -0,0 +1,274 @@
+from nodes import NodeType
+from values import StringVal, NULL
+from operations import BINARY_OPERATORS, UNARY_OPERATORS, COMPARISON_OPERATORS
+from .code import Code, FunctionTemplate
+from .opcodes import (
+    LOAD_CONST, LOAD_NAME, STORE_NAME, DECLARE_VAR, DECLARE_CONST, POP,
+    BINARY_OP, UNARY_OP, LOAD_INDEX, STORE_INDEX, BUILD_ARRAY,
+    ENTER_SCOPE, EXIT_SCOPE, JUMP, IF_FALSE_JUMP, ELIF_FALSE_JUMP,
+    WHILE_FALSE_JUMP, LOOP_MODE, COUNT_NEXT, SET_LOOP_RESULT,
+    MAKE_FUNCTION, CHECK_CALL, CALL, RETURN_VALUE, RAISE,
+    LOAD_LOCAL, STORE_LOCAL, DECLARE_LOCAL, LOAD_OUTER, STORE_OUTER,
+    TAIL_CALL, BUILD_MAP
+    )
+
+# Compiles the AST from Parser.produce_ast() into a Code object for the VM
+# The AST has to go through the resolver first, locals are addressed by slot
+# Every statement leaves exactly one value on the stack, the same value evaluate() would return
+class Compiler:
+    def __init__(self, name, in_function=False):
+        self.name = name
+        self.in_function = in_function
+        self.instructions = []
+        self.constants = []
+        self.names = []
+        # Lookup tables so repeated constants and names share one pool entry
+        self.constant_index = {}
+        self.name_index = {}
+
+    # Helper appends an instruction and returns its position
+    def emit(self, op, arg=0):
+        self.instructions.append(op)
+        self.instructions.append(arg)
+        return len(self.instructions) - 2
+
+    # Helper points the jump at position to the current end of the code
+    def patch_jump(self, position):
+        self.instructions[position + 1] = len(self.instructions)
+
+    def add_constant(self, value, key=None):
+        # Values without a key (functions, operators) are compared by identity
+        if (key is None):
+            key = ("object", id(value))
+        if (key not in self.constant_index):
+            self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constant_index[key]
+
+    def add_name(self, name):
+        if (name not in self.name_index):
+            self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return self.name_index[name]
+
+    def code(self, frame_size=0):
+        return Code(self.name, self.instructions, self.constants, self.names, frame_size)
+
+    def compile_program(self, program):
+        self.compile_body(program.body)
+        self.emit(RETURN_VALUE)
+        return self.code()
+
+    def compile_function(self, node):
+        # Two params with the same name raise once the call starts
+        if (node.params_error is not None):
+            self.emit_raise(node.params_error)
+            return self.code(node.frame_size)
+
+        # The function body runs directly in the call frame, just like eval_call_expr
+        self.compile_body(node.body.body)
+        self.emit(RETURN_VALUE)
+        return self.code(node.frame_size)
+
+    # Compiles a list of statements, keeping only the value of the last one
+    def compile_body(self, statements):
+        if (len(statements) == 0):
+            self.emit(LOAD_CONST, self.add_constant(NULL))
+            return
+
+        for i, stmt in enumerate(statements):
+            if (i > 0):
+                self.emit(POP)
+            self.compile_node(stmt)
+
+    def compile_node(self, node):
+        match node.type:
+            case NodeType.NUMERIC_LITERAL | NodeType.LITERAL:
+                # repr keeps 0.0 and -0.0 apart (folded values can be negative)
+                self.emit(LOAD_CONST, self.add_constant(node.value, ("value", type(node.value), repr(node.value))))
+            case NodeType.STRING_LITERAL:
+                value = StringVal(node.value)
+                self.emit(LOAD_CONST, self.add_constant(value, ("string", node.value)))
+            case NodeType.IDENTIFIER:
+                self.compile_variable(node, LOAD_NAME, LOAD_LOCAL, LOAD_OUTER)
+            case NodeType.BINARY_EXPR:
+                self.compile_operator(node, BINARY_OPERATORS, "Unknown operator")
+            case NodeType.COMPARISON_EXPR:
+                self.compile_operator(node, COMPARISON_OPERATORS, "Unknown operator")
+            case NodeType.UNARY_EXPR:
+                self.compile_node(node.operand)
+                operator_fn = UNARY_OPERATORS.get(node.operator)
+                if (operator_fn is None):
+                    raise Exception(f"Unknown unary operator {node.operator}")
+                self.emit(UNARY_OP, self.add_constant(operator_fn))
+            case NodeType.ASSIGNMENT_EXPR:
+                self.compile_assignment(node)
+            case NodeType.VAR_DECLARATION:
+                self.compile_node(node.value)
+                if (node.error is not None):
+                    self.emit_raise(node.error)
+                else:
+                    self.compile_declaration(node.identifier.value, node.slot, node.isConst)
+            case NodeType.BLOCK:
+                self.compile_block(node)
+            case NodeType.IF_STMT:
+                self.compile_if_stmt(node)
+            case NodeType.WHILE_LOOP:
+                self.compile_while_loop(node)
+            case NodeType.FUNCTION_DECLARATION:
+                compiler = Compiler(node.name, in_function=True)
+                template = FunctionTemplate(node.name, node.params, compiler.compile_function(node), node.pure, node)
+                self.emit(MAKE_FUNCTION, self.add_constant(template))
+                if (node.error is not None):
+                    self.emit_raise(node.error)
+                else:
+                    self.compile_declaration(node.name, node.slot, True)
+            case NodeType.CALL_EXPR:
+                self.compile_call(node, CALL)
+            case NodeType.RETURN_STMT:
+                if (not self.in_function):
+                    self.emit_raise("Return statement can only be used inside a function")
+                    return
+                if (node.value is None):
+                    self.emit(LOAD_CONST, self.add_constant(NULL))
+                elif (node.value.type == NodeType.CALL_EXPR):
+                    # return f(...) reuses the current call, so tail recursion runs in constant space
+                    # Native functions still return here, to the RETURN_VALUE below
+                    self.compile_call(node.value, TAIL_CALL)
+                else:
+                    self.compile_node(node.value)
+                self.emit(RETURN_VALUE)
+            case NodeType.ARRAY_LITERAL:
+                for element in node.elements:
+                    self.compile_node(element)
+                self.emit(BUILD_ARRAY, len(node.elements))
+            case NodeType.MAP_LITERAL:
+                for key, value in node.entries:
+                    self.compile_node(key)
+                    self.compile_node(value)
+                self.emit(BUILD_MAP, len(node.entries))
+            case NodeType.INDEX_EXPR:
+                self.compile_node(node.array)
+                self.compile_node(node.index)
+                self.emit(LOAD_INDEX)
+            case _:
+                raise Exception(f"No evaluation rule for {node.type}")
+
+    # Globals are looked up by name, locals by slot and outer locals by (depth, slot)
+    # Outer addresses carry the fallbacks and the name, used while the slot isn't declared yet
+    def compile_variable(self, node, global_op, local_op, outer_op):
+        if (node.slot is None):
+            self.emit(global_op, self.add_name(node.symbol))
+        elif (node.depth == 0 and not node.checked):
+            self.emit(local_op, node.slot)
+        else:
+            address = (((node.depth, node.slot, node.constant),) + node.fallbacks, node.symbol)
+            self.emit(outer_op, self.add_constant(address, ("address",) + address))
+
+    def compile_call(self, node, call_op):
+        self.compile_node(node.callee)
+        # Checked before the args are evaluated, same as eval_call_expr
+        self.emit(CHECK_CALL, len(node.args))
+        for arg in node.args:
+            self.compile_node(arg)
+        self.emit(call_op, len(node.args))
+
+    def compile_declaration(self, name, slot, is_const):
+        if (slot is not None):
+            self.emit(DECLARE_LOCAL, slot)
+        elif (is_const):
+            self.emit(DECLARE_CONST, self.add_name(name))
+        else:
+            self.emit(DECLARE_VAR, self.add_name(name))
+
+    def emit_raise(self, message):
+        self.emit(RAISE, self.add_constant(message, ("message", message)))
+
+    def compile_operator(self, node, operators, error):
+        self.compile_node(node.left)
+        self.compile_node(node.right)
+        operator_fn = operators.get(node.operator)
+        if (operator_fn is None):
+            raise Exception(f"{error} {node.operator}")
+        self.emit(BINARY_OP, self.add_constant(operator_fn))
+
+    def compile_assignment(self, node):
+        if (node.assignee.type == NodeType.IDENTIFIER):
+            self.compile_node(node.value)
+            if (node.error is not None):
+                self.emit_raise(node.error)
+            else:
+                self.compile_variable(node.assignee, STORE_NAME, STORE_LOCAL, STORE_OUTER)
+            return
+
+        if (node.assignee.type == NodeType.INDEX_EXPR):
+            # Same order as eval_assignment_expr: value, array, then index
+            self.compile_node(node.value)
+            self.compile_node(node.assignee.array)
+            self.compile_node(node.assignee.index)
+            self.emit(STORE_INDEX)
+            return
+
+        self.emit_raise("Invalid assignment target")
+
+    def compile_block(self, node):
+        if (node.frame_size == 0):
+            self.compile_body(node.body)
+            return
+
+        self.emit(ENTER_SCOPE, node.frame_size)
+        self.compile_body(node.body)
+        self.emit(EXIT_SCOPE)
+
+    def compile_if_stmt(self, node):
+        end_jumps = []
+
+        self.compile_node(node.condition)
+        skip = self.emit(IF_FALSE_JUMP)
+        self.compile_block(node.body)
+        end_jumps.append(self.emit(JUMP))
+        self.patch_jump(skip)
+
+        for elif_condition, elif_block in node.elif_branches:
+            self.compile_node(elif_condition)
+            skip = self.emit(ELIF_FALSE_JUMP)
+            self.compile_block(elif_block)
+            end_jumps.append(self.emit(JUMP))
+            self.patch_jump(skip)
+
+        if (node.else_block is not None):
+            self.compile_block(node.else_block)
+        else:
+            self.emit(LOAD_CONST, self.add_constant(NULL))
+
+        for position in end_jumps:
+            self.patch_jump(position)
+
+    # The first condition decides whether this is a boolean loop or a counted loop (while(n){})
+    # Like eval_while_loop, a boolean loop evaluates the condition again before the first iteration
+    def compile_while_loop(self, node):
+        self.emit(LOAD_CONST, self.add_constant(NULL))
+        self.compile_node(node.condition)
+        counted_jump = self.emit(LOOP_MODE)
+
+        # Boolean loop, the result sits on the stack and is replaced by each iteration
+        loop_start = len(self.instructions)
+        self.compile_node(node.condition)
+        exit_jump = self.emit(WHILE_FALSE_JUMP)
+        self.emit(POP)
+        self.compile_block(node.body)
+        self.emit(JUMP, loop_start)
+
+        # Counted loop, the counter sits on top of the result
+        self.patch_jump(counted_jump)
+        count_start = len(self.instructions)
+        count_exit = self.emit(COUNT_NEXT)
+        self.compile_block(node.body)
+        self.emit(SET_LOOP_RESULT)
+        self.emit(JUMP, count_start)
+
+        self.patch_jump(exit_jump)
+        self.patch_jump(count_exit)
+
+def compile_program(program):
+    return Compiler("<program>").compile_program(program)
@@ -0,0 +1,212 @@
+from values import FunctionVal, NativeFunctionVal, ArrayVal, MapVal, NULL, NUMBER_TYPES
+from environment import Frame, UNSET, find_declared
+from operations import index_get, index_set
+from memo import memoize
+from .opcodes import (
+    LOAD_CONST, LOAD_NAME, STORE_NAME, DECLARE_VAR, DECLARE_CONST, POP,
+    BINARY_OP, UNARY_OP, LOAD_INDEX, STORE_INDEX, BUILD_ARRAY,
+    ENTER_SCOPE, EXIT_SCOPE, JUMP, IF_FALSE_JUMP, ELIF_FALSE_JUMP,
+    WHILE_FALSE_JUMP, LOOP_MODE, COUNT_NEXT, SET_LOOP_RESULT,
+    MAKE_FUNCTION, CHECK_CALL, CALL, RETURN_VALUE, RAISE,
+    LOAD_LOCAL, STORE_LOCAL, DECLARE_LOCAL, LOAD_OUTER, STORE_OUTER,
+    TAIL_CALL, BUILD_MAP
+    )
+
+# How many calls can be waiting for a result at once
+# Calls are kept in a list, not on the Python stack, so this only bounds memory
+MAX_CALL_DEPTH = 100000
+
+# Runs compiled top-level code with env holding the globals
+def execute(code, env, max_depth=None):
+    return run(code, Frame.root(env), max_depth)
+
+# Runs a Code object in frame and returns the value left by its last statement
+# The most common instructions are checked first
+# Calls to RowScript functions don't call run() again: the caller's state is saved in calls
+# and the loop carries on with the function's code, RETURN_VALUE picks the caller back up
+def run(code, frame, max_depth=None):
+    if (max_depth is None):
+        max_depth = MAX_CALL_DEPTH
+    instructions = code.instructions
+    constants = code.constants
+    names = code.names
+    # Every frame in a chain shares the same globals
+    env = frame.globals
+    slots = frame.slots
+
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+
+    # (code, pc, stack, frame) of every call waiting for a result
+    calls = []
+
+    while True:
+        op = instructions[pc]
+        arg = instructions[pc + 1]
+        pc += 2
+
+        if (op == LOAD_LOCAL):
+            push(slots[arg])
+        elif (op == LOAD_CONST):
+            push(constants[arg])
+        elif (op == BINARY_OP):
+            right = pop()
+            stack[-1] = constants[arg](stack[-1], right)
+        elif (op == POP):
+            pop()
+        elif (op == STORE_LOCAL):
+            slots[arg] = stack[-1]
+        elif (op == LOAD_NAME):
+            push(env.lookup_var(names[arg]))
+        elif (op == LOAD_OUTER):
+            addresses, name = constants[arg]
+            outer_slots, slot, is_const = find_declared(frame, addresses)
+            push(env.lookup_var(name) if outer_slots is None else outer_slots[slot])
+        elif (op == JUMP):
+            pc = arg
+        elif (op == IF_FALSE_JUMP or op == ELIF_FALSE_JUMP or op == WHILE_FALSE_JUMP):
+            condition = pop()
+            if (condition is False):
+                pc = arg
+            elif (condition is not True):
+                if (op == IF_FALSE_JUMP):
+                    raise Exception("If condition must be a boolean")
+                if (op == ELIF_FALSE_JUMP):
+                    raise Exception("Elif condition must be a boolean")
+                raise Exception("While condition must be a boolean")
+        elif (op == ENTER_SCOPE):
+            frame = Frame(frame, [UNSET] * arg)
+            slots = frame.slots
+        elif (op == EXIT_SCOPE):
+            frame = frame.parent
+            slots = frame.slots
+        elif (op == CHECK_CALL):
+            fn = stack[-1]
+            if (type(fn) is not NativeFunctionVal):
+                if (type(fn) is not FunctionVal):
+                    raise Exception("Can only call functions")
+                if (arg != len(fn.params)):
+                    raise Exception("Incorrect number of arguments")
+        elif (op == CALL or op == TAIL_CALL):
+            if (arg > 0):
+                args = stack[-arg:]
+                del stack[-arg:]
+            else:
+                args = []
+            fn = stack[-1]
+
+            if (type(fn) is NativeFunctionVal):
+                stack[-1] = fn.fn(args, env)
+                continue
+
+            if (op == CALL):
+                if (len(calls) >= max_depth):
+                    raise Exception("Maximum call depth exceeded")
+                # The callee stays on the stack, RETURN_VALUE replaces it with the result
+                calls.append((code, pc, stack, frame))
+            # A tail call has nothing left to do here, so the function's result goes straight
+            # to whoever is waiting for this call
+
+            # A new frame for the params and locals, under the frame the function was defined in
+            code = fn.body
+            if (code.frame_size > arg):
+                args.extend([UNSET] * (code.frame_size - arg))
+            frame = Frame(fn.env, args)
+            slots = args
+            instructions = code.instructions
+            constants = code.constants
+            names = code.names
+            stack = []
+            push = stack.append
+            pop = stack.pop
+            pc = 0
+        elif (op == LOAD_INDEX):
+            index_val = pop()
+            stack[-1] = index_get(stack[-1], index_val)
+        elif (op == STORE_INDEX):
+            index_val = pop()
+            array_val = pop()
+            index_set(array_val, index_val, stack[-1])
+        elif (op == UNARY_OP):
+            stack[-1] = constants[arg](stack[-1])
+        elif (op == COUNT_NEXT):
+            counter = stack[-1]
+            if (counter[0] >= counter[1]):
+                pop()
+                pc = arg
+            else:
+                counter[0] += 1
+        elif (op == SET_LOOP_RESULT):
+            value = pop()
+            stack[-2] = value
+        elif (op == RETURN_VALUE):
+            value = pop()
+            if (len(calls) == 0):
+                return value
+
+            code, pc, stack, frame = calls.pop()
+            slots = frame.slots
+            instructions = code.instructions
+            constants = code.constants
+            names = code.names
+            push = stack.append
+            pop = stack.pop
+            stack[-1] = value
+        elif (op == DECLARE_LOCAL):
+            slots[arg] = pop()
+            push(NULL)
+        elif (op == STORE_NAME):
+            env.assign_var(names[arg], stack[-1])
+        elif (op == STORE_OUTER):
+            addresses, name = constants[arg]
+            outer_slots, slot, is_const = find_declared(frame, addresses)
+            if (outer_slots is None):
+                env.assign_var(name, stack[-1])
+            elif (is_const):
+                raise Exception(f"Cannot reassign constant '{name}'.")
+            else:
+                outer_slots[slot] = stack[-1]
+        elif (op == DECLARE_VAR):
+            env.declare_var(names[arg], pop())
+            push(NULL)
+        elif (op == DECLARE_CONST):
+            env.declare_var(names[arg], pop(), True)
+            push(NULL)
+        elif (op == BUILD_ARRAY):
+            if (arg > 0):
+                elements = stack[-arg:]
+                del stack[-arg:]
+            else:
+                elements = []
+            push(ArrayVal(elements))
+        elif (op == BUILD_MAP):
+            map_val = MapVal()
+            if (arg > 0):
+                entries = stack[-2 * arg:]
+                del stack[-2 * arg:]
+                for i in range(0, len(entries), 2):
+                    map_val.set(entries[i], entries[i + 1])
+            push(map_val)
+        elif (op == LOOP_MODE):
+            condition = pop()
+            if (type(condition) is bool):
+                continue
+            if (type(condition) not in NUMBER_TYPES):
+                raise Exception("While condition must be a boolean or a number")
+            if (condition < 0):
+                raise Exception("While loop input must be positive")
+            # while(n){} runs n times even if n is modified during the loop
+            push([0, condition])
+            pc = arg
+        elif (op == MAKE_FUNCTION):
+            template = constants[arg]
+            fn = FunctionVal(template.params, template.code, frame, name=template.name, declaration=template.declaration)
+            if (template.pure):
+                fn = memoize(fn, env)
+            push(fn)
+        elif (op == RAISE):
+            raise Exception(constants[arg])
+        else:
+            raise Exception(f"Unknown opcode {op}")
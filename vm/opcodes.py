@@ -0,0 +1,49 @@
+# Opcodes for the bytecode VM
+# Every instruction is two slots wide in the flat instruction list: [opcode, argument]
+# Instructions that don't need an argument use 0
+
+LOAD_CONST = 0          # push constants[arg]
+LOAD_NAME = 1           # push the value of the global names[arg]
+STORE_NAME = 2          # assign top of stack to the global names[arg] (value stays on the stack)
+DECLARE_VAR = 3         # pop a value and declare the global names[arg], then push null
+DECLARE_CONST = 4       # same as DECLARE_VAR but the variable is constant
+POP = 5                 # discard top of stack
+
+BINARY_OP = 6           # pop right and left, push constants[arg](left, right)
+UNARY_OP = 7            # pop operand, push constants[arg](operand)
+
+LOAD_INDEX = 8          # pop index and array, push array[index]
+STORE_INDEX = 9         # pop index, array and value, store it and push value back
+BUILD_ARRAY = 10        # pop arg values and push a new array
+
+ENTER_SCOPE = 11        # start a new block frame with arg slots
+EXIT_SCOPE = 12         # go back to the parent frame
+
+JUMP = 13               # jump to arg
+IF_FALSE_JUMP = 14      # pop a boolean, jump to arg if it's false
+ELIF_FALSE_JUMP = 15    # same as IF_FALSE_JUMP with the elif error message
+WHILE_FALSE_JUMP = 16   # same as IF_FALSE_JUMP with the while error message
+LOOP_MODE = 17          # pop the first while condition, for numbers push a counter and jump to arg
+COUNT_NEXT = 18         # advance the counter on top of stack, pop it and jump to arg once done
+SET_LOOP_RESULT = 19    # pop a value and replace the loop result underneath the counter
+
+MAKE_FUNCTION = 20      # push a new function from the template in constants[arg]
+CHECK_CALL = 21         # check that the callee under the (not yet evaluated) args can take arg args
+CALL = 22               # pop arg args and the callee, push the result of the call
+RETURN_VALUE = 23       # return top of stack from the current code
+RAISE = 24              # raise an error with the message in constants[arg]
+
+LOAD_LOCAL = 25         # push slot arg of the current frame
+STORE_LOCAL = 26        # assign top of stack to slot arg of the current frame (value stays on the stack)
+DECLARE_LOCAL = 27      # pop a value into slot arg of the current frame, then push null
+LOAD_OUTER = 28         # push the slot at the (depth, slot, name) address in constants[arg]
+STORE_OUTER = 29        # assign top of stack to the address in constants[arg] (value stays on the stack)
+
+TAIL_CALL = 30          # like CALL, but a function call replaces the current call instead of returning to it
+
+BUILD_MAP = 31          # pop arg key, value pairs and push a new map
+
+OPCODE_NAMES = {
+    value: name for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}